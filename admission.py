@@ -0,0 +1,146 @@
+"""
+Admission control for expensive endpoints
+Chat questions, quiz generation, uploads and folder refreshes are limited per client by
+token buckets, one bucket per client and route group, and answered with 429 and the exact
+Retry-After once a bucket is empty. Work that holds a request thread while the model or
+the PDF parser runs additionally passes a ConcurrencyGate: a fixed number run at once,
+a bounded number wait their turn, and everything beyond is turned away with 503 at once.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import jsonify, request
+
+
+def parse_limits(text):
+    """{group: (tokens per second, burst)} from 'chat=20/60:10,quiz=6/60' (count/seconds[:burst])"""
+    limits = {}
+    for part in (text or '').split(','):
+        if not part.strip():
+            continue
+        group, _, spec = part.partition('=')
+        rate, _, burst = spec.partition(':')
+        count, _, seconds = rate.partition('/')
+        try:
+            count = float(count)
+            seconds = float(seconds or 1)
+            burst = float(burst) if burst else max(1.0, count)
+        except ValueError:
+            raise ValueError(f"Invalid rate limit '{part.strip()}', expected group=count/seconds[:burst]")
+        if count <= 0 or seconds <= 0 or burst < 1:
+            raise ValueError(f"Invalid rate limit '{part.strip()}'")
+        limits[group.strip()] = (count / seconds, burst)
+    return limits
+
+
+class RateLimiter:
+    """Token buckets per client and route group, checked before the request is dispatched"""
+
+    def __init__(self, limits, endpoints, max_clients=10000):
+        self.limits = limits        # group -> (tokens per second, burst)
+        self.endpoints = endpoints  # Flask endpoint name -> group
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # (group, client) -> [tokens, monotonic time of last refill]
+        self._lock = threading.Lock()
+        self._stats = {group: {'allowed': 0, 'limited': 0} for group in limits}
+
+    def init_app(self, app):
+        app.before_request(self.check_request)
+
+    def check_request(self):
+        group = self.endpoints.get(request.endpoint)
+        if group not in self.limits or request.method == 'OPTIONS':
+            return None
+        retry_after = self.take(group, self.client_id())
+        if retry_after is None:
+            return None
+        response = jsonify({'error': 'Too many requests, slow down', 'retry_after': retry_after})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+
+    def client_id(self):
+        # Behind a reverse proxy, wrap the app in werkzeug's ProxyFix so this is the real client
+        return request.remote_addr or 'unknown'
+
+    def take(self, group, client):
+        """Spend one token; None when allowed, else whole seconds until a token is available"""
+        rate, burst = self.limits[group]
+        key = (group, client)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now]
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)  # the longest idle bucket, likely full again anyway
+            else:
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+                self._buckets.move_to_end(key)
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                self._stats[group]['allowed'] += 1
+                return None
+            self._stats[group]['limited'] += 1
+            return max(1, math.ceil((1 - bucket[0]) / rate))
+
+    def stats(self):
+        with self._lock:
+            stats = {group: dict(counts) for group, counts in self._stats.items()}
+            clients = len(self._buckets)
+        for group, (rate, burst) in self.limits.items():
+            stats[group].update(per_minute=round(rate * 60, 3), burst=burst)
+        return {'groups': stats, 'tracked_clients': clients}
+
+
+class ConcurrencyGate:
+    """At most limit holders; up to max_waiting callers wait up to timeout seconds for a turn"""
+
+    def __init__(self, limit, max_waiting=0, timeout=10.0):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self._active = 0
+        self._waiting = 0
+        self._condition = threading.Condition()
+        self._stats = {'admitted': 0, 'queued': 0, 'rejected': 0, 'timed_out': 0, 'peak_waiting': 0}
+
+    def acquire(self):
+        """True once admitted; False at once when the queue is full, or after the timeout"""
+        with self._condition:
+            if self._active < self.limit:
+                self._active += 1
+                self._stats['admitted'] += 1
+                return True
+            if self._waiting >= self.max_waiting:
+                self._stats['rejected'] += 1
+                return False
+
+            self._waiting += 1
+            self._stats['queued'] += 1
+            self._stats['peak_waiting'] = max(self._stats['peak_waiting'], self._waiting)
+            try:
+                admitted = self._condition.wait_for(lambda: self._active < self.limit, self.timeout)
+            finally:
+                self._waiting -= 1
+            if not admitted:
+                self._stats['timed_out'] += 1
+                return False
+            self._active += 1
+            self._stats['admitted'] += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            return dict(self._stats, active=self._active, waiting=self._waiting, limit=self.limit,
+                        max_waiting=self.max_waiting, timeout=self.timeout)
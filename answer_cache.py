@@ -0,0 +1,128 @@
+"""
+Semantic answer cache for ThothKB chat
+Reuses answers to near-duplicate questions while the retrieved source documents are unchanged
+"""
+
+import hashlib
+import json
+import threading
+import unicodedata
+from collections import OrderedDict
+
+SHINGLE_SIZE = 3
+
+
+def normalize_question(question):
+    """Lowercase, fold width/compatibility forms and drop punctuation and symbols"""
+    text = unicodedata.normalize('NFKC', question or '').lower()
+    # Keep Thai combining vowels and tone marks (category M*) - only strip punctuation and symbols
+    text = ''.join(' ' if unicodedata.category(ch)[0] in 'PS' else ch for ch in text)
+    return ' '.join(text.split())
+
+
+def question_shingles(normalized):
+    """Character shingles work for both space-separated English and unsegmented Thai"""
+    if len(normalized) <= SHINGLE_SIZE:
+        return frozenset([normalized])
+    return frozenset(normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1))
+
+
+def jaccard_similarity(a, b):
+    """Jaccard similarity of two shingle sets"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def source_fingerprint(documents):
+    """Fingerprint the retrieved document rows; any edit to a cited document changes it"""
+    rows = sorted((list(doc) for doc in documents), key=lambda row: row[0])
+    payload = json.dumps(rows, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class AnswerCache:
+    """Bounded LRU of chat answers keyed by source fingerprint and question signature"""
+
+    def __init__(self, max_entries=256, threshold=0.8):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._entries = OrderedDict()  # (fingerprint, normalized question) -> entry
+        self._by_fingerprint = {}      # fingerprint -> set of entry keys
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, question, fingerprint):
+        """Return the cached entry for a similar question over the same sources, or None"""
+        normalized = normalize_question(question)
+        with self._lock:
+            key = (fingerprint, normalized)
+            entry = self._entries.get(key)
+
+            if entry is None:
+                shingles = question_shingles(normalized)
+                best_score = self.threshold
+                for candidate in self._by_fingerprint.get(fingerprint, ()):
+                    score = jaccard_similarity(shingles, self._entries[candidate]['shingles'])
+                    if score >= best_score:
+                        key, best_score = candidate, score
+                entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def store(self, question, fingerprint, answer, source_ids):
+        """Cache an answer produced from the given source documents"""
+        normalized = normalize_question(question)
+        key = (fingerprint, normalized)
+        with self._lock:
+            self._entries[key] = {
+                'answer': answer,
+                'sources': list(source_ids),
+                'shingles': question_shingles(normalized),
+            }
+            self._entries.move_to_end(key)
+            self._by_fingerprint.setdefault(fingerprint, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._discard_key(evicted)
+
+    def invalidate_document(self, document_id):
+        """Drop every cached answer that cited the document"""
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if document_id in entry['sources']]
+            for key in stale:
+                del self._entries[key]
+                self._discard_key(key)
+            return len(stale)
+
+    def clear(self):
+        """Drop all cached answers"""
+        with self._lock:
+            self._entries.clear()
+            self._by_fingerprint.clear()
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+    def _discard_key(self, key):
+        keys = self._by_fingerprint.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_fingerprint[key[0]]
@@ -13,6 +13,8 @@ class DynamicKnowledgeBaseApp {
         console.log('Initializing dynamic app...');
         try {
             this.setupEventListeners();
+            // Subscribe before loading so no change between the two is missed
+            this.connectEvents();
             await this.loadKnowledgeCards();
             console.log('Dynamic app initialized successfully');
         } catch (error) {
@@ -40,9 +42,6 @@ class DynamicKnowledgeBaseApp {
                 });
             }
             
-            // Auto-refresh every 30 seconds
-            setInterval(() => this.checkForNewFiles(), 30000);
-            
             console.log('Event listeners set up successfully');
         } catch (error) {
             console.error('Error setting up event listeners:', error);
@@ -135,6 +134,99 @@ class DynamicKnowledgeBaseApp {
         }
     }
 
+    connectEvents() {
+        // Browsers without EventSource keep the old 30-second check
+        if (!window.EventSource) {
+            setInterval(() => this.checkForNewFiles(), 30000);
+            return;
+        }
+        
+        // EventSource reconnects by itself and resumes from the last event id it saw
+        const events = new EventSource(`${this.apiBaseUrl}/events`);
+        events.addEventListener('document.added', (event) => this.onDocumentEvent(event, true));
+        events.addEventListener('document.updated', (event) => this.onDocumentEvent(event, false));
+        events.addEventListener('document.deleted', (event) => {
+            this.removeKnowledgeCard(JSON.parse(event.data).filename);
+        });
+        events.addEventListener('resync', () => this.loadKnowledgeCards());
+        events.addEventListener('ready', () => {
+            // Changes made while the server was turning the stream away were never sent
+            if (this.eventsRefused) {
+                this.eventsRefused = false;
+                this.loadKnowledgeCards();
+            }
+        });
+        events.onerror = () => {
+            if (events.readyState !== EventSource.CLOSED) {
+                console.log('Event stream interrupted, reconnecting...');
+                return;
+            }
+            // The server has too many open streams (503) and EventSource gives up: check now, retry later
+            console.log('Event stream refused, retrying in 30 seconds');
+            this.eventsRefused = true;
+            this.checkForNewFiles();
+            setTimeout(() => this.connectEvents(), 30000);
+        };
+        this.events = events;
+    }
+
+    async onDocumentEvent(event, isNew) {
+        const { filename } = JSON.parse(event.data);
+        try {
+            // Fetch only the card that changed
+            const response = await fetch(`${this.apiBaseUrl}/knowledge-cards/${encodeURIComponent(filename)}`);
+            if (!response.ok) return;
+            
+            const data = await response.json();
+            if (data.success && data.card) {
+                this.upsertKnowledgeCard(data.card);
+                if (isNew) {
+                    const message = this.currentLanguage === 'en' 
+                        ? `New file added: ${data.card.title}` 
+                        : `เพิ่มไฟล์ใหม่: ${data.card.title}`;
+                    this.showNotification(message, 4000);
+                }
+            }
+        } catch (error) {
+            console.log('Could not load changed card:', error.message);
+        }
+    }
+
+    upsertKnowledgeCard(cardData) {
+        // Cards stay sorted by filename, the order the server lists them in
+        const cardsContainer = document.getElementById('cards-container');
+        if (!cardsContainer) return;
+        
+        const index = this.knowledgeCards.findIndex(card => card.filename === cardData.filename);
+        if (index !== -1) {
+            this.knowledgeCards[index] = cardData;
+            const card = cardsContainer.querySelectorAll('.knowledge-card')[index];
+            if (card) this.updateCardContent(card, cardData);
+            return;
+        }
+        
+        const emptyMessage = cardsContainer.querySelector('.no-cards');
+        if (emptyMessage) emptyMessage.remove();
+        
+        let position = this.knowledgeCards.findIndex(card => card.filename > cardData.filename);
+        if (position === -1) position = this.knowledgeCards.length;
+        this.knowledgeCards.splice(position, 0, cardData);
+        
+        const card = document.createElement('div');
+        card.className = 'knowledge-card';
+        this.updateCardContent(card, cardData);
+        cardsContainer.insertBefore(card, cardsContainer.querySelectorAll('.knowledge-card')[position] || null);
+    }
+
+    removeKnowledgeCard(filename) {
+        const index = this.knowledgeCards.findIndex(card => card.filename === filename);
+        if (index === -1) return;
+        
+        this.knowledgeCards.splice(index, 1);
+        const card = document.querySelectorAll('.knowledge-card')[index];
+        if (card) card.remove();
+    }
+
     async checkForNewFiles() {
         try {
             console.log('Checking for new files...');
@@ -4,6 +4,11 @@ Knowledge Base Flask App for Vercel Deployment
 Serverless version of the Knowledge Base system
 """
 
+import time
+
+# Cold start timing starts before the heavy imports
+STARTED_AT = time.perf_counter()
+
 from flask import Flask, request, jsonify, send_from_directory, send_file
 from flask_cors import CORS
 import os
@@ -15,13 +20,14 @@ from pathlib import Path
 import logging
 import tempfile
 import shutil
-
-# Import existing AI processing functionality
-try:
-    from groq import Groq
-    GROQ_AVAILABLE = True
-except ImportError:
-    GROQ_AVAILABLE = False
+from database.connection import ConnectionManager
+from database import repository
+from database.profiler import QueryProfiler
+from database.snapshot import SNAPSHOT_PATH, load_snapshot
+from catalog_cache import CatalogCache
+from compression import ResponseCompressor, StaticAssets
+from file_server import FileServer
+from llm_client import LazyGroqClient
 
 app = Flask(__name__)
 CORS(app, resources={
@@ -34,8 +40,15 @@ CORS(app, resources={
 
 # Configuration for Vercel
 DATABASE_PATH = '/tmp/knowledge_base.db'
+# Prebuilt by `python -m database.snapshot`; restored on cold start instead of an empty schema
+DATABASE_SNAPSHOT = os.getenv('DATABASE_SNAPSHOT', SNAPSHOT_PATH)
 DOCS_FOLDER = 'docs'
 PODCASTS_FOLDER = 'podcasts'
+# SQL profiling: per-statement timings at /api/db/profile, slow statements logged; off by default
+# because it aggregates every statement under a lock, turn it on while investigating
+SQL_PROFILE = os.getenv('SQL_PROFILE', 'false').lower() in ('1', 'true', 'yes')
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '100'))
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))  # bytes
 
 # Ensure temp directories exist
 os.makedirs('/tmp', exist_ok=True)
@@ -43,21 +56,21 @@ os.makedirs('/tmp', exist_ok=True)
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 
-# Initialize Groq client if available
-groq_client = None
-if GROQ_AVAILABLE:
-    groq_api_key = os.getenv('GROQ_API_KEY')
-    if groq_api_key:
-        try:
-            groq_client = Groq(api_key=groq_api_key)
-            print("Groq AI client initialized successfully")
-        except Exception as e:
-            print(f"Failed to initialize Groq client: {e}")
-            groq_client = None
+# Groq client, imported and constructed on the first AI call to keep cold starts fast
+groq_client = LazyGroqClient(os.getenv('GROQ_API_KEY'))
+
+# How this instance got its database, reported by /api/db/stats
+cold_start = {'database': 'existing'}
 
 def init_database():
-    """Initialize database with schema if not exists"""
+    """Restore the database snapshot, or initialize an empty schema, if no database exists"""
     if not os.path.exists(DATABASE_PATH):
+        loaded = load_snapshot(DATABASE_SNAPSHOT, DATABASE_PATH)
+        if loaded:
+            cold_start.update(loaded, database='snapshot')
+            return
+        
+        cold_start['database'] = 'schema'
         conn = sqlite3.connect(DATABASE_PATH, timeout=30.0)
         conn.row_factory = sqlite3.Row
         
@@ -73,57 +86,89 @@ def init_database():
         finally:
             conn.close()
 
+# List endpoint bodies, rebuilt only when the catalog version changes
+catalog_cache = CatalogCache()
+
+# Documents and podcasts with range requests and content-versioned caching
+file_server = FileServer()
+
+# gzip/brotli for API responses; the page itself is compressed once per cold start
+response_compressor = ResponseCompressor(min_size=COMPRESSION_MIN_SIZE)
+response_compressor.init_app(app)
+static_assets = StaticAssets('.', response_compressor)
+static_assets.preload(['index-enhanced.html'])
+
+def prepare_database():
+    """Create the database if needed, then bring its repository schema up to date"""
+    init_database()
+    repository.ensure_database(DATABASE_PATH)
+
+# Pooled connections, returned to the pool when each request's app context ends;
+# the database is prepared once, before the first connection, not per connection
+query_profiler = QueryProfiler(slow_ms=SLOW_QUERY_MS)
+db_pool = ConnectionManager(DATABASE_PATH, initializer=prepare_database,
+                            factory=query_profiler.connection_factory if SQL_PROFILE else sqlite3.Connection)
+db_pool.init_app(app)
+
 def get_db_connection():
-    """Get database connection"""
-    # Initialize database if it doesn't exist
-    if not os.path.exists(DATABASE_PATH):
-        init_database()
-    
-    conn = sqlite3.connect(DATABASE_PATH, timeout=30.0)
-    conn.row_factory = sqlite3.Row
-    conn.execute('PRAGMA journal_mode = WAL')
-    conn.execute('PRAGMA synchronous = NORMAL')
-    conn.execute('PRAGMA temp_store = memory')
-    conn.execute('PRAGMA mmap_size = 268435456')  # 256MB
-    return conn
+    """Get the calling thread's pooled database connection"""
+    return db_pool.connection()
+
+def requested_fields():
+    """Document fields selected by ?fields= and ?lang=, or None for whole documents"""
+    fields = request.args.get('fields')
+    names = [name.strip() for name in fields.split(',') if name.strip()] if fields else None
+    return repository.document_fields(names, request.args.get('lang'))
 
 @app.route('/')
 def index():
     """Serve the main application page"""
-    return send_file('index-enhanced.html')
+    return static_assets.send('index-enhanced.html')
+
+@app.route('/api/db/stats')
+def get_db_stats():
+    """Get connection pool statistics, plus hot query plans with ?plans=1"""
+    stats = {'pool': db_pool.stats(), 'catalog_cache': catalog_cache.stats(), 'cold_start': cold_start,
+             'compression': dict(response_compressor.stats(), static=static_assets.stats())}
+    if request.args.get('plans'):
+        conn = get_db_connection()
+        stats['query_plans'] = repository.hot_query_plans(conn)
+        conn.close()
+    return jsonify(stats)
+
+@app.route('/api/db/profile')
+def get_db_profile():
+    """Get the slowest SQL statements with their query plans"""
+    try:
+        conn = get_db_connection()
+        report = query_profiler.report(conn, top=request.args.get('top', 10, type=int))
+        conn.close()
+        return jsonify({'enabled': SQL_PROFILE, **report})
+    except Exception as e:
+        logging.error(f"Error building SQL profile: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/db/profile', methods=['DELETE'])
+def reset_db_profile():
+    """Start a fresh SQL profiling window"""
+    query_profiler.reset()
+    return jsonify({'success': True})
 
 @app.route('/api/documents')
 def get_documents():
-    """Get all documents with their tags"""
+    """Get all documents with their tags, limited to ?fields= and ?lang= if given"""
+    try:
+        fields = requested_fields()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get documents with tags and associated podcasts
-        cursor.execute("""
-            SELECT d.*, 
-                   GROUP_CONCAT(DISTINCT t.name) as tags, 
-                   GROUP_CONCAT(DISTINCT t.color) as tag_colors,
-                   p.filename as podcast_file
-            FROM documents d
-            LEFT JOIN document_tags dt ON d.id = dt.document_id
-            LEFT JOIN tags t ON dt.tag_id = t.id
-            LEFT JOIN podcasts p ON d.id = p.document_id
-            GROUP BY d.id
-            ORDER BY d.created_at DESC
-        """)
-        
-        documents = []
-        for row in cursor.fetchall():
-            doc = dict(row)
-            doc['tags'] = row['tags'].split(',') if row['tags'] else []
-            doc['tag_colors'] = row['tag_colors'].split(',') if row['tag_colors'] else []
-            doc['insights_en'] = json.loads(doc['insights_en']) if doc['insights_en'] else []
-            doc['insights_th'] = json.loads(doc['insights_th']) if doc['insights_th'] else []
-            documents.append(doc)
-        
+        key = 'documents' if fields is None else f"documents:{','.join(fields)}"
+        response = catalog_cache.respond(key, repository.catalog_version(conn),
+                                         lambda: repository.documents_json(conn, fields))
         conn.close()
-        return jsonify({'documents': documents})
+        return response
         
     except Exception as e:
         logging.error(f"Error fetching documents: {e}")
@@ -134,15 +179,27 @@ def get_tags():
     """Get all available tags"""
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM tags ORDER BY name")
-        tags = [dict(row) for row in cursor.fetchall()]
+        response = catalog_cache.respond('tags', repository.catalog_version(conn),
+                                         lambda: json.dumps({'tags': repository.list_tags(conn)}, ensure_ascii=False))
         conn.close()
-        return jsonify({'tags': tags})
+        return response
     except Exception as e:
         logging.error(f"Error fetching tags: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/changes')
+def get_changes():
+    """Get documents, tags and podcasts changed or deleted after catalog version ?since="""
+    since = request.args.get('since', type=int)
+    try:
+        conn = get_db_connection()
+        changes = repository.catalog_changes(conn, since)
+        conn.close()
+        return jsonify(changes)
+    except Exception as e:
+        logging.error(f"Error fetching changes: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/search')
 def search():
     """Search documents and podcasts"""
@@ -152,47 +209,14 @@ def search():
     if not query and not tags:
         return jsonify({'documents': [], 'podcasts': []})
     
+    try:
+        fields = requested_fields()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Search documents
-        doc_conditions = []
-        doc_params = []
-        
-        if query:
-            doc_conditions.append("""
-                (d.title LIKE ? OR d.summary_en LIKE ? OR d.detailed_summary_en LIKE ? 
-                 OR d.summary_th LIKE ? OR d.detailed_summary_th LIKE ?)
-            """)
-            search_param = f'%{query}%'
-            doc_params.extend([search_param] * 5)
-        
-        if tags:
-            placeholders = ','.join(['?' for _ in tags])
-            doc_conditions.append(f"t.name IN ({placeholders})")
-            doc_params.extend(tags)
-        
-        doc_query = f"""
-            SELECT DISTINCT d.*, GROUP_CONCAT(t.name) as tags, GROUP_CONCAT(t.color) as tag_colors
-            FROM documents d
-            LEFT JOIN document_tags dt ON d.id = dt.document_id
-            LEFT JOIN tags t ON dt.tag_id = t.id
-            WHERE {' AND '.join(doc_conditions) if doc_conditions else '1=1'}
-            GROUP BY d.id
-            ORDER BY d.created_at DESC
-        """
-        
-        cursor.execute(doc_query, doc_params)
-        documents = []
-        for row in cursor.fetchall():
-            doc = dict(row)
-            doc['tags'] = row['tags'].split(',') if row['tags'] else []
-            doc['tag_colors'] = row['tag_colors'].split(',') if row['tag_colors'] else []
-            doc['insights_en'] = json.loads(doc['insights_en']) if doc['insights_en'] else []
-            doc['insights_th'] = json.loads(doc['insights_th']) if doc['insights_th'] else []
-            documents.append(doc)
-        
+        documents = repository.search_documents(conn, query, tags, fields)
         conn.close()
         return jsonify({'documents': documents, 'podcasts': []})
         
@@ -209,12 +233,7 @@ def create_chat_session():
         session_id = str(uuid.uuid4())
         
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO chat_sessions (session_id) VALUES (?)
-        """, (session_id,))
-        
+        repository.create_chat_session(conn, session_id)
         conn.commit()
         conn.close()
         
@@ -238,51 +257,12 @@ def ask_thothkb(session_id):
         user_question = data['question']
         
         conn = get_db_connection()
-        cursor = conn.cursor()
         
         # Save user message
-        cursor.execute("""
-            INSERT INTO chat_messages (session_id, message_type, content)
-            VALUES (?, 'user', ?)
-        """, (session_id, user_question))
-        
-        # Search relevant documents using improved keyword matching
-        search_terms = user_question.lower().split()
-        search_conditions = []
-        search_params = []
-        
-        # Create individual search conditions for each term
-        for term in search_terms:
-            if len(term) >= 2:  # Skip very short terms
-                search_conditions.append("""
-                    LOWER(d.title || ' ' || COALESCE(d.summary_en, '') || ' ' || 
-                          COALESCE(d.detailed_summary_en, '') || ' ' || 
-                          COALESCE(d.summary_th, '') || ' ' || 
-                          COALESCE(d.detailed_summary_th, '')) LIKE ?
-                """)
-                search_params.append(f'%{term}%')
-        
-        # If no good search terms, search more broadly
-        if not search_conditions:
-            search_conditions.append("""
-                LOWER(d.title || ' ' || COALESCE(d.summary_en, '') || ' ' || 
-                      COALESCE(d.detailed_summary_en, '')) LIKE ?
-            """)
-            search_params.append(f'%{user_question.lower()}%')
-        
-        # Combine conditions with OR
-        where_clause = ' OR '.join(search_conditions)
-        
-        cursor.execute(f"""
-            SELECT d.id, d.title, d.summary_en, d.detailed_summary_en, d.insights_en,
-                   d.summary_th, d.detailed_summary_th, d.insights_th
-            FROM documents d
-            WHERE {where_clause}
-            ORDER BY d.created_at DESC
-            LIMIT 3
-        """, search_params)
+        repository.add_chat_message(conn, session_id, 'user', user_question)
         
-        relevant_docs = cursor.fetchall()
+        # Search relevant documents using keyword matching
+        relevant_docs = repository.find_relevant_documents(conn, user_question, limit=3)
         
         # Prepare context from relevant documents
         context = ""
@@ -341,10 +321,7 @@ def ask_thothkb(session_id):
         ai_response = completion.choices[0].message.content
         
         # Save AI response
-        cursor.execute("""
-            INSERT INTO chat_messages (session_id, message_type, content, sources)
-            VALUES (?, 'assistant', ?, ?)
-        """, (session_id, ai_response, json.dumps(source_ids)))
+        repository.add_chat_message(conn, session_id, 'assistant', ai_response, source_ids)
         
         conn.commit()
         conn.close()
@@ -361,12 +338,12 @@ def ask_thothkb(session_id):
 
 @app.route('/files/<path:filename>')
 def serve_file(filename):
-    """Serve uploaded files"""
+    """Serve uploaded files, redirecting plain links to immutable content-versioned ones"""
     try:
         if filename.startswith('docs/'):
-            return send_from_directory(DOCS_FOLDER, filename[5:])
+            return file_server.send(DOCS_FOLDER, filename[5:])
         elif filename.startswith('podcasts/'):
-            return send_from_directory(PODCASTS_FOLDER, filename[9:])
+            return file_server.send(PODCASTS_FOLDER, filename[9:])
         else:
             return "File not found", 404
     except Exception as e:
@@ -374,6 +351,10 @@ def serve_file(filename):
 
 # Initialize database on startup
 init_database()
+# Open the first pooled connection now so the first request does not pay for it
+db_pool.connection().close()
+cold_start['ready_ms'] = round((time.perf_counter() - STARTED_AT) * 1000, 3)
+logging.info(f"Cold start: database from {cold_start['database']}, ready in {cold_start['ready_ms']:.0f} ms")
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=int(os.environ.get('PORT', 8080)))
\ No newline at end of file
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for the production serving mode
+Starts serve.py on a copy of the database with the groq stub (benchmarks/stubs) standing in
+for the model, then keeps many chat questions in flight while timing document list
+requests, with browser tabs holding /api/events streams open all along. Fails when list
+requests slow past their budget behind the slow AI calls or the open streams, or when
+chat jobs are lost:
+
+    python benchmarks/concurrency.py [--chats 200] [--lists 400] [--llm-latency-ms 800]
+                                     [--event-streams 16] [--threads 32] [--workers 1]
+                                     [--list-p95-budget-ms 250]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from harness import ROOT, Client, Server, latency_summary
+
+_clients = threading.local()
+
+
+def client(base):
+    """This thread's keep-alive connection to the server"""
+    if getattr(_clients, 'client', None) is None:
+        _clients.client = Client(base)
+    return _clients.client
+
+
+def ask(base, session_id, index):
+    """One chat question via respond-async; returns (seconds until answered, final status)"""
+    start = time.perf_counter()
+    status, headers, body = client(base).request(f'/api/chat/{session_id}/ask', 'POST',
+                                                 {'question': f'Benchmark question {index}: what do the documents say?'},
+                                                 {'Prefer': 'respond-async'})
+    while status == 202:
+        time.sleep(float(headers.get('Retry-After', 1)) / 4)
+        status, headers, body = client(base).request(body.get('status_url') or f"/api/jobs/{body['job_id']}")
+    return time.perf_counter() - start, status
+
+
+def list_documents(base):
+    start = time.perf_counter()
+    status, _, _ = client(base).request('/api/documents?fields=title,tags')
+    return time.perf_counter() - start, status
+
+
+def open_event_streams(base, count):
+    """count /api/events streams held open like browser tabs; returns (open connections, statuses)"""
+    host, port = base.split('//', 1)[1].split(':')
+    streams, statuses = [], []
+    for _ in range(count):
+        conn = http.client.HTTPConnection(host, int(port), timeout=120)
+        conn.request('GET', '/api/events', headers={'Accept': 'text/event-stream'})
+        response = conn.getresponse()
+        statuses.append(response.status)
+        if response.status == 200:
+            streams.append(conn)  # left unread, the stream keeps its server thread
+        else:
+            response.read()
+            conn.close()
+    return streams, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--chats', type=int, default=200, help='chat questions kept in flight')
+    parser.add_argument('--lists', type=int, default=400, help='document list requests timed meanwhile')
+    parser.add_argument('--llm-latency-ms', type=float, default=800, help='stubbed model latency')
+    parser.add_argument('--llm-workers', type=int, default=8)
+    parser.add_argument('--event-streams', type=int, default=16,
+                        help='SSE clients kept open; past a quarter of --threads they are refused')
+    parser.add_argument('--threads', type=int, default=32, help='server request threads')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--server', choices=('auto', 'gunicorn', 'waitress'), default='auto')
+    parser.add_argument('--list-p95-budget-ms', type=float, default=250)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    server = Server(os.path.join(ROOT, 'database', 'knowledge_base.db'), llm_latency_ms=args.llm_latency_ms,
+                    threads=args.threads, workers=args.workers, server=args.server,
+                    env={'LLM_WORKERS': str(args.llm_workers)})
+    with server:
+        _, _, session = Client(server.base).request('/api/chat/session', 'POST', {})
+        session_id = session['session_id']
+        streams, stream_statuses = open_event_streams(server.base, args.event_streams)
+
+        try:
+            with ThreadPoolExecutor(max_workers=64) as chat_pool, ThreadPoolExecutor(max_workers=8) as list_pool:
+                chats = [chat_pool.submit(ask, server.base, session_id, i) for i in range(args.chats)]
+                time.sleep(0.5)  # let the questions queue up before timing lists behind them
+                lists = [list_pool.submit(list_documents, server.base) for _ in range(args.lists)]
+                list_results = [future.result() for future in lists]
+                chat_results = [future.result() for future in chats]
+
+            _, _, stats = Client(server.base).request('/api/db/stats')
+        finally:
+            for conn in streams:
+                conn.close()
+
+    results = {
+        'lists': dict(latency_summary([seconds for seconds, _ in list_results]),
+                      errors=sum(status != 200 for _, status in list_results)),
+        'chats': dict(latency_summary([seconds for seconds, _ in chat_results]),
+                      errors=sum(status != 200 for _, status in chat_results)),
+        'event_streams': {
+            'requested': args.event_streams,
+            'open': stream_statuses.count(200),
+            'refused': stream_statuses.count(503),
+            'other': sum(status not in (200, 503) for status in stream_statuses)
+        },
+        'llm_jobs': stats.get('llm_jobs')
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    if results['lists']['p95_ms'] > args.list_p95_budget_ms:
+        failures.append(f"list p95 {results['lists']['p95_ms']} ms > {args.list_p95_budget_ms:.0f} ms")
+    if results['lists']['errors']:
+        failures.append(f"{results['lists']['errors']} list requests failed")
+    if results['chats']['errors']:
+        failures.append(f"{results['chats']['errors']} chat questions failed")
+    if args.event_streams and not results['event_streams']['open']:
+        failures.append("no event stream was served")
+    if results['event_streams']['other']:
+        failures.append(f"{results['event_streams']['other']} event streams failed")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
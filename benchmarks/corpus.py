@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Synthetic knowledge base for the load tests
+Builds a scratch database from database/schema.sql holding N documents with English and
+Thai summaries and insights, tag links, linked podcasts, quizzes and chat sessions. Text
+is drawn from a fixed vocabulary with a seeded generator, so the same N always gives the
+same corpus:
+
+    python benchmarks/corpus.py --documents 100000 corpus.db
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from database import repository  # noqa: E402
+
+SCHEMA_PATH = os.path.join(ROOT, 'database', 'schema.sql')
+
+ENGLISH_WORDS = (
+    'steel', 'ladle', 'furnace', 'sensor', 'temperature', 'quality', 'defect', 'process', 'optimization',
+    'efficiency', 'maintenance', 'predictive', 'model', 'neural', 'network', 'algorithm', 'data', 'analysis',
+    'production', 'industrial', 'control', 'vibration', 'casting', 'rolling', 'energy', 'yield', 'scrap',
+    'inspection', 'vision', 'anomaly', 'forecast', 'throughput', 'downtime', 'calibration', 'alloy', 'research'
+)
+THAI_WORDS = (
+    'เหล็ก', 'เตาหลอม', 'เซนเซอร์', 'อุณหภูมิ', 'คุณภาพ', 'ข้อบกพร่อง', 'กระบวนการ', 'การปรับปรุง',
+    'ประสิทธิภาพ', 'การบำรุงรักษา', 'การพยากรณ์', 'แบบจำลอง', 'โครงข่าย', 'อัลกอริทึม', 'ข้อมูล',
+    'การวิเคราะห์', 'การผลิต', 'อุตสาหกรรม', 'การควบคุม', 'การสั่นสะเทือน', 'พลังงาน', 'การตรวจสอบ'
+)
+EXTRA_TAGS = 40           # tags beyond the schema's defaults
+QUIZ_SHARE = 0.1          # documents with a quiz
+PODCAST_SHARE = 0.25      # documents with a linked podcast
+SESSIONS_PER_DOCUMENT = 0.05
+TURNS_PER_SESSION = 3
+BATCH = 5000              # rows per executemany
+
+
+def sentence(rng, words, length):
+    return ' '.join(rng.choice(words) for _ in range(length))
+
+
+def document_row(rng, index):
+    title = f"{sentence(rng, ENGLISH_WORDS, 4).title()} {index}"
+    filename = f"synthetic_{index:07d}.pdf"
+    return (
+        filename, filename, title, 'PDF', rng.randint(50_000, 5_000_000), f"docs/{filename}",
+        sentence(rng, ENGLISH_WORDS, 18), sentence(rng, THAI_WORDS, 14),
+        sentence(rng, ENGLISH_WORDS, 60), sentence(rng, THAI_WORDS, 45),
+        json.dumps([sentence(rng, ENGLISH_WORDS, 8) for _ in range(3)]),
+        json.dumps([sentence(rng, THAI_WORDS, 6) for _ in range(3)], ensure_ascii=False),
+        f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00",
+        True, True
+    )
+
+
+def batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build(path, documents, seed=1):
+    """Write a corpus of the given size to a new database at path; returns row counts"""
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    try:
+        with open(SCHEMA_PATH, encoding='utf-8') as f:
+            conn.executescript(f.read())
+        repository.ensure_schema(conn)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = OFF')
+
+        conn.executemany("INSERT INTO tags (name, color) VALUES (?, ?)",
+                         [(f"Topic {i:02d}", f"#{rng.randrange(0x1000000):06X}") for i in range(EXTRA_TAGS)])
+        tag_ids = [row[0] for row in conn.execute("SELECT id FROM tags")]
+
+        for batch in batches(document_row(rng, i) for i in range(1, documents + 1)):
+            conn.executemany("""
+                INSERT INTO documents
+                (filename, original_filename, title, file_type, file_size, file_path,
+                 summary_en, summary_th, detailed_summary_en, detailed_summary_th,
+                 insights_en, insights_th, created_at, is_processed, groq_processed)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, batch)
+        document_ids = [row[0] for row in conn.execute("SELECT id FROM documents ORDER BY id")]
+
+        links = ((document_id, tag_id) for document_id in document_ids
+                 for tag_id in rng.sample(tag_ids, rng.randint(1, 3)))
+        for batch in batches(links):
+            conn.executemany("INSERT OR IGNORE INTO document_tags (document_id, tag_id) VALUES (?, ?)", batch)
+
+        podcasts = ((f"synthetic_{document_id:07d}.mp3", f"synthetic_{document_id:07d}.mp3",
+                     f"Podcast {document_id}", 'MP3', rng.randint(1_000_000, 40_000_000),
+                     f"podcasts/synthetic_{document_id:07d}.mp3", rng.randint(300, 3600), document_id)
+                    for document_id in document_ids if rng.random() < PODCAST_SHARE)
+        for batch in batches(podcasts):
+            conn.executemany("""
+                INSERT INTO podcasts (filename, original_filename, title, file_type, file_size, file_path,
+                                      duration, document_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, batch)
+
+        quiz_documents = [document_id for document_id in document_ids if rng.random() < QUIZ_SHARE]
+        for document_id in quiz_documents:
+            quiz_id = conn.execute("INSERT INTO quizzes (document_id, title, description) VALUES (?, ?, ?)",
+                                   (document_id, f"Quiz {document_id}", 'Synthetic quiz')).lastrowid
+            conn.executemany("""
+                INSERT INTO quiz_questions (quiz_id, question_text, option_a, option_b, option_c, option_d,
+                                            correct_answer, explanation, question_order)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(quiz_id, sentence(rng, ENGLISH_WORDS, 8) + '?', 'One', 'Two', 'Three', 'Four',
+                   rng.choice('ABCD'), sentence(rng, ENGLISH_WORDS, 6), order) for order in range(1, 11)])
+
+        sessions = max(1, int(documents * SESSIONS_PER_DOCUMENT))
+        for i in range(sessions):
+            session_id = f"synthetic-{i:08d}"
+            conn.execute("INSERT INTO chat_sessions (session_id) VALUES (?)", (session_id,))
+            messages = []
+            for _ in range(TURNS_PER_SESSION):
+                messages.append((session_id, 'user', sentence(rng, ENGLISH_WORDS, 8) + '?', None))
+                messages.append((session_id, 'assistant', sentence(rng, THAI_WORDS, 30),
+                                 json.dumps(rng.sample(document_ids, min(3, len(document_ids))))))
+            conn.executemany("INSERT INTO chat_messages (session_id, message_type, content, sources) "
+                             "VALUES (?, ?, ?, ?)", messages)
+
+        conn.commit()
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('documents', 'tags', 'document_tags', 'podcasts', 'quizzes', 'chat_sessions')}
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--documents', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('path', help='database file to create (replaced if it exists)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = build(args.path, args.documents, args.seed)
+    print(f"{args.path}: {json.dumps(counts)} in {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
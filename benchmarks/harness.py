@@ -0,0 +1,142 @@
+"""
+Shared pieces of the HTTP benchmarks
+Starts serve.py on a scratch copy of a database with the groq stub (benchmarks/stubs)
+standing in for the model, and provides a keep-alive JSON client and percentile helpers.
+"""
+
+import http.client
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUBS = os.path.join(ROOT, 'benchmarks', 'stubs')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else None
+
+
+def latency_summary(seconds):
+    """Count and p50/p95/p99/max in milliseconds of a list of durations in seconds"""
+    ms = [value * 1000 for value in seconds]
+    return {
+        'requests': len(ms),
+        'p50_ms': round(percentile(ms, 0.50), 1) if ms else None,
+        'p95_ms': round(percentile(ms, 0.95), 1) if ms else None,
+        'p99_ms': round(percentile(ms, 0.99), 1) if ms else None,
+        'max_ms': round(max(ms), 1) if ms else None
+    }
+
+
+class Client:
+    """One keep-alive HTTP connection, reopened after errors; not thread-safe"""
+
+    def __init__(self, base):
+        self.host, self.port = base.split('//', 1)[1].split(':')
+        self._conn = None
+
+    def request(self, path, method='GET', body=None, headers=None, raw=None, parse=True):
+        """(status, headers, parsed JSON body); raw sends bytes as they are
+
+        parse=False skips decoding the reply, which for large lists would make the load
+        generator, not the server, the bottleneck.
+        """
+        headers = dict(headers or {})
+        data = raw
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, int(self.port), timeout=120)
+            try:
+                self._conn.request(method, path, body=data, headers=headers)
+                response = self._conn.getresponse()
+                payload = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                self._conn.close()
+                self._conn = None
+                if attempt:
+                    raise
+        if not parse:
+            return response.status, response.headers, None
+        try:
+            parsed = json.loads(payload) if payload else None
+        except ValueError:
+            parsed = None
+        return response.status, response.headers, parsed
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class Server:
+    """serve.py running server_enhanced in a scratch directory with the stubbed model"""
+
+    def __init__(self, database, llm_latency_ms=800, threads=32, workers=1, server='auto', env=None):
+        self.workdir = tempfile.mkdtemp(prefix='kb-bench-')
+        os.makedirs(os.path.join(self.workdir, 'database'))
+        shutil.copy(database, os.path.join(self.workdir, 'database', 'knowledge_base.db'))
+        self.port = free_port()
+        self.base = f'http://127.0.0.1:{self.port}'
+        # Every benchmark client shares one address, so per-client rate limits are off unless given
+        self.env = dict(os.environ, PYTHONPATH=os.pathsep.join([STUBS, ROOT]), GROQ_API_KEY='stub',
+                        STUB_LLM_LATENCY_MS=str(llm_latency_ms), RATE_LIMITS='', **(env or {}))
+        self.args = ['--host', '127.0.0.1', '--port', str(self.port), '--workers', str(workers),
+                     '--threads', str(threads), '--server', server]
+        self.log_path = os.path.join(self.workdir, 'server.log')  # a file: a full pipe would stall the server
+        self.process = None
+
+    def start(self, timeout=60):
+        with open(self.log_path, 'wb') as log:
+            self.process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'serve.py'), 'server_enhanced'] + self.args,
+                                            cwd=self.workdir, env=self.env, stdout=log, stderr=subprocess.STDOUT)
+        client = Client(self.base)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"server exited:\n{self.log_tail()}")
+            try:
+                client.request('/api/tags')
+                client.close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f'server did not start within {timeout} s')
+
+    def log_tail(self, size=2000):
+        with open(self.log_path, 'rb') as f:
+            return f.read().decode(errors='replace')[-size:]
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
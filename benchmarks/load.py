@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Load test for server_enhanced with a synthetic corpus and a stubbed model
+For each corpus size, builds a synthetic database (benchmarks/corpus.py), serves it with
+serve.py and the groq stub, and runs closed-loop clients that pick operations from a
+weighted mix: document lists, searches, chat questions, quiz submissions and uploads.
+Reports throughput and p50/p95/p99 latency per operation and corpus size:
+
+    python benchmarks/load.py [--documents 10,1000,100000] [--mix documents=50,search=25,ask=10,submit=10,upload=5]
+                              [--concurrency 16] [--seconds 30] [--llm-latency-ms 500] [--output load.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import quote
+
+import corpus
+from harness import Client, Server, latency_summary
+
+DEFAULT_MIX = 'documents=50,search=25,ask=10,submit=10,upload=5'
+# Projection the main page requests for its card grid
+CARD_FIELDS = 'title,file_type,created_at,file_path,tags,tag_colors,podcast_file,summary,detailed_summary,insights'
+
+
+def synthetic_pdf(text):
+    """Smallest single-page PDF whose text PyPDF2 can extract"""
+    stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode('latin-1')
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return pdf
+
+
+class Workload:
+    """The operations of the mix, drawing ids from the corpus they run against"""
+
+    def __init__(self, database, seed=1):
+        conn = sqlite3.connect(database)
+        try:
+            self.sessions = [row[0] for row in conn.execute("SELECT session_id FROM chat_sessions LIMIT 1000")]
+            self.quizzes = {}
+            for quiz_id, question_id in conn.execute("""
+                SELECT quiz_id, id FROM quiz_questions
+                WHERE quiz_id IN (SELECT id FROM quizzes ORDER BY id LIMIT 1000)
+            """):
+                self.quizzes.setdefault(quiz_id, []).append(question_id)
+        finally:
+            conn.close()
+        self.quiz_ids = sorted(self.quizzes)
+        self.seed = seed
+
+    def documents(self, client, rng):
+        return client.request(f'/api/documents?fields={CARD_FIELDS}', parse=False)[0]
+
+    def search(self, client, rng):
+        query = quote(rng.choice(corpus.ENGLISH_WORDS))
+        return client.request(f'/api/search?q={query}&fields={CARD_FIELDS}', parse=False)[0]
+
+    def ask(self, client, rng):
+        """Chat question through the async job API, timed until the answer is available"""
+        question = f"{corpus.sentence(rng, corpus.ENGLISH_WORDS, 6)} {uuid.uuid4().hex[:6]}?"
+        status, headers, body = client.request(f'/api/chat/{rng.choice(self.sessions)}/ask', 'POST',
+                                               {'question': question}, {'Prefer': 'respond-async'})
+        while status == 202:
+            time.sleep(float(headers.get('Retry-After', 1)) / 4)
+            status, headers, body = client.request(body.get('status_url') or f"/api/jobs/{body['job_id']}")
+        return status
+
+    def submit(self, client, rng):
+        if not self.quiz_ids:
+            return None
+        quiz_id = rng.choice(self.quiz_ids)
+        answers = {str(question_id): rng.choice('ABCD') for question_id in self.quizzes[quiz_id]}
+        return client.request(f'/api/quiz/{quiz_id}/submit', 'POST', {'answers': answers}, parse=False)[0]
+
+    def upload(self, client, rng):
+        name = f"load_{uuid.uuid4().hex[:12]}.pdf"
+        boundary = uuid.uuid4().hex
+        pdf = synthetic_pdf(corpus.sentence(rng, corpus.ENGLISH_WORDS, 40))
+        body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{name}"\r\n'
+                f'Content-Type: application/pdf\r\n\r\n').encode() + pdf + f'\r\n--{boundary}--\r\n'.encode()
+        return client.request('/api/upload/document', 'POST', raw=body, parse=False,
+                              headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})[0]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if not hasattr(Workload, name) or name.startswith('_'):
+            raise ValueError(f"Unknown operation in mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def run_load(base, workload, mix, concurrency, seconds, warmup):
+    """Closed-loop clients for warmup + seconds; returns {operation: [(seconds, status)]} after warmup"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    results = {name: [] for name in names}
+    lock = threading.Lock()
+    measure_from = time.monotonic() + warmup
+    stop_at = measure_from + seconds
+
+    def worker(index):
+        rng = random.Random(workload.seed * 1000 + index)
+        client = Client(base)
+        try:
+            while time.monotonic() < stop_at:
+                name = rng.choices(names, weights)[0]
+                start = time.monotonic()
+                try:
+                    status = getattr(workload, name)(client, rng)
+                except OSError:
+                    status = 0
+                if status is None or start < measure_from:
+                    continue
+                with lock:
+                    results[name].append((time.monotonic() - start, status))
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def report(results, seconds):
+    summary = {}
+    for name, samples in results.items():
+        entry = latency_summary([duration for duration, _ in samples])
+        entry['throughput_rps'] = round(len(samples) / seconds, 1)
+        entry['errors'] = sum(not 200 <= status < 300 for _, status in samples)
+        summary[name] = entry
+    total = sum(len(samples) for samples in results.values())
+    summary['total'] = {'requests': total, 'throughput_rps': round(total / seconds, 1),
+                        'errors': sum(entry['errors'] for entry in summary.values())}
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--documents', default='1000', help='comma-separated corpus sizes, e.g. 10,1000,100000')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='operation=weight pairs')
+    parser.add_argument('--concurrency', type=int, default=16, help='closed-loop client threads')
+    parser.add_argument('--seconds', type=float, default=30, help='measured duration per corpus size')
+    parser.add_argument('--warmup', type=float, default=3, help='seconds run before measuring')
+    parser.add_argument('--llm-latency-ms', type=float, default=500, help='stubbed model latency')
+    parser.add_argument('--threads', type=int, default=32, help='server request threads')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--server', choices=('auto', 'gunicorn', 'waitress'), default='auto')
+    parser.add_argument('--corpus-dir', help='where generated corpora are kept and reused (default: system temp)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--max-error-rate', type=float, default=0.01, help='fail above this share of errors')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    sizes = [int(size) for size in args.documents.split(',')]
+    corpus_dir = args.corpus_dir or os.path.join(tempfile.gettempdir(), 'kb-load-corpus')
+    os.makedirs(corpus_dir, exist_ok=True)
+
+    results = {}
+    failures = []
+    for size in sizes:
+        database = os.path.join(corpus_dir, f'corpus_{size}_{args.seed}.db')
+        if not os.path.exists(database):
+            start = time.perf_counter()
+            corpus.build(database, size, args.seed)
+            print(f"built {size}-document corpus in {time.perf_counter() - start:.1f} s")
+
+        workload = Workload(database, args.seed)
+        server = Server(database, llm_latency_ms=args.llm_latency_ms, threads=args.threads,
+                        workers=args.workers, server=args.server)
+        with server:
+            samples = run_load(server.base, workload, mix, args.concurrency, args.seconds, args.warmup)
+            _, _, stats = Client(server.base).request('/api/db/stats')
+        summary = report(samples, args.seconds)
+        summary['server'] = {'writer_queue_peak': stats['writer'].get('peak_queue_depth'),
+                             'llm_jobs_peak_pending': stats['llm_jobs']['peak_pending']}
+        results[size] = summary
+
+        print(f"\n{size} documents, {args.concurrency} clients, {args.seconds:.0f} s")
+        print(f"  {'operation':<10} {'requests':>8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for name in mix:
+            entry = summary[name]
+            print(f"  {name:<10} {entry['requests']:>8} {entry['throughput_rps']:>8} {entry['p50_ms'] or '-':>9} "
+                  f"{entry['p95_ms'] or '-':>9} {entry['p99_ms'] or '-':>9} {entry['errors']:>7}")
+        total = summary['total']
+        print(f"  {'total':<10} {total['requests']:>8} {total['throughput_rps']:>8} {'':>29} {total['errors']:>7}")
+        if total['requests'] and total['errors'] / total['requests'] > args.max_error_rate:
+            failures.append(f"{size} documents: {total['errors']} of {total['requests']} requests failed")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
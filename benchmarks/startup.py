@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Startup time benchmark for the server entry points
+Imports each entry point in a fresh interpreter with -X importtime, records the cumulative
+import time of the entry module and of each of its direct imports, and fails when an entry
+point goes over its budget or loads a dependency that is meant to be imported on first use:
+
+    python benchmarks/startup.py [--runs 5] [--output startup.json] [--budget-scale 1.5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry module -> budget in milliseconds for importing it, module body included
+BUDGETS_MS = {
+    'server_enhanced': 600,
+    'app': 500,
+    'api.app': 500,
+    'server': 450,
+}
+
+# Heavy dependencies the entry points load on first use, never at startup
+LAZY_MODULES = ('groq', 'PyPDF2')
+
+
+def parse_importtime(stderr):
+    """[(depth, module, self_us, cumulative_us)] from -X importtime output, in print order"""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        records.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+    return records
+
+
+def measure(module):
+    """Import module once in a fresh interpreter; returns (total_ms, direct imports in ms, all modules)"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+
+    records = parse_importtime(result.stderr)
+    total_us = next(cumulative for depth, name, _, cumulative in reversed(records)
+                    if depth == 0 and name == module)
+    direct = {name: cumulative / 1000 for depth, name, _, cumulative in records if depth == 1}
+    return total_us / 1000, direct, {name for _, name, _, _ in records}
+
+
+def benchmark(module, runs):
+    totals = []
+    direct_runs = []
+    loaded = set()
+    for _ in range(runs):
+        total, direct, modules = measure(module)
+        totals.append(total)
+        direct_runs.append(direct)
+        loaded |= modules
+
+    names = set().union(*direct_runs)
+    direct = {name: round(statistics.median(run.get(name, 0.0) for run in direct_runs), 3) for name in names}
+    return {
+        'median_ms': round(statistics.median(totals), 3),
+        'min_ms': round(min(totals), 3),
+        'max_ms': round(max(totals), 3),
+        'heaviest_imports': dict(sorted(direct.items(), key=lambda item: item[1], reverse=True)[:8]),
+        'lazy_modules_loaded': sorted({name.split('.')[0] for name in loaded} & set(LAZY_MODULES))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per entry point')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--budget-scale', type=float, default=1.0,
+                        help='multiply every budget, e.g. on slower CI machines')
+    parser.add_argument('modules', nargs='*', default=list(BUDGETS_MS), help='entry modules to measure')
+    args = parser.parse_args()
+
+    results = {}
+    failures = []
+    for module in args.modules:
+        budget = BUDGETS_MS.get(module, max(BUDGETS_MS.values())) * args.budget_scale
+        result = benchmark(module, args.runs)
+        result['budget_ms'] = budget
+        results[module] = result
+
+        status = 'ok'
+        if result['median_ms'] > budget:
+            status = 'OVER BUDGET'
+            failures.append(f"{module}: {result['median_ms']:.0f} ms > {budget:.0f} ms")
+        if result['lazy_modules_loaded']:
+            status = 'EAGER IMPORT'
+            failures.append(f"{module} imports {', '.join(result['lazy_modules_loaded'])} at startup")
+
+        print(f"{module:<16} {result['median_ms']:>8.1f} ms  (budget {budget:.0f} ms)  {status}")
+        for name, ms in result['heaviest_imports'].items():
+            print(f"    {ms:>8.1f} ms  {name}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
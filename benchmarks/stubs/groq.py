@@ -0,0 +1,84 @@
+"""
+Stand-in for the groq package used by the benchmarks
+Put benchmarks/stubs on PYTHONPATH to serve the app without network access or an API key.
+Every completion sleeps STUB_LLM_LATENCY_MS to model the real model's latency and returns a
+canned reply in the shape the prompt asks for (document summary, Thai translation, quiz or
+chat answer); stream=True yields it in chunks.
+"""
+
+import json
+import os
+import time
+from types import SimpleNamespace
+
+LATENCY_MS = float(os.getenv('STUB_LLM_LATENCY_MS', '800'))
+STREAM_CHUNK = 32  # characters per streamed chunk
+
+QUIZ = json.dumps({
+    'title': 'Benchmark quiz',
+    'description': 'Generated by the benchmark stub',
+    'questions': [{
+        'question': f'Question {i}?',
+        'options': {'A': 'One', 'B': 'Two', 'C': 'Three', 'D': 'Four'},
+        'correct_answer': 'ABCD'[i % 4],
+        'explanation': 'Stub explanation'
+    } for i in range(1, 11)]
+}, ensure_ascii=False)
+
+SUMMARY = json.dumps({
+    'title': 'Benchmark document on process optimization',
+    'summary_en_short': 'A study of production quality control with machine learning.',
+    'summary_en_detailed': 'The research analyses sensor data from an industrial process and proposes an '
+                           'algorithm that improves efficiency and reduces defects.',
+    'summary_th_short': 'งานวิจัยการควบคุมคุณภาพการผลิตด้วยการเรียนรู้ของเครื่อง',
+    'summary_th_detailed': 'งานวิจัยวิเคราะห์ข้อมูลเซนเซอร์จากกระบวนการอุตสาหกรรมและเสนออัลกอริทึมที่เพิ่มประสิทธิภาพ',
+    'insights_en': ['Sensor data predicts defects', 'Process efficiency improves'],
+    'insights_th': ['ข้อมูลเซนเซอร์ทำนายข้อบกพร่องได้', 'ประสิทธิภาพกระบวนการดีขึ้น']
+}, ensure_ascii=False)
+
+TRANSLATION = json.dumps({
+    'summary_th_short': 'สรุปภาษาไทยสำหรับการทดสอบ',
+    'summary_th_detailed': 'สรุปภาษาไทยแบบละเอียดสำหรับการทดสอบประสิทธิภาพ',
+    'insights_th': ['ข้อสังเกตที่หนึ่ง', 'ข้อสังเกตที่สอง']
+}, ensure_ascii=False)
+
+ANSWER = 'Stub answer from the benchmark model, citing the documents in the context above.'
+
+
+def _reply(messages):
+    prompt = ' '.join(str(message.get('content', '')) for message in messages)
+    if '"summary_en_short"' in prompt:
+        return SUMMARY
+    if '"summary_th_short"' in prompt:
+        return TRANSLATION
+    if '"questions"' in prompt or 'quiz' in prompt.lower():
+        return QUIZ
+    return ANSWER
+
+
+def _completion(text):
+    message = SimpleNamespace(content=text, role='assistant')
+    choice = SimpleNamespace(message=message, delta=message, finish_reason='stop', index=0)
+    usage = SimpleNamespace(prompt_tokens=0, completion_tokens=len(text) // 4, total_tokens=len(text) // 4)
+    return SimpleNamespace(choices=[choice], usage=usage)
+
+
+class _Completions:
+    def create(self, messages, stream=False, **kwargs):
+        text = _reply(messages)
+        if not stream:
+            time.sleep(LATENCY_MS / 1000)
+            return _completion(text)
+        return self._stream(text)
+
+    def _stream(self, text):
+        chunks = [text[i:i + STREAM_CHUNK] for i in range(0, len(text), STREAM_CHUNK)]
+        for chunk in chunks:
+            time.sleep(LATENCY_MS / 1000 / len(chunks))
+            yield _completion(chunk)
+
+
+class Groq:
+    def __init__(self, api_key=None, **kwargs):
+        self.api_key = api_key
+        self.chat = SimpleNamespace(completions=_Completions())
@@ -0,0 +1,81 @@
+"""
+Pre-serialized list responses with conditional GET support
+Bodies are built once per catalog version and served with a strong ETag, so polls
+that find nothing changed are answered with 304 Not Modified without touching the data.
+Requests arriving while a body is being rebuilt wait for that build instead of starting their own.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+
+from single_flight import SingleFlight
+
+
+class CatalogCache:
+    """Serialized response bodies keyed by endpoint, rebuilt only when the catalog version changes"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries  # keys include field projections, so bound them
+        self._entries = OrderedDict()   # key -> (version, etag, body bytes), least recently used first
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'builds': 0, 'not_modified': 0}
+        self._flights = SingleFlight()  # concurrent misses for one key and version share a build
+
+    def get(self, key, version, build):
+        """(etag, body) for the given version, calling build() -> str when it is not cached"""
+        cached = self._cached(key, version)
+        if cached is not None:
+            return cached
+        return self._flights.do((key, version), self._build, key, version, build)
+
+    def _cached(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[1], entry[2]
+        return None
+
+    def _build(self, key, version, build):
+        # A build that finished just before this flight started has already stored the body
+        cached = self._cached(key, version)
+        if cached is not None:
+            return cached
+
+        body = build().encode('utf-8')
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        with self._lock:
+            self._entries[key] = (version, etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._stats['builds'] += 1
+        return etag, body
+
+    def respond(self, key, version, build, mimetype='application/json'):
+        """Response for the current request, 304 when the client's If-None-Match still matches"""
+        etag, body = self.get(key, version, build)
+        if request.if_none_match.contains_weak(etag):  # compressed bodies carry the weak form
+            with self._lock:
+                self._stats['not_modified'] += 1
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype=mimetype)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'  # always revalidate, never serve stale
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        stats['shared_builds'] = self._flights.stats()['shared']
+        return stats
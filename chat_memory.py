@@ -0,0 +1,170 @@
+"""
+Bounded conversation memory for ThothKB chat
+Keeps the latest turns verbatim and folds older ones into a rolling per-session summary,
+so the history part of the prompt has a fixed size however long the session runs.
+Folds run on a small pool: the messages are read, the connection is given back, and only
+then is the model asked for the new summary, which is stored through write_fn.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MEMORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_summaries (
+    session_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL DEFAULT '',
+    summarized_through INTEGER NOT NULL DEFAULT 0, -- last chat_messages.id folded into the summary
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (session_id) REFERENCES chat_sessions(session_id) ON DELETE CASCADE
+);
+"""
+
+
+def ensure_memory_schema(conn):
+    """Create the summary table on databases that predate it"""
+    conn.executescript(MEMORY_SCHEMA)
+
+
+def save_summary(conn, session_id, summary, through):
+    """Store a session's summary unless a fold that reached further already stored one"""
+    conn.execute("""
+        INSERT INTO chat_summaries (session_id, summary, summarized_through, updated_at)
+        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(session_id) DO UPDATE SET
+            summary = excluded.summary,
+            summarized_through = excluded.summarized_through,
+            updated_at = excluded.updated_at
+        WHERE chat_summaries.summarized_through < excluded.summarized_through
+    """, (session_id, summary, through))
+
+
+def clip(text, limit):
+    """Truncate text to a character budget"""
+    text = text or ''
+    return text if len(text) <= limit else text[:limit - 3] + '...'
+
+
+class ConversationMemory:
+    """Recent turns verbatim plus an incrementally updated summary of everything older"""
+
+    def __init__(self, connect, summarize_fn, write_fn=None, recent_turns=3, fold_turns=2,
+                 max_message_chars=600, max_summary_chars=1200, workers=2, max_pending=100):
+        self.connect = connect            # returns a configured sqlite3 connection
+        self.summarize_fn = summarize_fn  # (previous_summary, transcript) -> new summary
+        self.write_fn = write_fn          # write_fn(fn, *args) commits fn(conn, *args); None: write directly
+        self.recent_turns = recent_turns
+        self.fold_turns = fold_turns      # turns allowed to accumulate before folding, to batch LLM calls
+        self.max_message_chars = max_message_chars
+        self.max_summary_chars = max_summary_chars
+        self.max_pending = max_pending    # sessions waiting for a fold at most; others fold on a later turn
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chat-memory')
+        self._folding = set()
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    @property
+    def max_history_chars(self):
+        """Upper bound on the characters of history added to any prompt"""
+        max_messages = (self.recent_turns + self.fold_turns) * 2
+        return self.max_summary_chars + max_messages * self.max_message_chars
+
+    def history_messages(self, cursor, session_id):
+        """Chat-completion messages carrying the session history, oldest first"""
+        self._ensure_schema(cursor.connection)
+
+        cursor.execute("SELECT summary, summarized_through FROM chat_summaries WHERE session_id = ?", (session_id,))
+        row = cursor.fetchone()
+        summary, through = (row[0], row[1]) if row else ('', 0)
+
+        # Unfolded messages never exceed recent + fold turns; anything older is being folded
+        cursor.execute("""
+            SELECT message_type, content FROM chat_messages
+            WHERE session_id = ? AND id > ?
+            ORDER BY id DESC
+            LIMIT ?
+        """, (session_id, through, (self.recent_turns + self.fold_turns) * 2))
+        recent = list(reversed(cursor.fetchall()))
+
+        messages = []
+        if summary:
+            messages.append({
+                "role": "system",
+                "content": f"สรุปบทสนทนาก่อนหน้า: {clip(summary, self.max_summary_chars)}"
+            })
+        for message_type, content in recent:
+            messages.append({"role": message_type, "content": clip(content, self.max_message_chars)})
+        return messages
+
+    def schedule_fold(self, session_id):
+        """Fold overflowing turns into the summary on the fold pool; returns its Future or None"""
+        with self._lock:
+            if session_id in self._folding or len(self._folding) >= self.max_pending:
+                return None
+            self._folding.add(session_id)
+        try:
+            return self._executor.submit(self._fold_and_release, session_id)
+        except RuntimeError:  # shut down; e.g. a chat answer finishing during shutdown
+            with self._lock:
+                self._folding.discard(session_id)
+            return None
+
+    def fold(self, session_id):
+        """Merge messages older than the recent window into the rolling summary"""
+        conn = self.connect()
+        try:
+            self._ensure_schema(conn)
+            cursor = conn.cursor()
+            cursor.execute("SELECT summary, summarized_through FROM chat_summaries WHERE session_id = ?", (session_id,))
+            row = cursor.fetchone()
+            summary, through = (row[0], row[1]) if row else ('', 0)
+
+            cursor.execute("""
+                SELECT id, message_type, content FROM chat_messages
+                WHERE session_id = ? AND id > ?
+                ORDER BY id
+            """, (session_id, through))
+            unfolded = cursor.fetchall()
+        finally:
+            conn.close()  # not held while the model writes the summary
+
+        keep = self.recent_turns * 2
+        if len(unfolded) <= keep + self.fold_turns * 2:
+            return False
+
+        overflow = unfolded[:-keep] if keep else unfolded
+        transcript = "\n".join(
+            f"{'ผู้ใช้' if message_type == 'user' else 'ThothKB'}: {clip(content, self.max_message_chars)}"
+            for _, message_type, content in overflow
+        )
+        new_summary = clip(self.summarize_fn(summary, transcript), self.max_summary_chars)
+
+        if self.write_fn is not None:
+            self.write_fn(save_summary, session_id, new_summary, overflow[-1][0])
+            return True
+        conn = self.connect()
+        try:
+            save_summary(conn, session_id, new_summary, overflow[-1][0])
+            conn.commit()
+        finally:
+            conn.close()
+        return True
+
+    def shutdown(self, wait=True):
+        """Let scheduled folds finish; new ones are refused afterwards"""
+        self._executor.shutdown(wait=wait)
+
+    def _fold_and_release(self, session_id):
+        try:
+            return self.fold(session_id)
+        except Exception as e:
+            logging.error(f"Error summarizing chat session {session_id}: {e}")
+            return False
+        finally:
+            with self._lock:
+                self._folding.discard(session_id)
+
+    def _ensure_schema(self, conn):
+        if not self._schema_ready:
+            ensure_memory_schema(conn)
+            self._schema_ready = True
@@ -0,0 +1,197 @@
+"""
+HTTP response compression
+API responses above a size threshold are gzip or brotli encoded according to the client's
+Accept-Encoding, at most once per ETag for cached bodies. Static pages are compressed once
+per version and served precompressed. Ratios and CPU time are kept per route.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, request
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/javascript', 'text/javascript',
+    'text/html', 'text/css', 'text/plain', 'image/svg+xml'
+}
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5      # per request; static assets use the slowest, densest setting
+STATIC_BROTLI_QUALITY = 11
+
+
+def supported_encodings():
+    """Encodings this process can produce, most preferred first"""
+    return ['br', 'gzip'] if BROTLI_AVAILABLE else ['gzip']
+
+
+def negotiate_encoding():
+    """Best encoding for the current request, or None for identity"""
+    return request.accept_encodings.best_match(supported_encodings())
+
+
+def compress(data, encoding, static=False):
+    if encoding == 'br':
+        return brotli.compress(data, quality=STATIC_BROTLI_QUALITY if static else BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=9 if static else GZIP_LEVEL, mtime=0)
+
+
+class ResponseCompressor:
+    """after_request hook encoding large text responses, with per-route metrics"""
+
+    def __init__(self, min_size=1024, max_cached=64):
+        self.min_size = min_size        # bytes; smaller bodies are not worth the CPU
+        self.max_cached = max_cached    # compressed bodies kept per (ETag, encoding)
+        self._cache = OrderedDict()
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.after_request(self.compress_response)
+
+    def compress_response(self, response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        encoding = negotiate_encoding()
+        if len(data) < self.min_size or encoding is None:
+            return response
+
+        etag, _ = response.get_etag()
+        key = (etag, encoding) if etag else None
+        with self._lock:
+            body = self._cache.get(key) if key else None
+            if body is not None:
+                self._cache.move_to_end(key)
+
+        cached = body is not None
+        cpu_seconds = 0.0
+        if not cached:
+            start = time.thread_time()
+            body = compress(data, encoding)
+            cpu_seconds = time.thread_time() - start
+            if key:
+                with self._lock:
+                    self._cache[key] = body
+                    while len(self._cache) > self.max_cached:
+                        self._cache.popitem(last=False)
+
+        self.record(request.endpoint or request.path, len(data), len(body), cpu_seconds, cached)
+        if len(body) >= len(data):
+            return response  # incompressible
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(etag, weak=True)  # same content, different bytes
+        return response
+
+    def record(self, route, raw_bytes, encoded_bytes, cpu_seconds, cached=False):
+        with self._lock:
+            entry = self._routes.setdefault(route, {'responses': 0, 'from_cache': 0, 'raw_bytes': 0,
+                                                    'encoded_bytes': 0, 'cpu_seconds': 0.0})
+            entry['responses'] += 1
+            entry['from_cache'] += cached
+            entry['raw_bytes'] += raw_bytes
+            entry['encoded_bytes'] += min(encoded_bytes, raw_bytes)
+            entry['cpu_seconds'] += cpu_seconds
+
+    def stats(self):
+        """Compression ratio and CPU time per route"""
+        with self._lock:
+            routes = {route: dict(entry) for route, entry in self._routes.items()}
+        for entry in routes.values():
+            entry['ratio'] = round(entry['encoded_bytes'] / entry['raw_bytes'], 4) if entry['raw_bytes'] else None
+            entry['cpu_ms'] = round(entry.pop('cpu_seconds') * 1000, 3)
+        return {'encodings': supported_encodings(), 'min_size': self.min_size, 'routes': routes}
+
+
+class StaticAssets:
+    """Text assets compressed once per file version and served in the encoding the client accepts"""
+
+    def __init__(self, folder, compressor=None):
+        self.folder = folder
+        self.compressor = compressor  # ResponseCompressor receiving the per-route metrics
+        self._variants = {}           # path -> (size, mtime_ns, etag, {encoding: bytes})
+        self._precompressed = {}      # file name -> sizes per encoding and CPU time spent
+        self._lock = threading.Lock()
+
+    def preload(self, names):
+        """Compress the given files now, e.g. at startup; missing files are skipped"""
+        for name in names:
+            path = safe_join(os.path.abspath(self.folder), name)
+            if path and os.path.isfile(path):
+                self._load(path)
+
+    def send(self, name):
+        path = safe_join(os.path.abspath(self.folder), name)
+        if path is None or not os.path.isfile(path):
+            raise NotFound()
+
+        etag, variants = self._load(path)
+        encoding = negotiate_encoding() if len(variants) > 1 else None
+        if encoding not in variants:
+            encoding = None
+        variant_etag = f'{etag}-{encoding}' if encoding else etag
+
+        if request.if_none_match.contains(variant_etag):
+            response = Response(status=304)
+        else:
+            response = Response(variants[encoding], mimetype=mimetypes.guess_type(path)[0] or 'text/plain')
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+            if self.compressor:
+                self.compressor.record(request.endpoint or request.path, len(variants[None]),
+                                       len(variants[encoding]), 0.0, cached=True)
+        response.set_etag(variant_etag)
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    def _load(self, path):
+        stat = os.stat(path)
+        with self._lock:
+            cached = self._variants.get(path)
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2], cached[3]
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        variants = {None: data}
+        cpu_seconds = 0.0
+        if mimetypes.guess_type(path)[0] in COMPRESSIBLE_TYPES:
+            for encoding in supported_encodings():
+                start = time.thread_time()
+                body = compress(data, encoding, static=True)
+                cpu_seconds += time.thread_time() - start
+                if len(body) < len(data):
+                    variants[encoding] = body
+        etag = hashlib.sha256(data).hexdigest()[:32]
+
+        with self._lock:
+            self._variants[path] = (stat.st_size, stat.st_mtime_ns, etag, variants)
+            self._precompressed[os.path.relpath(path, os.path.abspath(self.folder))] = {
+                'bytes': {encoding or 'identity': len(body) for encoding, body in variants.items()},
+                'cpu_ms': round(cpu_seconds * 1000, 3)
+            }
+        return etag, variants
+
+    def stats(self):
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._precompressed.items()}
@@ -0,0 +1,194 @@
+"""
+Archival of idle chat sessions
+Sessions with no activity for a while move, with their messages and summaries, from the
+main database into an attached archive database, keeping the hot tables and their indexes
+small. Archived sessions stay readable and move back the moment they are used again.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from chat_memory import ensure_memory_schema
+from database.repository import PAGE_CHAT_MESSAGES_SQL, LATEST_MESSAGE_ID, map_chat_message
+
+ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archive.chat_sessions (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL UNIQUE,
+    created_at TIMESTAMP,
+    last_activity TIMESTAMP,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS archive.chat_messages (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    message_type TEXT NOT NULL,
+    content TEXT NOT NULL,
+    sources TEXT,
+    created_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS archive.chat_summaries (
+    session_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL DEFAULT '',
+    summarized_through INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS archive.idx_archive_chat_messages_session_order ON chat_messages(session_id, id);
+"""
+
+SESSION_COLUMNS = 'id, session_id, created_at, last_activity'
+MESSAGE_COLUMNS = 'id, session_id, message_type, content, sources, created_at'
+SUMMARY_COLUMNS = 'session_id, summary, summarized_through, updated_at'
+
+# Session ids are bound as one JSON array so each statement has a single, cacheable text
+IN_BATCH = "session_id IN (SELECT value FROM json_each(?))"
+
+
+class ChatArchive:
+    """Moves idle chat sessions between the main and archive databases"""
+
+    def __init__(self, database_path, archive_path, idle_days=30, batch_size=200):
+        self.database_path = database_path
+        self.archive_path = archive_path
+        self.idle_days = idle_days
+        self.batch_size = batch_size
+        self._lock = threading.Lock()  # one archiver run or restore at a time per process
+        self._thread = None
+        self._stop = threading.Event()
+        self.last_run = None
+
+    def archive_idle(self, idle_days=None):
+        """Archive every session idle for longer than idle_days, one batch per transaction"""
+        idle_days = self.idle_days if idle_days is None else idle_days
+        totals = {'sessions': 0, 'messages': 0, 'batches': 0}
+        started = time.perf_counter()
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                while True:
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        session_ids = [row[0] for row in conn.execute("""
+                            SELECT session_id FROM main.chat_sessions
+                            WHERE last_activity < datetime('now', ?)
+                            ORDER BY last_activity
+                            LIMIT ?
+                        """, (f'-{idle_days} days', self.batch_size)).fetchall()]
+                        if not session_ids:
+                            conn.execute("COMMIT")
+                            break
+
+                        batch = json.dumps(session_ids)
+                        messages = self._move(conn, 'main', 'archive', batch)
+                        conn.execute("COMMIT")
+                    except Exception:
+                        conn.execute("ROLLBACK")
+                        raise
+
+                    totals['sessions'] += len(session_ids)
+                    totals['messages'] += messages
+                    totals['batches'] += 1
+            finally:
+                conn.close()
+
+        totals['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+        self.last_run = dict(totals, finished_at=time.time())
+        if totals['sessions']:
+            logging.info(f"Archived {totals['sessions']} chat sessions ({totals['messages']} messages) "
+                         f"in {totals['batches']} batches")
+        return totals
+
+    def restore(self, session_id):
+        """Move an archived session back into the main database; False if it is not archived"""
+        if not os.path.exists(self.archive_path):
+            return False
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    archived = conn.execute("SELECT 1 FROM archive.chat_sessions WHERE session_id = ?",
+                                            (session_id,)).fetchone()
+                    if archived:
+                        self._move(conn, 'archive', 'main', json.dumps([session_id]))
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            finally:
+                conn.close()
+        return bool(archived)
+
+    def page_messages(self, session_id, before=None, limit=50):
+        """Archived messages of a session, newest first, older than the before cursor"""
+        if not os.path.exists(self.archive_path):
+            return []
+
+        conn = sqlite3.connect(f'file:{self.archive_path}?mode=ro', uri=True, timeout=30.0)
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute(PAGE_CHAT_MESSAGES_SQL, (session_id, before or LATEST_MESSAGE_ID, limit)).fetchall()
+        except sqlite3.OperationalError:
+            return []  # archive created but never written to
+        finally:
+            conn.close()
+        return [map_chat_message(row) for row in rows]
+
+    def start(self, interval_seconds):
+        """Run archive_idle every interval on a daemon thread"""
+        if self._thread is not None or interval_seconds <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, args=(interval_seconds,),
+                                        name='chat-archive', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, interval_seconds):
+        while not self._stop.wait(interval_seconds):
+            try:
+                self.archive_idle()
+            except Exception as e:
+                logging.error(f"Error archiving chat sessions: {e}")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database_path, timeout=30.0, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        conn.execute("ATTACH DATABASE ? AS archive", (self.archive_path,))
+        conn.executescript(ARCHIVE_SCHEMA)
+        ensure_memory_schema(conn)
+        return conn
+
+    @staticmethod
+    def _move(conn, source, target, batch):
+        """Copy a batch of sessions with their messages and summaries, then delete the originals
+
+        Copies replace existing rows, so a batch interrupted between the two database files
+        (commits across attached WAL databases are atomic per file) is simply redone.
+        """
+        conn.execute(f"""
+            INSERT OR REPLACE INTO {target}.chat_sessions ({SESSION_COLUMNS})
+            SELECT {SESSION_COLUMNS} FROM {source}.chat_sessions WHERE {IN_BATCH}
+        """, (batch,))
+        messages = conn.execute(f"""
+            INSERT OR REPLACE INTO {target}.chat_messages ({MESSAGE_COLUMNS})
+            SELECT {MESSAGE_COLUMNS} FROM {source}.chat_messages WHERE {IN_BATCH}
+        """, (batch,)).rowcount
+        conn.execute(f"""
+            INSERT OR REPLACE INTO {target}.chat_summaries ({SUMMARY_COLUMNS})
+            SELECT {SUMMARY_COLUMNS} FROM {source}.chat_summaries WHERE {IN_BATCH}
+        """, (batch,))
+
+        for table in ('chat_summaries', 'chat_messages', 'chat_sessions'):
+            conn.execute(f"DELETE FROM {source}.{table} WHERE {IN_BATCH}", (batch,))
+        return messages
@@ -0,0 +1,174 @@
+"""
+Pooled SQLite connections for the Flask servers
+Each thread checks out one configured connection and keeps it until the request's
+app context tears down, after which the connection goes back to the idle pool. Streamed
+bodies run after that teardown, so connections they leave checked out are returned,
+rolled back, when the response is closed.
+"""
+
+import sqlite3
+import threading
+
+DEFAULT_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA temp_store = memory',
+    'PRAGMA mmap_size = 268435456',  # 256MB
+)
+
+
+class PooledConnection:
+    """Wraps a pooled sqlite3 connection; close() returns it to the pool instead of closing it"""
+
+    def __init__(self, manager, conn):
+        self._manager = manager
+        self._conn = conn
+
+    def close(self):
+        self._manager.checkin()
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise sqlite3.ProgrammingError('Cannot operate on a connection returned to the pool.')
+        return getattr(conn, name)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+
+class ConnectionManager:
+    """Reuses configured SQLite connections across requests and worker threads"""
+
+    def __init__(self, database_path, timeout=30.0, pragmas=DEFAULT_PRAGMAS, max_idle=8, initializer=None,
+                 on_connect=None, cached_statements=256, factory=sqlite3.Connection):
+        self.database_path = database_path
+        self.timeout = timeout
+        self.pragmas = pragmas
+        self.max_idle = max_idle
+        self.initializer = initializer  # called once before the first physical connection, e.g. to create the schema
+        self.on_connect = on_connect    # called with each new physical connection once it is configured
+        self.cached_statements = cached_statements  # prepared statements kept per connection, keyed by SQL text
+        self.factory = factory                      # sqlite3.Connection subclass, e.g. a profiled one
+        self._initialized = False
+        self._init_lock = threading.Lock()
+        self._idle = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'created': 0, 'checkouts': 0, 'reused': 0, 'returned': 0,
+                       'rolled_back': 0, 'discarded': 0, 'in_use': 0, 'peak_in_use': 0}
+
+    def init_app(self, app):
+        """Return each request's connection to the pool when its app context ends or its response closes"""
+        app.teardown_appcontext(self.release)
+        app.after_request(self._release_on_close)
+
+    def _release_on_close(self, response):
+        # The server closes the response on the thread that iterated it, i.e. that ran the body
+        response.call_on_close(self.release)
+        return response
+
+    def connection(self):
+        """The calling thread's checked-out connection, checking one out if needed"""
+        wrapper = getattr(self._local, 'wrapper', None)
+        if wrapper is not None:
+            self._local.depth += 1
+            return wrapper
+
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+            self._stats['checkouts'] += 1
+            self._stats['in_use'] += 1
+            self._stats['peak_in_use'] = max(self._stats['peak_in_use'], self._stats['in_use'])
+            if conn is not None:
+                self._stats['reused'] += 1
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._stats['in_use'] -= 1
+                raise
+
+        wrapper = PooledConnection(self, conn)
+        self._local.wrapper = wrapper
+        self._local.depth = 1
+        return wrapper
+
+    def checkin(self):
+        """Undo one connection() call; the last one returns the connection to the pool"""
+        if getattr(self._local, 'wrapper', None) is None:
+            return
+        self._local.depth -= 1
+        if self._local.depth <= 0:
+            self.release()
+
+    def release(self, exc=None):
+        """Return the calling thread's connection to the pool regardless of nesting; safe to call more than once"""
+        wrapper = getattr(self._local, 'wrapper', None)
+        if wrapper is None:
+            return
+        self._local.wrapper = None
+        conn, wrapper._conn = wrapper._conn, None
+
+        keep = True
+        rolled_back = False
+        try:
+            # Never hand an open transaction to the next request
+            if conn.in_transaction:
+                conn.rollback()
+                rolled_back = True
+        except sqlite3.Error:
+            keep = False
+
+        with self._lock:
+            self._stats['in_use'] -= 1
+            self._stats['returned'] += 1
+            self._stats['rolled_back'] += rolled_back
+            if keep and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                conn = None
+            else:
+                self._stats['discarded'] += 1
+
+        if conn is not None:
+            conn.close()
+
+    def close_all(self):
+        """Close idle connections, e.g. at shutdown"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        """Pool counters for monitoring"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['idle'] = len(self._idle)
+        stats['max_idle'] = self.max_idle
+        stats['cached_statements'] = self.cached_statements
+        stats['database'] = self.database_path
+        return stats
+
+    def _connect(self):
+        if self.initializer and not self._initialized:
+            with self._init_lock:  # other threads wait for it rather than open a half-made database
+                if not self._initialized:
+                    self.initializer()
+                    self._initialized = True
+        # Connections move between threads, but only ever one thread holds a given connection
+        conn = sqlite3.connect(self.database_path, timeout=self.timeout, check_same_thread=False,
+                               cached_statements=self.cached_statements, factory=self.factory)
+        conn.row_factory = sqlite3.Row
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        if self.on_connect:
+            self.on_connect(conn)
+        with self._lock:
+            self._stats['created'] += 1
+        return conn
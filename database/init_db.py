@@ -6,8 +6,12 @@ Creates SQLite database and tables from schema
 
 import sqlite3
 import os
+import sys
 from pathlib import Path
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import repository
+
 def init_database(db_path='database/knowledge_base.db'):
     """Initialize the SQLite database with schema"""
     # Ensure database directory exists
@@ -26,6 +30,7 @@ def init_database(db_path='database/knowledge_base.db'):
     conn = sqlite3.connect(db_path)
     try:
         conn.executescript(schema_sql)
+        repository.ensure_schema(conn)
         conn.commit()
         print(f"Database initialized successfully: {db_path}")
         
@@ -0,0 +1,320 @@
+"""
+SQLite statement profiler
+Times every statement run through profiled connections, aggregates them by normalized SQL
+and the Flask endpoint that issued them, and explains the query plans of the top offenders.
+Run as a script to exercise the hot routes of a server and fail on full table scans:
+
+    python -m database.profiler server_enhanced
+"""
+
+import importlib
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from flask import has_request_context, request
+from werkzeug.exceptions import HTTPException
+
+# GET routes polled on every page load; they must never scan a table to filter it.
+# Free-text search and chat retrieval use LIKE '%term%' and show up in the report instead.
+HOT_ROUTES = (
+    '/api/documents',
+    '/api/knowledge-cards',
+    '/api/tags',
+    '/api/podcasts',
+    '/api/documents/{document_id}/content',
+    '/api/quiz/{document_id}',
+    '/api/chat/{session_id}/messages',
+)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_INDEX_USE = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+_FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+_WHERE = re.compile(r"\bWHERE\b", re.IGNORECASE)
+
+
+def normalize_sql(sql):
+    """Statement shape: literals become ?, IN lists and repeated OR terms collapse"""
+    text = ' '.join(sql.split())
+    text = _STRING_LITERAL.sub('?', text)
+    text = _NUMBER_LITERAL.sub('?', text)
+    text = _PLACEHOLDER_LIST.sub('(?, ...)', text)
+
+    # Keyword retrieval ORs one identical condition per search term
+    terms = text.split(' OR ')
+    collapsed = [terms[0]]
+    for term in terms[1:]:
+        if term == collapsed[-1] or (collapsed[-1] == '...' and term == collapsed[-2]):
+            if collapsed[-1] != '...':
+                collapsed.append('...')
+        else:
+            collapsed.append(term)
+    return ' OR '.join(collapsed)
+
+
+def full_table_scans(plan):
+    """Tables a query plan reads in full without an index"""
+    tables = []
+    for detail in plan:
+        match = _FULL_SCAN.match(detail)
+        if match:
+            tables.append(match.group(1))
+    return tables
+
+
+def indexes_used(plan):
+    return set(_INDEX_USE.findall(' '.join(plan)))
+
+
+def current_route():
+    """Endpoint of the request being served, or 'background' outside requests"""
+    if has_request_context():
+        return request.endpoint or request.path
+    return 'background'
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that reports execute and fetch time to its connection's profiler"""
+
+    _key = None
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._key = self.connection.profiler.record(sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._key = self.connection.profiler.record(sql, None, time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._add_fetch(time.perf_counter() - start, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add_fetch(time.perf_counter() - start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._add_fetch(time.perf_counter() - start, len(rows))
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._add_fetch(time.perf_counter() - start, 0)
+            raise
+        self._add_fetch(time.perf_counter() - start, 1)
+        return row
+
+    def _add_fetch(self, seconds, rows):
+        self.connection.profiler.add_fetch(self._key, seconds, rows)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """Connection whose cursors are ProfiledCursors; subclassed per profiler"""
+
+    profiler = None
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class QueryProfiler:
+    """Aggregated statement timings with query plans for the slowest statements"""
+
+    def __init__(self, slow_ms=100.0, max_statements=500, aggregate=True, on_time=None):
+        self.slow_ms = slow_ms
+        self.max_statements = max_statements
+        self.aggregate = aggregate  # False: only time statements for on_time, keep no per-statement stats
+        self.on_time = on_time      # called with (seconds, statements) for every execute and fetch
+        self._stats = {}       # normalized SQL -> aggregate
+        self._normalized = {}  # raw SQL -> normalized SQL
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        # sqlite3 connection class whose statements are recorded by this profiler
+        self.connection_factory = type('ProfiledConnection', (ProfiledConnection,), {'profiler': self})
+
+    def record(self, sql, parameters, seconds):
+        """Add one execution; returns the statement key fetches are charged to"""
+        if self.on_time:
+            self.on_time(seconds, 1)
+        if not self.aggregate:
+            return None
+        key = self._normalized.get(sql)
+        if key is None:
+            key = normalize_sql(sql)
+            if len(self._normalized) >= self.max_statements * 4:
+                self._normalized.clear()
+            self._normalized[sql] = key
+        if key.startswith('EXPLAIN'):
+            return None
+
+        route = current_route()
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= self.max_statements:
+                    return None
+                entry = self._stats[key] = {'calls': 0, 'total': 0.0, 'max': 0.0, 'rows': 0,
+                                            'routes': {}, 'sample': (sql, parameters)}
+            entry['calls'] += 1
+            entry['total'] += seconds
+            entry['routes'][route] = entry['routes'].get(route, 0) + 1
+            if seconds >= entry['max']:
+                entry['max'] = seconds
+                if parameters is not None:
+                    entry['sample'] = (sql, parameters)
+
+        if seconds * 1000 >= self.slow_ms:
+            logging.warning(f"Slow query ({seconds * 1000:.1f} ms) in {route}: {key[:200]}")
+        return key
+
+    def add_fetch(self, key, seconds, rows):
+        if self.on_time:
+            self.on_time(seconds, 0)
+        if key is None:
+            return
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is not None:
+                entry['total'] += seconds
+                entry['rows'] += rows
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+        self.started_at = time.time()
+
+    def report(self, conn, top=10):
+        """Statements by total time, plans for the top ones, full scans and unused indexes"""
+        with self._lock:
+            entries = [(key, dict(entry, routes=dict(entry['routes']))) for key, entry in self._stats.items()]
+        entries.sort(key=lambda item: item[1]['total'], reverse=True)
+
+        used = set()
+        statements = []
+        for rank, (key, entry) in enumerate(entries):
+            plan = self._explain(conn, *entry['sample'])
+            used |= indexes_used(plan)
+            if rank >= top:
+                continue
+            statements.append({
+                'sql': key,
+                'calls': entry['calls'],
+                'total_ms': round(entry['total'] * 1000, 3),
+                'mean_ms': round(entry['total'] * 1000 / entry['calls'], 3),
+                'max_ms': round(entry['max'] * 1000, 3),
+                'rows': entry['rows'],
+                'routes': entry['routes'],
+                'plan': plan,
+                'full_scans': full_table_scans(plan)
+            })
+
+        indexes = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND name NOT LIKE 'sqlite_autoindex_%' ORDER BY name"
+        ).fetchall()]
+        return {
+            'since': self.started_at,
+            'distinct_statements': len(entries),
+            'total_ms': round(sum(entry['total'] for _, entry in entries) * 1000, 3),
+            'statements': statements,
+            'unused_indexes': [name for name in indexes if name not in used]
+        }
+
+    def scan_violations(self, conn, routes=None):
+        """Filtered statements issued by the given routes whose plans scan a whole table"""
+        with self._lock:
+            entries = [(key, dict(entry['routes']), entry['sample']) for key, entry in self._stats.items()]
+
+        violations = []
+        for key, statement_routes, sample in entries:
+            if not _WHERE.search(key) or (routes is not None and not set(statement_routes) & set(routes)):
+                continue
+            tables = full_table_scans(self._explain(conn, *sample))
+            if tables:
+                violations.append({'sql': key, 'routes': sorted(statement_routes), 'tables': tables})
+        return violations
+
+    @staticmethod
+    def _explain(conn, sql, parameters):
+        if sql.lstrip().upper().startswith('PRAGMA'):
+            return []  # some pragmas act while being prepared
+        try:
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters or ()).fetchall()
+        except (sqlite3.Error, ValueError):
+            return []
+        return [row[-1] for row in rows]
+
+
+def check_hot_routes(module_name):
+    """Exercise a server's hot routes and return the full table scans they performed"""
+    os.environ['SQL_PROFILE'] = 'true'
+    module = importlib.import_module(module_name)
+    profiler = module.query_profiler
+    client = module.app.test_client()
+    adapter = module.app.url_map.bind('localhost')
+
+    conn = module.get_db_connection()
+    document = conn.execute("SELECT id FROM documents ORDER BY id LIMIT 1").fetchone()
+    session = conn.execute("SELECT session_id FROM chat_sessions LIMIT 1").fetchone()
+    conn.close()
+
+    ids = {'document_id': document[0] if document else 0, 'session_id': session[0] if session else 'none'}
+    profiler.reset()
+    endpoints = set()
+    for path in HOT_ROUTES:
+        path = path.format(**ids)
+        try:
+            endpoint, _ = adapter.match(path.split('?')[0], method='GET')
+        except HTTPException:
+            continue  # route not served by this entry point
+        client.get(path)
+        endpoints.add(endpoint)
+
+    conn = module.get_db_connection()
+    try:
+        return profiler.scan_violations(conn, routes=endpoints), profiler.report(conn)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, '.')
+    violations, report = check_hot_routes(sys.argv[1] if len(sys.argv) > 1 else 'server_enhanced')
+
+    for statement in report['statements']:
+        print(f"{statement['total_ms']:>9.2f} ms  {statement['calls']:>4}x  {statement['sql'][:100]}")
+        for detail in statement['plan']:
+            print(f"                          {detail}")
+    if report['unused_indexes']:
+        print(f"Unused indexes: {', '.join(report['unused_indexes'])}")
+
+    for violation in violations:
+        print(f"FULL SCAN of {', '.join(violation['tables'])} in {', '.join(violation['routes'])}: {violation['sql'][:160]}")
+    sys.exit(1 if violations else 0)
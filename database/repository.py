@@ -0,0 +1,726 @@
+"""
+Shared data access for the Knowledge Base servers
+All document, tag, search and chat SQL lives here so server_enhanced.py, app.py and
+api/app.py run identical statements. Statement texts are module constants so sqlite3's
+per-connection prepared statement cache gets hits, and row mappers decode JSON columns once.
+"""
+
+import json
+import sqlite3
+
+# PRAGMA user_version of a database ensure_schema() has brought up to date; raise it whenever
+# INDEXES or the card, catalog version or change log schemas below change
+SCHEMA_VERSION = 1
+
+# Indexes the hot queries below depend on; applied to existing databases by ensure_indexes()
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_documents_created_at ON documents(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_document_tags_document_id ON document_tags(document_id)",
+    "CREATE INDEX IF NOT EXISTS idx_podcasts_document_id ON podcasts(document_id)",
+    "CREATE INDEX IF NOT EXISTS idx_chat_messages_session_id ON chat_messages(session_id)",
+    "CREATE INDEX IF NOT EXISTS idx_chat_messages_session_order ON chat_messages(session_id, id)",
+)
+
+# Ready-to-serve document cards, kept current by triggers so listing is one indexed scan
+DOCUMENT_CARDS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS document_cards (
+    document_id INTEGER PRIMARY KEY,
+    created_at TIMESTAMP,
+    card TEXT NOT NULL -- JSON object as served by /api/documents
+);
+
+CREATE INDEX IF NOT EXISTS idx_document_cards_created_at ON document_cards(created_at DESC, document_id DESC);
+
+-- Tag names and colors come from one ordered subquery so the two lists stay aligned
+CREATE VIEW IF NOT EXISTS document_card_source AS
+SELECT d.id AS document_id, d.created_at, json_object(
+    'id', d.id,
+    'filename', d.filename,
+    'original_filename', d.original_filename,
+    'title', d.title,
+    'file_type', d.file_type,
+    'file_size', d.file_size,
+    'file_path', d.file_path,
+    'summary_en', d.summary_en,
+    'summary_th', d.summary_th,
+    'detailed_summary_en', d.detailed_summary_en,
+    'detailed_summary_th', d.detailed_summary_th,
+    'insights_en', CASE WHEN json_valid(d.insights_en) AND json_type(d.insights_en) = 'array'
+                        THEN json(d.insights_en) ELSE json_array() END,
+    'insights_th', CASE WHEN json_valid(d.insights_th) AND json_type(d.insights_th) = 'array'
+                        THEN json(d.insights_th) ELSE json_array() END,
+    'created_at', d.created_at,
+    'modified_at', d.modified_at,
+    'processed_at', d.processed_at,
+    'is_processed', d.is_processed,
+    'groq_processed', d.groq_processed,
+    'tags', (SELECT json_group_array(name) FROM (
+        SELECT t.name FROM document_tags dt JOIN tags t ON dt.tag_id = t.id
+        WHERE dt.document_id = d.id ORDER BY t.name)),
+    'tag_colors', (SELECT json_group_array(color) FROM (
+        SELECT t.color FROM document_tags dt JOIN tags t ON dt.tag_id = t.id
+        WHERE dt.document_id = d.id ORDER BY t.name)),
+    'podcast_file', (SELECT p.filename FROM podcasts p WHERE p.document_id = d.id ORDER BY p.id LIMIT 1)
+) AS card
+FROM documents d;
+
+-- Triggers to keep cards current when documents, their tags or podcasts change. Tags are linked
+-- with INSERT OR IGNORE, and an outer OR clause overrides the one of statements inside a trigger,
+-- so the tag link trigger upserts: INSERT OR REPLACE would be ignored and leave the card untagged
+CREATE TRIGGER IF NOT EXISTS update_document_cards_on_document_insert
+    AFTER INSERT ON documents
+    FOR EACH ROW
+    BEGIN
+        INSERT OR REPLACE INTO document_cards (document_id, created_at, card)
+        SELECT document_id, created_at, card FROM document_card_source
+        WHERE document_id = NEW.id;
+    END;
+
+CREATE TRIGGER IF NOT EXISTS update_document_cards_on_document_update
+    AFTER UPDATE ON documents
+    FOR EACH ROW
+    BEGIN
+        DELETE FROM document_cards WHERE document_id = OLD.id AND OLD.id <> NEW.id;
+        INSERT OR REPLACE INTO document_cards (document_id, created_at, card)
+        SELECT document_id, created_at, card FROM document_card_source
+        WHERE document_id = NEW.id;
+    END;
+
+CREATE TRIGGER IF NOT EXISTS update_document_cards_on_document_delete
+    AFTER DELETE ON documents
+    FOR EACH ROW
+    BEGIN
+        DELETE FROM document_cards WHERE document_id = OLD.id;
+    END;
+
+CREATE TRIGGER IF NOT EXISTS update_document_cards_on_document_tag_insert
+    AFTER INSERT ON document_tags
+    FOR EACH ROW
+    BEGIN
+        INSERT INTO document_cards (document_id, created_at, card)
+        SELECT document_id, created_at, card FROM document_card_source
+        WHERE document_id = NEW.document_id
+        ON CONFLICT(document_id) DO UPDATE SET created_at = excluded.created_at, card = excluded.card;
+    END;
+
+CREATE TRIGGER IF NOT EXISTS update_document_cards_on_document_tag_update
+    AFTER UPDATE ON document_tags
+    FOR EACH ROW
+    BEGIN
+        INSERT OR REPLACE INTO document_cards (document_id, created_at, card)
+        SELECT document_id, created_at, card FROM document_card_source
+        WHERE document_id IN (OLD.document_id, NEW.document_id);
+    END;
+
+CREATE TRIGGER IF NOT EXISTS update_document_cards_on_document_tag_delete
+    AFTER DELETE ON document_tags
+    FOR EACH ROW
+    BEGIN
+        INSERT OR REPLACE INTO document_cards (document_id, created_at, card)
+        SELECT document_id, created_at, card FROM document_card_source
+        WHERE document_id = OLD.document_id;
+    END;
+
+CREATE TRIGGER IF NOT EXISTS update_document_cards_on_tag_update
+    AFTER UPDATE OF name, color ON tags
+    FOR EACH ROW
+    BEGIN
+        INSERT OR REPLACE INTO document_cards (document_id, created_at, card)
+        SELECT document_id, created_at, card FROM document_card_source
+        WHERE document_id IN (SELECT document_id FROM document_tags WHERE tag_id = NEW.id);
+    END;
+
+CREATE TRIGGER IF NOT EXISTS update_document_cards_on_tag_delete
+    AFTER DELETE ON tags
+    FOR EACH ROW
+    BEGIN
+        INSERT OR REPLACE INTO document_cards (document_id, created_at, card)
+        SELECT document_id, created_at, card FROM document_card_source
+        WHERE document_id IN (SELECT document_id FROM document_tags WHERE tag_id = OLD.id);
+    END;
+
+CREATE TRIGGER IF NOT EXISTS update_document_cards_on_podcast_insert
+    AFTER INSERT ON podcasts
+    FOR EACH ROW
+    BEGIN
+        INSERT OR REPLACE INTO document_cards (document_id, created_at, card)
+        SELECT document_id, created_at, card FROM document_card_source
+        WHERE document_id = NEW.document_id;
+    END;
+
+CREATE TRIGGER IF NOT EXISTS update_document_cards_on_podcast_update
+    AFTER UPDATE OF document_id, filename ON podcasts
+    FOR EACH ROW
+    BEGIN
+        INSERT OR REPLACE INTO document_cards (document_id, created_at, card)
+        SELECT document_id, created_at, card FROM document_card_source
+        WHERE document_id IN (OLD.document_id, NEW.document_id);
+    END;
+
+CREATE TRIGGER IF NOT EXISTS update_document_cards_on_podcast_delete
+    AFTER DELETE ON podcasts
+    FOR EACH ROW
+    BEGIN
+        INSERT OR REPLACE INTO document_cards (document_id, created_at, card)
+        SELECT document_id, created_at, card FROM document_card_source
+        WHERE document_id = OLD.document_id;
+    END;
+"""
+
+# Tables whose writes change what the list endpoints return
+CATALOG_TABLES = ('documents', 'tags', 'document_tags', 'podcasts', 'podcast_tags')
+
+# Change counter bumped once for every row written to the catalog tables, from any process,
+# by the log_catalog_change_* triggers below. Databases from before the change log also had
+# bump_catalog_version_* triggers on the same writes, which would count every row twice
+CATALOG_VERSION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0);
+""" + ''.join(f"""
+DROP TRIGGER IF EXISTS bump_catalog_version_on_{table}_{event.lower()};
+""" for table in CATALOG_TABLES for event in ('INSERT', 'UPDATE', 'DELETE'))
+
+CATALOG_VERSION_SQL = "SELECT version FROM catalog_version WHERE id = 1"
+
+# Entities each catalog write changes, as SELECTs of (entity, entity_id, deleted). Rows that only
+# link to an entity are checked against it so a late link delete cannot overwrite its tombstone
+CATALOG_CHANGE_RULES = {
+    ('documents', 'INSERT'): ["SELECT 'document', NEW.id, 0"],
+    ('documents', 'UPDATE'): [
+        "SELECT 'document', NEW.id, 0",
+        "SELECT 'podcast', id, 0 FROM podcasts WHERE document_id = NEW.id",  # document_title
+    ],
+    ('documents', 'DELETE'): [
+        "SELECT 'document', OLD.id, 1",
+        "SELECT 'podcast', id, 0 FROM podcasts WHERE document_id = OLD.id",
+    ],
+    ('tags', 'INSERT'): ["SELECT 'tag', NEW.id, 0"],
+    ('tags', 'UPDATE'): [
+        "SELECT 'tag', NEW.id, 0",
+        "SELECT 'document', d.id, 0 FROM document_tags dt JOIN documents d ON d.id = dt.document_id "
+        "WHERE dt.tag_id = NEW.id",
+        "SELECT 'podcast', p.id, 0 FROM podcast_tags pt JOIN podcasts p ON p.id = pt.podcast_id "
+        "WHERE pt.tag_id = NEW.id",
+    ],
+    ('tags', 'DELETE'): [
+        "SELECT 'tag', OLD.id, 1",
+        "SELECT 'document', d.id, 0 FROM document_tags dt JOIN documents d ON d.id = dt.document_id "
+        "WHERE dt.tag_id = OLD.id",
+        "SELECT 'podcast', p.id, 0 FROM podcast_tags pt JOIN podcasts p ON p.id = pt.podcast_id "
+        "WHERE pt.tag_id = OLD.id",
+    ],
+    ('podcasts', 'INSERT'): [
+        "SELECT 'podcast', NEW.id, 0",
+        "SELECT 'document', id, 0 FROM documents WHERE id = NEW.document_id",  # podcast_file
+    ],
+    ('podcasts', 'UPDATE'): [
+        "SELECT 'podcast', NEW.id, 0",
+        "SELECT 'document', id, 0 FROM documents WHERE id IN (OLD.document_id, NEW.document_id)",
+    ],
+    ('podcasts', 'DELETE'): [
+        "SELECT 'podcast', OLD.id, 1",
+        "SELECT 'document', id, 0 FROM documents WHERE id = OLD.document_id",
+    ],
+    ('document_tags', 'INSERT'): ["SELECT 'document', id, 0 FROM documents WHERE id = NEW.document_id"],
+    ('document_tags', 'UPDATE'): [
+        "SELECT 'document', id, 0 FROM documents WHERE id IN (OLD.document_id, NEW.document_id)"
+    ],
+    ('document_tags', 'DELETE'): ["SELECT 'document', id, 0 FROM documents WHERE id = OLD.document_id"],
+    ('podcast_tags', 'INSERT'): ["SELECT 'podcast', id, 0 FROM podcasts WHERE id = NEW.podcast_id"],
+    ('podcast_tags', 'UPDATE'): [
+        "SELECT 'podcast', id, 0 FROM podcasts WHERE id IN (OLD.podcast_id, NEW.podcast_id)"
+    ],
+    ('podcast_tags', 'DELETE'): ["SELECT 'podcast', id, 0 FROM podcasts WHERE id = OLD.podcast_id"],
+}
+
+# Latest catalog version at which each document, tag and podcast changed, tombstones included.
+# Each trigger bumps the version itself, the only bump per written row, and upserts so an
+# outer INSERT OR IGNORE cannot suppress the stamp
+CATALOG_CHANGES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog_changes (
+    entity TEXT NOT NULL, -- 'document', 'tag' or 'podcast'
+    entity_id INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (entity, entity_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_catalog_changes_entity_version ON catalog_changes(entity, version);
+CREATE INDEX IF NOT EXISTS idx_catalog_changes_version ON catalog_changes(version);
+""" + ''.join(f"""
+CREATE TRIGGER IF NOT EXISTS log_catalog_change_on_{table}_{event.lower()}
+    AFTER {event} ON {table}
+    FOR EACH ROW
+    BEGIN
+        UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+        INSERT INTO catalog_changes (entity, entity_id, deleted, version)
+        SELECT changed.*, (SELECT version FROM catalog_version WHERE id = 1) FROM (
+            {' UNION ALL '.join(selects)}
+        ) AS changed WHERE true
+        ON CONFLICT(entity, entity_id) DO UPDATE SET deleted = excluded.deleted, version = excluded.version;
+    END;
+""" for (table, event), selects in CATALOG_CHANGE_RULES.items())
+
+CHANGED_DOCUMENT_CARDS_SQL = """
+    SELECT dc.card FROM catalog_changes c
+    JOIN document_cards dc ON dc.document_id = c.entity_id
+    WHERE c.entity = 'document' AND c.version > ? AND c.deleted = 0
+    ORDER BY dc.created_at DESC, dc.document_id DESC
+"""
+
+CHANGED_TAGS_SQL = """
+    SELECT t.* FROM catalog_changes c
+    JOIN tags t ON t.id = c.entity_id
+    WHERE c.entity = 'tag' AND c.version > ? AND c.deleted = 0
+    ORDER BY t.name
+"""
+
+CHANGED_PODCASTS_SQL = """
+    SELECT p.*, d.title as document_title, GROUP_CONCAT(t.name) as tags
+    FROM catalog_changes c
+    JOIN podcasts p ON p.id = c.entity_id
+    LEFT JOIN documents d ON p.document_id = d.id
+    LEFT JOIN podcast_tags pt ON p.id = pt.podcast_id
+    LEFT JOIN tags t ON pt.tag_id = t.id
+    WHERE c.entity = 'podcast' AND c.version > ? AND c.deleted = 0
+    GROUP BY p.id
+    ORDER BY p.created_at DESC
+"""
+
+DELETED_ENTITIES_SQL = """
+    SELECT entity, entity_id FROM catalog_changes
+    WHERE version > ? AND deleted = 1
+    ORDER BY version
+"""
+
+BACKFILL_DOCUMENT_CARDS_SQL = """
+    INSERT INTO document_cards (document_id, created_at, card)
+    SELECT document_id, created_at, card FROM document_card_source
+    WHERE document_id NOT IN (SELECT document_id FROM document_cards)
+"""
+
+LIST_DOCUMENT_CARDS_SQL = """
+    SELECT card FROM document_cards
+    ORDER BY created_at DESC, document_id DESC
+"""
+
+GET_DOCUMENT_CARD_SQL = "SELECT card FROM document_cards WHERE document_id = ?"
+
+# Keys of a document card, in card order; ?fields= and ?lang= select from these
+DOCUMENT_FIELDS = (
+    'id', 'filename', 'original_filename', 'title', 'file_type', 'file_size', 'file_path',
+    'summary_en', 'summary_th', 'detailed_summary_en', 'detailed_summary_th', 'insights_en', 'insights_th',
+    'created_at', 'modified_at', 'processed_at', 'is_processed', 'groq_processed',
+    'tags', 'tag_colors', 'podcast_file'
+)
+LANGUAGES = ('en', 'th')
+LOCALIZED_FIELDS = ('summary', 'detailed_summary', 'insights')  # stored once per language as <name>_<lang>
+ARRAY_FIELDS = {'insights_en', 'insights_th', 'tags', 'tag_colors'}
+
+PROJECTED_DOCUMENT_CARDS_SQL = """
+    SELECT {card} FROM document_cards
+    ORDER BY created_at DESC, document_id DESC
+"""
+
+SEARCH_COLUMNS = "d.*, GROUP_CONCAT(t.name) as tags, GROUP_CONCAT(t.color) as tag_colors"
+
+# Search result columns for projected fields that are not plain document columns
+SEARCH_FIELD_COLUMNS = {
+    'tags': "GROUP_CONCAT(t.name) as tags",
+    'tag_colors': "GROUP_CONCAT(t.color) as tag_colors",
+    'podcast_file': "(SELECT p.filename FROM podcasts p WHERE p.document_id = d.id ORDER BY p.id LIMIT 1) as podcast_file",
+}
+
+LIST_PODCASTS_SQL = """
+    SELECT p.*, d.title as document_title, GROUP_CONCAT(t.name) as tags
+    FROM podcasts p
+    LEFT JOIN documents d ON p.document_id = d.id
+    LEFT JOIN podcast_tags pt ON p.id = pt.podcast_id
+    LEFT JOIN tags t ON pt.tag_id = t.id
+    GROUP BY p.id
+    ORDER BY p.created_at DESC
+"""
+
+LIST_TAGS_SQL = "SELECT * FROM tags ORDER BY name"
+
+GET_DOCUMENT_SQL = "SELECT * FROM documents WHERE id = ?"
+
+SEARCH_TEXT_CONDITION = """
+    (d.title LIKE ? OR d.summary_en LIKE ? OR d.detailed_summary_en LIKE ?
+     OR d.summary_th LIKE ? OR d.detailed_summary_th LIKE ?)
+"""
+
+SEARCH_DOCUMENTS_SQL = """
+    SELECT DISTINCT {columns}
+    FROM documents d
+    LEFT JOIN document_tags dt ON d.id = dt.document_id
+    LEFT JOIN tags t ON dt.tag_id = t.id
+    WHERE {conditions}
+    GROUP BY d.id
+    ORDER BY d.created_at DESC
+"""
+
+CHAT_TEXT_ALL = """
+    LOWER(d.title || ' ' || COALESCE(d.summary_en, '') || ' ' ||
+          COALESCE(d.detailed_summary_en, '') || ' ' ||
+          COALESCE(d.summary_th, '') || ' ' ||
+          COALESCE(d.detailed_summary_th, '')) LIKE ?
+"""
+
+CHAT_TEXT_EN = """
+    LOWER(d.title || ' ' || COALESCE(d.summary_en, '') || ' ' ||
+          COALESCE(d.detailed_summary_en, '')) LIKE ?
+"""
+
+RELEVANT_DOCUMENTS_SQL = """
+    SELECT d.id, d.title, d.summary_en, d.detailed_summary_en, d.insights_en,
+           d.summary_th, d.detailed_summary_th, d.insights_th
+    FROM documents d
+    WHERE {conditions}
+    ORDER BY d.created_at DESC
+    LIMIT ?
+"""
+
+RECENT_DOCUMENTS_SQL = """
+    SELECT d.id, d.title, d.summary_en, d.detailed_summary_en, d.insights_en
+    FROM documents d
+    ORDER BY d.created_at DESC
+    LIMIT ?
+"""
+
+CREATE_CHAT_SESSION_SQL = "INSERT INTO chat_sessions (session_id) VALUES (?)"
+
+TOUCH_CHAT_SESSION_SQL = """
+    UPDATE chat_sessions
+    SET last_activity = CURRENT_TIMESTAMP
+    WHERE session_id = ?
+"""
+
+ADD_CHAT_MESSAGE_SQL = """
+    INSERT INTO chat_messages (session_id, message_type, content, sources)
+    VALUES (?, ?, ?, ?)
+"""
+
+CHAT_SESSION_EXISTS_SQL = "SELECT 1 FROM chat_sessions WHERE session_id = ?"
+
+# Cursor value meaning "start from the newest message"
+LATEST_MESSAGE_ID = 2 ** 63 - 1
+
+PAGE_CHAT_MESSAGES_SQL = """
+    SELECT * FROM chat_messages
+    WHERE session_id = ? AND id < ?
+    ORDER BY id DESC
+    LIMIT ?
+"""
+
+# Hot statements whose plans are worth checking after schema or index changes
+HOT_QUERIES = {
+    'list_document_cards': (LIST_DOCUMENT_CARDS_SQL, ()),
+    'list_podcasts': (LIST_PODCASTS_SQL, ()),
+    'list_tags': (LIST_TAGS_SQL, ()),
+    'get_document': (GET_DOCUMENT_SQL, (0,)),
+    'page_chat_messages': (PAGE_CHAT_MESSAGES_SQL, ('', LATEST_MESSAGE_ID, 50)),
+    'recent_documents': (RECENT_DOCUMENTS_SQL, (3,)),
+    'changed_document_cards': (CHANGED_DOCUMENT_CARDS_SQL, (0,)),
+}
+
+
+def split_list(value):
+    """Split a GROUP_CONCAT column into a list"""
+    return value.split(',') if value else []
+
+
+def decode_json_list(value):
+    """Decode a JSON array column, tolerating empty or malformed values"""
+    if not value:
+        return []
+    try:
+        decoded = json.loads(value)
+    except ValueError:
+        return []
+    return decoded if isinstance(decoded, list) else []
+
+
+def map_document(row):
+    """Document row -> API dict with tags split and insights decoded"""
+    doc = dict(row)
+    if 'tags' in doc:
+        doc['tags'] = split_list(doc['tags'])
+    if 'tag_colors' in doc:
+        doc['tag_colors'] = split_list(doc['tag_colors'])
+    if 'insights_en' in doc:
+        doc['insights_en'] = decode_json_list(doc['insights_en'])
+    if 'insights_th' in doc:
+        doc['insights_th'] = decode_json_list(doc['insights_th'])
+    return doc
+
+
+def map_podcast(row):
+    """Podcast row -> API dict with tags split"""
+    podcast = dict(row)
+    podcast['tags'] = split_list(podcast.get('tags'))
+    return podcast
+
+
+def map_chat_message(row):
+    """Chat message row -> API dict"""
+    return {
+        'id': row['id'],
+        'type': row['message_type'],
+        'content': row['content'],
+        'sources': decode_json_list(row['sources']),
+        'timestamp': row['created_at']
+    }
+
+
+def ensure_indexes(conn):
+    """Create any missing indexes the repository queries rely on"""
+    for statement in INDEXES:
+        conn.execute(statement)
+    conn.commit()
+
+
+def ensure_document_cards(conn):
+    """Create the document card table and triggers, filling in cards for existing documents"""
+    conn.executescript(DOCUMENT_CARDS_SCHEMA)
+    conn.execute(BACKFILL_DOCUMENT_CARDS_SQL)
+    conn.commit()
+
+
+def ensure_catalog_version(conn):
+    """Create the catalog change counter; the change log triggers bump it"""
+    conn.executescript(CATALOG_VERSION_SCHEMA)
+
+
+def ensure_catalog_changes(conn):
+    """Create the per-entity change log and the triggers that stamp it"""
+    conn.executescript(CATALOG_CHANGES_SCHEMA)
+
+
+def ensure_schema(conn):
+    """Indexes, document cards and the catalog change log; schema.sql leaves them to this
+
+    Runs the DDL and the card backfill only while the database's user_version is behind
+    SCHEMA_VERSION, so once per database; returns whether it did.
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return False
+    ensure_indexes(conn)
+    ensure_document_cards(conn)
+    ensure_catalog_version(conn)
+    ensure_catalog_changes(conn)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+    return True
+
+
+def ensure_database(database_path):
+    """ensure_schema on the database at database_path; servers call it once before their first connection"""
+    conn = sqlite3.connect(database_path, timeout=30.0)
+    try:
+        return ensure_schema(conn)
+    finally:
+        conn.close()
+
+
+def catalog_version(conn):
+    """Current catalog change counter; any write to documents, tags or podcasts moves it"""
+    row = conn.execute(CATALOG_VERSION_SQL).fetchone()
+    return row[0] if row else 0
+
+
+def catalog_changes(conn, since=None):
+    """Documents, tags and podcasts changed or deleted after version since
+
+    since=None, or a version this database never issued, returns the whole catalog with
+    full=True. The returned version is read first, so a write racing the request is at
+    worst sent again on the next sync, never skipped.
+    """
+    version = catalog_version(conn)
+    if since is None or since < 0 or since > version:
+        return {
+            'version': version,
+            'full': True,
+            'documents': list_documents(conn),
+            'tags': list_tags(conn),
+            'podcasts': list_podcasts(conn),
+            'deleted': {'documents': [], 'tags': [], 'podcasts': []}
+        }
+
+    deleted = {'documents': [], 'tags': [], 'podcasts': []}
+    for entity, entity_id in conn.execute(DELETED_ENTITIES_SQL, (since,)).fetchall():
+        deleted[f'{entity}s'].append(entity_id)
+    return {
+        'version': version,
+        'full': False,
+        'documents': [json.loads(row[0]) for row in conn.execute(CHANGED_DOCUMENT_CARDS_SQL, (since,)).fetchall()],
+        'tags': [dict(row) for row in conn.execute(CHANGED_TAGS_SQL, (since,)).fetchall()],
+        'podcasts': [map_podcast(row) for row in conn.execute(CHANGED_PODCASTS_SQL, (since,)).fetchall()],
+        'deleted': deleted
+    }
+
+
+def query_plan(conn, sql, params=()):
+    """EXPLAIN QUERY PLAN details for a statement"""
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+
+def hot_query_plans(conn):
+    """Query plans of the registered hot statements, keyed by name"""
+    return {name: query_plan(conn, sql, params) for name, (sql, params) in HOT_QUERIES.items()}
+
+
+def list_documents(conn):
+    """All document cards, newest first"""
+    return [json.loads(row[0]) for row in conn.execute(LIST_DOCUMENT_CARDS_SQL).fetchall()]
+
+
+def document_fields(fields=None, lang=None):
+    """Card keys selected by ?fields= and ?lang=, in card order, or None for whole cards
+
+    Localized names (summary, detailed_summary, insights) stand for their columns in the
+    requested language, or in every language without lang. Raises ValueError for unknown names.
+    """
+    if fields is None and lang is None:
+        return None
+    if lang is not None and lang not in LANGUAGES:
+        raise ValueError(f"Unsupported language: {lang}")
+
+    languages = (lang,) if lang else LANGUAGES
+    if fields is None:
+        selected = set(DOCUMENT_FIELDS)
+    else:
+        selected = {'id'}
+        for name in fields:
+            if name in LOCALIZED_FIELDS:
+                selected.update(f'{name}_{language}' for language in languages)
+            elif name in DOCUMENT_FIELDS:
+                selected.add(name)
+            else:
+                raise ValueError(f"Unknown field: {name}")
+    if lang:
+        selected -= {f'{name}_{other}' for name in LOCALIZED_FIELDS for other in LANGUAGES if other != lang}
+    return tuple(name for name in DOCUMENT_FIELDS if name in selected)
+
+
+def card_projection(fields):
+    """SQL expression rebuilding a card from document_cards.card with only the given keys"""
+    values = []
+    for name in fields:
+        value = f"json_extract(card, '$.{name}')"
+        values.append(f"'{name}', json({value})" if name in ARRAY_FIELDS else f"'{name}', {value}")
+    return f"json_object({', '.join(values)})"
+
+
+def documents_json(conn, fields=None):
+    """The /api/documents response body, assembled from the pre-serialized cards
+
+    With fields, the cards are cut down in SQL so unused columns never reach Python.
+    """
+    sql = LIST_DOCUMENT_CARDS_SQL if fields is None else PROJECTED_DOCUMENT_CARDS_SQL.format(card=card_projection(fields))
+    cards = [row[0] for row in conn.execute(sql).fetchall()]
+    return '{"documents": [' + ', '.join(cards) + ']}'
+
+
+def get_document_card(conn, document_id):
+    """One document card as served by /api/documents, or None"""
+    row = conn.execute(GET_DOCUMENT_CARD_SQL, (document_id,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def list_podcasts(conn):
+    """All podcasts with their tags and document title, newest first"""
+    return [map_podcast(row) for row in conn.execute(LIST_PODCASTS_SQL).fetchall()]
+
+
+def list_tags(conn):
+    """All tags ordered by name"""
+    return [dict(row) for row in conn.execute(LIST_TAGS_SQL).fetchall()]
+
+
+def get_document(conn, document_id):
+    """Raw document row, or None"""
+    return conn.execute(GET_DOCUMENT_SQL, (document_id,)).fetchone()
+
+
+def search_documents(conn, query='', tags=(), fields=None):
+    """Documents matching a text query and/or any of the tag names, limited to fields if given"""
+    conditions = []
+    params = []
+
+    if query:
+        conditions.append(SEARCH_TEXT_CONDITION)
+        params.extend([f'%{query}%'] * 5)
+
+    if tags:
+        placeholders = ','.join(['?' for _ in tags])
+        conditions.append(f"t.name IN ({placeholders})")
+        params.extend(tags)
+
+    columns = SEARCH_COLUMNS if fields is None else ', '.join(
+        SEARCH_FIELD_COLUMNS.get(name, f'd.{name}') for name in fields)
+    sql = SEARCH_DOCUMENTS_SQL.format(columns=columns, conditions=' AND '.join(conditions) if conditions else '1=1')
+    return [map_document(row) for row in conn.execute(sql, params).fetchall()]
+
+
+def find_relevant_documents(conn, question, limit=5):
+    """Keyword retrieval for chat: documents matching any term of the question"""
+    search_terms = question.lower().split()
+    conditions = []
+    params = []
+
+    # Create individual search conditions for each term
+    for term in search_terms:
+        if len(term) >= 2:  # Skip very short terms
+            conditions.append(CHAT_TEXT_ALL)
+            params.append(f'%{term}%')
+
+    # If no good search terms, search more broadly
+    if not conditions:
+        conditions.append(CHAT_TEXT_EN)
+        params.append(f'%{question.lower()}%')
+
+    sql = RELEVANT_DOCUMENTS_SQL.format(conditions=' OR '.join(conditions))
+    return conn.execute(sql, params + [limit]).fetchall()
+
+
+def recent_documents(conn, limit=3):
+    """Most recent documents, used as chat context when retrieval finds nothing"""
+    return conn.execute(RECENT_DOCUMENTS_SQL, (limit,)).fetchall()
+
+
+def create_chat_session(conn, session_id):
+    conn.execute(CREATE_CHAT_SESSION_SQL, (session_id,))
+
+
+def touch_chat_session(conn, session_id):
+    conn.execute(TOUCH_CHAT_SESSION_SQL, (session_id,))
+
+
+def add_chat_message(conn, session_id, message_type, content, sources=None):
+    """Append a chat message; sources is a list of document ids"""
+    conn.execute(ADD_CHAT_MESSAGE_SQL, (
+        session_id, message_type, content,
+        json.dumps(sources) if sources is not None else None
+    ))
+
+
+def add_chat_exchange(conn, session_id, question, answer, sources=None):
+    """Record a question and its answer and mark the session active, as one write"""
+    touch_chat_session(conn, session_id)
+    add_chat_message(conn, session_id, 'user', question)
+    add_chat_message(conn, session_id, 'assistant', answer, sources)
+
+
+def chat_session_exists(conn, session_id):
+    return conn.execute(CHAT_SESSION_EXISTS_SQL, (session_id,)).fetchone() is not None
+
+
+def page_chat_messages(conn, session_id, before=None, limit=50):
+    """Messages of a session, newest first, older than the before cursor (a message id)"""
+    rows = conn.execute(PAGE_CHAT_MESSAGES_SQL, (session_id, before or LATEST_MESSAGE_ID, limit)).fetchall()
+    return [map_chat_message(row) for row in rows]
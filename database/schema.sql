@@ -216,6 +216,15 @@ CREATE TABLE chat_messages (
     FOREIGN KEY (session_id) REFERENCES chat_sessions(session_id) ON DELETE CASCADE
 );
 
+-- Rolling summary of older chat turns, one row per session
+CREATE TABLE chat_summaries (
+    session_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL DEFAULT '',
+    summarized_through INTEGER NOT NULL DEFAULT 0, -- last chat_messages.id folded into the summary
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (session_id) REFERENCES chat_sessions(session_id) ON DELETE CASCADE
+);
+
 -- Indexes for quiz tables
 CREATE INDEX idx_quizzes_document_id ON quizzes(document_id);
 CREATE INDEX idx_quiz_questions_quiz_id ON quiz_questions(quiz_id);
@@ -227,4 +236,69 @@ CREATE INDEX idx_quiz_attempts_completed_at ON quiz_attempts(completed_at);
 CREATE INDEX idx_chat_sessions_session_id ON chat_sessions(session_id);
 CREATE INDEX idx_chat_sessions_last_activity ON chat_sessions(last_activity);
 CREATE INDEX idx_chat_messages_session_id ON chat_messages(session_id);
-CREATE INDEX idx_chat_messages_created_at ON chat_messages(created_at);
\ No newline at end of file
+CREATE INDEX idx_chat_messages_session_order ON chat_messages(session_id, id);
+CREATE INDEX idx_chat_messages_created_at ON chat_messages(created_at);
+
+-- Batch quiz generation jobs (resumable per document)
+CREATE TABLE quiz_batch_jobs (
+    id TEXT PRIMARY KEY,
+    filter TEXT NOT NULL, -- JSON object: tags, missing_only, limit
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'completed', 'failed')),
+    parallelism INTEGER NOT NULL DEFAULT 4,
+    total_items INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    elapsed_seconds REAL NOT NULL DEFAULT 0,
+    heartbeat_at REAL -- unix time the running process last reported progress
+);
+
+CREATE TABLE quiz_batch_items (
+    job_id TEXT NOT NULL,
+    document_id INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'done', 'skipped', 'failed')),
+    quiz_id INTEGER,
+    error TEXT,
+    generation_seconds REAL,
+    finished_at TIMESTAMP,
+    PRIMARY KEY (job_id, document_id),
+    FOREIGN KEY (job_id) REFERENCES quiz_batch_jobs(id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_quiz_batch_items_status ON quiz_batch_items(job_id, status);
+
+-- Document cards, the catalog version and the catalog change log, with the triggers that
+-- keep them current, are created by database.repository.ensure_schema() from its constants
+
+-- Quiz analytics aggregates, updated with each submission
+CREATE TABLE IF NOT EXISTS quiz_stats (
+    quiz_id INTEGER PRIMARY KEY,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    score_sum INTEGER NOT NULL DEFAULT 0,
+    score_square_sum INTEGER NOT NULL DEFAULT 0, -- for the standard deviation
+    best_score INTEGER,
+    worst_score INTEGER,
+    last_attempt_at TIMESTAMP,
+    FOREIGN KEY (quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS quiz_question_stats (
+    question_id INTEGER PRIMARY KEY,
+    quiz_id INTEGER NOT NULL,
+    correct INTEGER NOT NULL DEFAULT 0,
+    skipped INTEGER NOT NULL DEFAULT 0,
+    picks_a INTEGER NOT NULL DEFAULT 0,
+    picks_b INTEGER NOT NULL DEFAULT 0,
+    picks_c INTEGER NOT NULL DEFAULT 0,
+    picks_d INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (question_id) REFERENCES quiz_questions(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_quiz_question_stats_quiz_id ON quiz_question_stats(quiz_id);
+
+-- Keys of single-flight work held by a worker process, e.g. quiz generation for one document
+CREATE TABLE IF NOT EXISTS flight_locks (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL -- unix time after which a crashed holder's lock is taken over
+);
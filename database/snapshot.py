@@ -0,0 +1,106 @@
+"""
+Read-optimized database snapshots for the serverless deployment
+The build step copies the knowledge base into a compact, fully prepared file (indexes,
+document cards and planner statistics in place, free pages vacuumed away), optionally
+gzipped. A cold serverless instance restores it into /tmp instead of creating an
+empty database from schema.sql, so the first request already finds real data.
+
+    python -m database.snapshot [source.db] [snapshot.db.gz]
+"""
+
+import gzip
+import os
+import shutil
+import sqlite3
+import sys
+import time
+
+from database import repository
+
+SOURCE_PATH = 'database/knowledge_base.db'
+SNAPSHOT_PATH = 'database/knowledge_base.snapshot.db.gz'
+
+# Conversations belong to the users who had them and are not shipped with a deployment
+EXCLUDED_TABLES = ('chat_summaries', 'chat_messages', 'chat_sessions')
+
+COPY_CHUNK = 1024 * 1024
+
+
+def build_snapshot(source_path=SOURCE_PATH, snapshot_path=SNAPSHOT_PATH, keep_chats=False):
+    """Write a vacuumed, analyzed copy of source_path; gzipped when snapshot_path ends in .gz"""
+    started = time.perf_counter()
+    work_path = f'{snapshot_path}.work'
+    vacuumed_path = f'{snapshot_path}.vacuumed'
+    for path in (work_path, vacuumed_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    source = sqlite3.connect(source_path, timeout=30.0)
+    work = sqlite3.connect(work_path)
+    try:
+        source.backup(work)  # consistent copy even while the source is being written
+        work.execute("PRAGMA journal_mode = DELETE")  # a snapshot is a single self-contained file
+
+        tables = {row[0] for row in work.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if not keep_chats:
+            for table in EXCLUDED_TABLES:
+                if table in tables:
+                    work.execute(f"DELETE FROM {table}")
+            work.commit()
+
+        # Everything a new connection would otherwise create on the instance
+        repository.ensure_schema(work)
+        work.execute("ANALYZE")
+        work.commit()
+        work.execute("VACUUM INTO ?", (vacuumed_path,))
+    finally:
+        work.close()
+        source.close()
+        os.remove(work_path)
+
+    size = os.path.getsize(vacuumed_path)
+    if snapshot_path.endswith('.gz'):
+        with open(vacuumed_path, 'rb') as src, gzip.open(f'{snapshot_path}.tmp', 'wb', compresslevel=9) as dst:
+            shutil.copyfileobj(src, dst, COPY_CHUNK)
+        os.remove(vacuumed_path)
+        os.replace(f'{snapshot_path}.tmp', snapshot_path)
+    else:
+        os.replace(vacuumed_path, snapshot_path)
+
+    return {
+        'snapshot': snapshot_path,
+        'source_bytes': os.path.getsize(source_path),
+        'database_bytes': size,
+        'snapshot_bytes': os.path.getsize(snapshot_path),
+        'build_ms': round((time.perf_counter() - started) * 1000, 3)
+    }
+
+
+def load_snapshot(snapshot_path, database_path):
+    """Restore the snapshot to database_path unless a database is already there
+
+    Returns load timings, or None when there is no snapshot to load. A warm instance
+    keeps using the database it restored earlier, with the writes it has taken since.
+    """
+    if os.path.exists(database_path) or not os.path.exists(snapshot_path):
+        return None
+
+    started = time.perf_counter()
+    partial_path = f'{database_path}.loading'
+    opener = gzip.open if snapshot_path.endswith('.gz') else open
+    with opener(snapshot_path, 'rb') as src, open(partial_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, COPY_CHUNK)
+    os.replace(partial_path, database_path)  # never expose a half-written database
+
+    return {
+        'snapshot': snapshot_path,
+        'database_bytes': os.path.getsize(database_path),
+        'load_ms': round((time.perf_counter() - started) * 1000, 3)
+    }
+
+
+if __name__ == '__main__':
+    result = build_snapshot(*sys.argv[1:3])
+    print(f"Snapshot {result['snapshot']}: {result['snapshot_bytes']:,} bytes "
+          f"({result['database_bytes']:,} uncompressed, source {result['source_bytes']:,}) "
+          f"in {result['build_ms']:.0f} ms")
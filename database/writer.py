@@ -0,0 +1,232 @@
+"""
+Group-commit writer for small append-only writes
+A single thread owns the write connection and drains a bounded queue, running every
+write that arrived during the previous commit inside one transaction. Concurrent chat
+and quiz submissions then share one WAL fsync instead of queueing on the write lock.
+"""
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+WRITER_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = FULL',  # a resolved future means the write survives a power loss
+    'PRAGMA busy_timeout = 30000',
+)
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+_STOP = object()
+
+
+class WriterBusy(Exception):
+    """The write queue is full; the caller should back off and retry"""
+
+
+class WriteTimeout(Exception):
+    """The write was queued but not committed in time; it stays queued and may still be committed"""
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class GroupCommitWriter:
+    """Serializes writes onto one connection and commits them in groups"""
+
+    def __init__(self, database_path, max_queue=1024, max_batch=128, enqueue_timeout=1.0,
+                 pragmas=WRITER_PRAGMAS, factory=sqlite3.Connection, window=1024):
+        self.database_path = database_path
+        self.max_queue = max_queue
+        self.max_batch = max_batch              # writes per transaction at most
+        self.enqueue_timeout = enqueue_timeout  # seconds submit() waits for room before raising WriterBusy
+        self.pragmas = pragmas
+        self.factory = factory
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._commit_ms = deque(maxlen=window)  # recent commit latencies
+        self._ack_ms = deque(maxlen=window)     # recent submit-to-durable latencies
+        self._histogram = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self._stats = {'submitted': 0, 'committed': 0, 'failed': 0, 'rejected': 0, 'timed_out': 0,
+                       'batches': 0, 'failed_batches': 0, 'max_batch_size': 0, 'peak_queue_depth': 0}
+
+    def submit(self, fn, *args):
+        """Queue fn(conn, *args) to run in the next group; the Future resolves once it is committed
+
+        fn runs on the writer thread inside a savepoint, so a failing write only fails its
+        own Future. It must not wait on other writes, or the writer deadlocks.
+        """
+        self.start()
+        future = Future()
+        try:
+            self._queue.put((fn, args, future, time.perf_counter()), timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise WriterBusy(f"write queue full ({self.max_queue} pending)")
+
+        depth = self._queue.qsize()
+        with self._lock:
+            self._stats['submitted'] += 1
+            self._stats['peak_queue_depth'] = max(self._stats['peak_queue_depth'], depth)
+        return future
+
+    def write(self, fn, *args, timeout=30.0):
+        """Run fn(conn, *args) through the queue and wait until it is durable; returns its result
+
+        Raises WriterBusy when the queue is full, so nothing was written, and WriteTimeout when
+        the write is not committed after timeout seconds. It is still queued then and may yet be
+        committed, so a retry can write it twice.
+        """
+        future = self.submit(fn, *args)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._stats['timed_out'] += 1
+            raise WriteTimeout(f"write not committed within {timeout:g} s, it may still be saved")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """Commit everything already queued, then stop the writer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        """Queue depth, batch sizes and commit latency for monitoring"""
+        with self._lock:
+            stats = dict(self._stats)
+            commit_ms = list(self._commit_ms)
+            ack_ms = list(self._ack_ms)
+            histogram = list(self._histogram)
+
+        labels = [f'<={bound}' for bound in BATCH_SIZE_BUCKETS] + [f'>{BATCH_SIZE_BUCKETS[-1]}']
+        batches = stats['batches']
+        stats.update({
+            'queue_depth': self._queue.qsize(),
+            'max_queue': self.max_queue,
+            'max_batch': self.max_batch,
+            'mean_batch_size': round(stats['committed'] / batches, 2) if batches else None,
+            'batch_sizes': dict(zip(labels, histogram)),
+            'commit_ms': {
+                'p50': percentile(commit_ms, 0.5),
+                'p95': percentile(commit_ms, 0.95),
+                'max': max(commit_ms) if commit_ms else None
+            },
+            'ack_ms': {
+                'p50': percentile(ack_ms, 0.5),
+                'p95': percentile(ack_ms, 0.95),
+                'p99': percentile(ack_ms, 0.99)
+            },
+            'running': self._thread is not None and self._thread.is_alive()
+        })
+        return stats
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database_path, timeout=30.0, isolation_level=None,
+                               check_same_thread=False, factory=self.factory)
+        conn.row_factory = sqlite3.Row
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        return conn
+
+    def _run(self):
+        conn = None
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            # Everything that queued up while the previous group was committing joins this one
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                if conn is None:
+                    conn = self._connect()
+                self._commit(conn, batch)
+            except Exception as e:
+                logging.error(f"Group commit of {len(batch)} writes failed: {e}")
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                with self._lock:
+                    self._stats['failed'] += len(batch)
+                    self._stats['failed_batches'] += 1
+                if conn is not None:
+                    conn.close()
+                    conn = None  # reconnect for the next group
+
+        if conn is not None:
+            conn.close()
+
+    def _commit(self, conn, batch):
+        results = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for fn, args, _, _ in batch:
+                conn.execute("SAVEPOINT group_write")
+                try:
+                    results.append((True, fn(conn, *args)))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO group_write")
+                    results.append((False, e))
+                conn.execute("RELEASE group_write")
+
+            start = time.perf_counter()
+            conn.execute("COMMIT")
+            commit_ms = round((time.perf_counter() - start) * 1000, 3)
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+        acked = time.perf_counter()
+        failed = 0
+        for (ok, value), (_, _, future, _) in zip(results, batch):
+            if ok:
+                future.set_result(value)
+            else:
+                failed += 1
+                future.set_exception(value)
+
+        size = len(batch)
+        bucket = next((i for i, bound in enumerate(BATCH_SIZE_BUCKETS) if size <= bound), len(BATCH_SIZE_BUCKETS))
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['committed'] += size - failed
+            self._stats['failed'] += failed
+            self._stats['max_batch_size'] = max(self._stats['max_batch_size'], size)
+            self._histogram[bucket] += 1
+            self._commit_ms.append(commit_ms)
+            self._ack_ms.extend(round((acked - queued_at) * 1000, 3) for _, _, _, queued_at in batch)
@@ -0,0 +1,125 @@
+"""
+Server-Sent Events change feed
+Writers publish small change events into an in-memory ring buffer; clients keep one
+/api/events stream open instead of polling, and fetch only the items that changed.
+Reconnecting clients resume from Last-Event-ID, or are told to resync when the events
+they missed are no longer buffered or were published by an earlier process.
+Each open stream holds a request thread, so at most max_clients are served at once;
+beyond that clients get 503 with Retry-After and fall back to checking now and then.
+"""
+
+import json
+import threading
+import time
+import uuid
+from collections import deque
+
+from flask import Response, jsonify, request
+
+RETRY_MS = 5000  # reconnect delay suggested to EventSource clients
+REFUSED_RETRY_SECONDS = 30  # Retry-After for streams over max_clients
+
+
+class EventFeed:
+    """Bounded, resumable sequence of change events"""
+
+    def __init__(self, max_events=1000, heartbeat_seconds=15, max_stream_seconds=300, max_clients=None):
+        self.max_events = max_events
+        self.max_clients = max_clients                # open streams at most; None for no limit
+        self.heartbeat_seconds = heartbeat_seconds    # comment lines keep proxies from closing idle streams
+        self.max_stream_seconds = max_stream_seconds  # streams end so threads recycle; clients resume
+        self.boot = uuid.uuid4().hex[:8]             # event ids from another process are never resumed
+        self._events = deque(maxlen=max_events)      # (seq, type, data)
+        self._seq = 0
+        self._condition = threading.Condition()
+        self._clients = 0
+        self._refused = 0
+
+    @property
+    def last_event_id(self):
+        with self._condition:
+            return f'{self.boot}-{self._seq}'
+
+    def publish(self, event_type, data):
+        """Append an event and wake every waiting stream; returns its id"""
+        with self._condition:
+            self._seq += 1
+            self._events.append((self._seq, event_type, data))
+            self._condition.notify_all()
+            return f'{self.boot}-{self._seq}'
+
+    def since(self, last_event_id):
+        """Events after last_event_id, or None when the client has to resync"""
+        boot, _, seq = (last_event_id or '').partition('-')
+        if boot != self.boot or not seq.isdigit():
+            return None
+        seq = int(seq)
+        with self._condition:
+            if seq > self._seq or (self._events and seq < self._events[0][0] - 1):
+                return None
+            return [event for event in self._events if event[0] > seq]
+
+    def stream(self, last_event_id=None):
+        """SSE text for one client: missed events first, then live events and heartbeats"""
+        with self._condition:  # reentrant: since() takes it too
+            missed = self.since(last_event_id) if last_event_id else []
+            position = self._seq
+        yield f'retry: {RETRY_MS}\n\n'
+        if missed is None:
+            yield self._format(position, 'resync', {})
+        else:
+            for event in missed:
+                yield self._format(*event)
+        yield self._format(position, 'ready', {})
+
+        deadline = time.monotonic() + self.max_stream_seconds
+        while time.monotonic() < deadline:
+            with self._condition:
+                self._condition.wait_for(lambda: self._seq > position, timeout=self.heartbeat_seconds)
+                events = [event for event in self._events if event[0] > position]
+            if not events:
+                yield ': keepalive\n\n'
+                continue
+            for event in events:
+                yield self._format(*event)
+            position = events[-1][0]
+
+    def response(self):
+        """Streaming response for the current request; resumes from Last-Event-ID
+
+        The client's slot is taken here and freed when the server closes the response,
+        even if the stream never started; over max_clients the answer is 503.
+        """
+        with self._condition:
+            if self.max_clients is not None and self._clients >= self.max_clients:
+                self._refused += 1
+                return jsonify({'error': 'Too many open event streams, try again later'}), 503, {
+                    'Retry-After': str(REFUSED_RETRY_SECONDS)
+                }
+            self._clients += 1
+
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        response = Response(self.stream(last_event_id), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # nginx must pass events through as they are written
+        })
+        response.call_on_close(self._leave)
+        return response
+
+    def stats(self):
+        with self._condition:
+            return {
+                'last_event_id': f'{self.boot}-{self._seq}',
+                'buffered': len(self._events),
+                'max_events': self.max_events,
+                'clients': self._clients,
+                'max_clients': self.max_clients,
+                'refused': self._refused
+            }
+
+    def _leave(self):
+        with self._condition:
+            self._clients -= 1
+
+    def _format(self, seq, event_type, data):
+        return f'id: {self.boot}-{seq}\nevent: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
@@ -0,0 +1,120 @@
+"""
+Static file delivery for documents and podcasts
+Files are served with byte-range support and strong ETags derived from their content.
+Links carrying the content version (?v=) never change meaning, so they are cached as
+immutable; plain links redirect to the current version. The byte copying itself can be
+handed to the front web server with X-Sendfile or X-Accel-Redirect.
+"""
+
+import hashlib
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+
+from flask import Response, redirect, request, send_file
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+HASH_CHUNK = 1024 * 1024
+VERSION_LENGTH = 16  # hex digits of the content hash used in ?v=
+
+
+class FileServer:
+    """Range-capable, content-validated file responses with optional offload to the web server"""
+
+    def __init__(self, offload=None, accel_prefix='/protected-files', max_hashes=1024):
+        if offload not in (None, '', 'sendfile', 'accel'):
+            raise ValueError(f"Unknown file offload mode: {offload}")
+        self.offload = offload or None    # 'sendfile' (Apache, lighttpd) or 'accel' (nginx)
+        self.accel_prefix = accel_prefix  # nginx internal location mapped to the served folders
+        self.max_hashes = max_hashes
+        self._hashes = OrderedDict()      # path -> (size, mtime_ns, sha256 hex)
+        self._lock = threading.Lock()
+        self._stats = {'served': 0, 'not_modified': 0, 'partial': 0, 'redirects': 0,
+                       'offloaded': 0, 'hashed_bytes': 0}
+
+    def digest(self, path):
+        """SHA-256 of a file's content, recomputed only when its size or mtime changes"""
+        stat = os.stat(path)
+        with self._lock:
+            cached = self._hashes.get(path)
+            if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+                self._hashes.move_to_end(path)
+                return cached[2]
+
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+
+        with self._lock:
+            self._hashes[path] = (stat.st_size, stat.st_mtime_ns, digest)
+            self._hashes.move_to_end(path)
+            while len(self._hashes) > self.max_hashes:
+                self._hashes.popitem(last=False)
+            self._stats['hashed_bytes'] += stat.st_size
+        return digest
+
+    def send(self, folder, filename, offload_path=None, redirect_unversioned=True):
+        """Response for filename inside folder, honouring Range, If-None-Match and If-Range
+
+        offload_path is the file's location below accel_prefix for X-Accel-Redirect.
+        """
+        path = safe_join(os.path.abspath(folder), filename)
+        if path is None or not os.path.isfile(path):
+            raise NotFound()
+
+        digest = self.digest(path)
+        version = digest[:VERSION_LENGTH]
+        requested = request.args.get('v')
+        if requested != version and (requested is not None or redirect_unversioned):
+            # Plain and outdated links move to the immutable URL of the current content
+            with self._lock:
+                self._stats['redirects'] += 1
+            response = redirect(f"{quote(request.path)}?v={version}", code=302)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+
+        etag = digest[:32]
+        if self.offload:
+            response = self._offload(path, filename if offload_path is None else offload_path, etag)
+        else:
+            response = send_file(path, conditional=True, etag=etag)
+            response.headers['Accept-Ranges'] = 'bytes'
+
+        if requested == version:
+            response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+
+        with self._lock:
+            self._stats['served'] += 1
+            self._stats['not_modified'] += response.status_code == 304
+            self._stats['partial'] += response.status_code == 206
+        return response
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['hashes_cached'] = len(self._hashes)
+        stats['offload'] = self.offload
+        return stats
+
+    def _offload(self, path, relative_path, etag):
+        """Headers-only response; the front server streams the file and handles ranges"""
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+            if self.offload == 'sendfile':
+                response.headers['X-Sendfile'] = path
+            else:
+                response.headers['X-Accel-Redirect'] = quote(f"{self.accel_prefix}/{relative_path}")
+            with self._lock:
+                self._stats['offloaded'] += 1
+        response.set_etag(etag)
+        return response
@@ -0,0 +1,227 @@
+"""
+Incremental parsing of structured JSON replies from the LLM
+Surfaces array items as soon as they are complete, validates them against a small
+schema and repairs truncated or malformed replies instead of discarding them
+"""
+
+import json
+
+
+class optional:
+    """Marks a schema field that may be absent"""
+
+    def __init__(self, spec):
+        self.spec = spec
+
+
+def validate(value, schema, path='$'):
+    """Return a list of schema violations; an empty list means the value is valid
+
+    Schemas are plain Python values: a type (str, int), a tuple of allowed values,
+    a one-element list describing array items, or a dict of field schemas.
+    """
+    if isinstance(schema, dict):
+        if not isinstance(value, dict):
+            return [f"{path}: expected object"]
+        errors = []
+        for key, spec in schema.items():
+            if isinstance(spec, optional):
+                if key in value and value[key] is not None:
+                    errors.extend(validate(value[key], spec.spec, f"{path}.{key}"))
+            elif key not in value:
+                errors.append(f"{path}.{key}: missing")
+            else:
+                errors.extend(validate(value[key], spec, f"{path}.{key}"))
+        return errors
+
+    if isinstance(schema, list):
+        if not isinstance(value, list):
+            return [f"{path}: expected array"]
+        errors = []
+        for i, item in enumerate(value):
+            errors.extend(validate(item, schema[0], f"{path}[{i}]"))
+        return errors
+
+    if isinstance(schema, tuple):
+        return [] if value in schema else [f"{path}: expected one of {', '.join(map(str, schema))}"]
+
+    if not isinstance(value, schema):
+        return [f"{path}: expected {schema.__name__}"]
+    return []
+
+
+class StreamingJSONParser:
+    """Scans an LLM reply chunk by chunk, tracking nesting outside of strings
+
+    Text before the first '{' (prose, markdown fences) and after the matching '}'
+    is ignored. When item_path names a key of the top-level object holding an array
+    of objects, each element is decoded and validated as soon as its closing brace
+    arrives.
+    """
+
+    def __init__(self, item_path=None, item_schema=None):
+        self.item_path = item_path
+        self.item_schema = item_schema
+        self.items = []     # validated array items, in order
+        self.rejected = []  # (item, errors) for items that failed validation
+        self.text = ''
+        self.root_start = None
+        self.root_end = None
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._cut_points = []  # (position, container types) where the text can be truncated and closed
+
+    @property
+    def complete(self):
+        """True once the top-level object has closed"""
+        return self.root_end is not None
+
+    def feed(self, chunk):
+        """Consume more text and return items completed by it"""
+        self.text += chunk or ''
+        completed = []
+        text = self.text
+        i = self._pos
+
+        while i < len(text) and not self.complete:
+            ch = text[i]
+
+            if self.root_start is None:
+                if ch == '{':
+                    self.root_start = i
+                    self._open('{', i)
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._close_string(i)
+            elif ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in '{[':
+                self._open(ch, i)
+            elif ch in '}]':
+                frame = self._stack.pop()
+                if frame['type'] == '{' and self._in_item_array():
+                    item = self._decode_item(text[frame['start']:i + 1])
+                    if item is not None:
+                        completed.append(item)
+                if self._stack:
+                    self._cut_points.append((i + 1, self._container_types()))
+                else:
+                    self.root_end = i + 1
+            elif ch == ':':
+                self._stack[-1]['expect_key'] = False
+            elif ch == ',':
+                self._cut_points.append((i, self._container_types()))
+                if self._stack[-1]['type'] == '{':
+                    self._stack[-1]['expect_key'] = True
+            i += 1
+
+        self._pos = i
+        return completed
+
+    def result(self):
+        """Decode the top-level object, repairing a truncated or malformed reply
+
+        Returns (data, repaired) where data is None when nothing could be recovered.
+        """
+        if self.root_start is None:
+            return None, False
+
+        if self.complete:
+            try:
+                return json.loads(self.text[self.root_start:self.root_end]), False
+            except ValueError:
+                pass
+
+        return self._repair(), True
+
+    def _open(self, kind, position):
+        self._stack.append({'type': kind, 'start': position, 'key': None, 'expect_key': kind == '{'})
+        self._cut_points.append((position + 1, self._container_types()))
+
+    def _close_string(self, position):
+        frame = self._stack[-1]
+        if frame['type'] == '{' and frame['expect_key']:
+            try:
+                frame['key'] = json.loads(self.text[self._string_start:position + 1])
+            except ValueError:
+                frame['key'] = None
+        else:
+            self._cut_points.append((position + 1, self._container_types()))
+
+    def _in_item_array(self):
+        return (self.item_path is not None and len(self._stack) == 2
+                and self._stack[1]['type'] == '[' and self._stack[0]['key'] == self.item_path)
+
+    def _decode_item(self, fragment):
+        try:
+            item = json.loads(fragment)
+        except ValueError as e:
+            self.rejected.append((fragment, [f"invalid JSON: {e}"]))
+            return None
+
+        errors = validate(item, self.item_schema) if self.item_schema is not None else []
+        if errors:
+            self.rejected.append((item, errors))
+            return None
+
+        self.items.append(item)
+        return item
+
+    def _container_types(self):
+        return ''.join(frame['type'] for frame in self._stack)
+
+    def _repair(self):
+        """Close open strings and containers, backing off to earlier cut points until the text parses"""
+        end = self.root_end or len(self.text)
+        body = self.text[self.root_start:end]
+        candidates = []
+        if not self.complete:
+            tail = '"' if self._in_string else ''
+            candidates.append(body + tail + self._closers(self._container_types()))
+
+        for position, containers in reversed(self._cut_points):
+            if position <= end:
+                fragment = self.text[self.root_start:position].rstrip().rstrip(',')
+                candidates.append(fragment + self._closers(containers))
+
+        for candidate in candidates:
+            try:
+                return json.loads(candidate)
+            except ValueError:
+                continue
+        return None
+
+    @staticmethod
+    def _closers(containers):
+        return ''.join('}' if kind == '{' else ']' for kind in reversed(containers))
+
+
+def parse_llm_json(text, schema=None):
+    """Parse a complete LLM reply, repairing it if needed
+
+    Returns (data, errors, repaired). Top-level fields that fail validation are
+    dropped from data rather than discarding the whole reply.
+    """
+    parser = StreamingJSONParser()
+    parser.feed(text)
+    data, repaired = parser.result()
+    if not isinstance(data, dict):
+        return None, ['$: no JSON object found'], repaired
+
+    errors = []
+    if schema is not None:
+        for key, spec in schema.items():
+            field_errors = validate({key: data[key]} if key in data else {}, {key: spec})
+            if field_errors:
+                errors.extend(field_errors)
+                data.pop(key, None)
+    return data, errors, repaired
@@ -0,0 +1,49 @@
+"""
+Lazily constructed Groq client
+The groq package pulls in an HTTP client and model validation layer that dominate cold
+start, so entry points hold a LazyGroqClient instead and the package is imported and
+the real client built on the first AI call
+"""
+
+import importlib.util
+import logging
+import threading
+
+
+def groq_installed():
+    """True when the groq package can be imported, without importing it"""
+    try:
+        return importlib.util.find_spec('groq') is not None
+    except ValueError:
+        return True  # already imported without a module spec
+
+
+class LazyGroqClient:
+    """Stands in for groq.Groq; truthy when AI calls are possible, built on first attribute access"""
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+        self.installed = groq_installed()
+        self._client = None
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.api_key) and self.installed
+
+    def __getattr__(self, name):
+        # Only reached for attributes of the real client, e.g. groq_client.chat
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.client(), name)
+
+    def client(self):
+        """The real Groq client, importing groq and constructing it on first use"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    if not self:
+                        raise RuntimeError('Groq client not configured')
+                    from groq import Groq
+                    self._client = Groq(api_key=self.api_key)
+                    logging.info("Groq AI client initialized")
+        return self._client
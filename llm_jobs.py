@@ -0,0 +1,186 @@
+"""
+Offloaded execution of slow LLM-bound requests
+Chat answers and quiz generation run on a small dedicated thread pool instead of on the
+server's request threads. Clients sending `Prefer: respond-async` get 202 Accepted and a job
+URL at once, so any number of waiting questions costs queue entries rather than threads.
+Synchronous callers still wait, but only sync_slots of them at a time, with at most
+sync_queue more waiting for a slot, leaving the remaining request threads to list,
+search and file requests. Neither waits longer than timeout seconds for a result: a job
+still queued then is cancelled, a running one is left to finish with nobody waiting on it.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from admission import ConcurrencyGate
+
+
+class JobsBusy(Exception):
+    """Raised when the job queue or the synchronous slots are full"""
+
+
+class JobTimeout(JobsBusy):
+    """Raised when a job does not finish in time; it is cancelled if it had not started yet"""
+
+
+class LLMJobs:
+    """Bounded pool for LLM-bound handler bodies returning (body, status_code[, headers])"""
+
+    def __init__(self, max_workers=8, max_pending=1000, sync_slots=4, sync_queue=0, sync_wait=10.0,
+                 result_ttl=600, context=None, timeout=None):
+        self.max_workers = max_workers    # concurrent LLM calls
+        self.max_pending = max_pending    # queued plus running jobs
+        self.sync_slots = sync_slots      # request threads allowed to block on a job
+        self.result_ttl = result_ttl      # seconds finished results stay available
+        self.context = context            # e.g. app.app_context, entered around each job
+        self.timeout = timeout            # seconds run() and call() wait for a result; None waits forever
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-job')
+        self._slots = ConcurrencyGate(sync_slots, max_waiting=sync_queue, timeout=sync_wait)
+        self._jobs = {}                   # job id -> state dict
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0,
+                       'sync': 0, 'sync_rejected': 0, 'timed_out': 0, 'cancelled': 0, 'peak_pending': 0}
+        self._durations = []
+
+    def submit(self, fn, *args):
+        """Queue fn(*args) and return its job id; raises JobsBusy when max_pending jobs are waiting"""
+        return self._submit(fn, args)[0]
+
+    def run(self, fn, *args):
+        """Run fn(*args) on the pool and wait for it
+
+        Raises JobsBusy when no sync slot frees up in time, and JobTimeout, a JobsBusy, when
+        the job has not finished after timeout seconds.
+        """
+        if not self.acquire_slot():
+            raise JobsBusy('Too many AI requests in progress, try again shortly')
+        try:
+            with self._lock:
+                self._stats['sync'] += 1
+            job_id, future = self._submit(fn, args)
+            return self._wait(job_id, future)
+        finally:
+            self.release_slot()
+
+    def call(self, fn, *args):
+        """fn(*args) on the pool for background work such as batch jobs; no sync slot, fn's exceptions propagate"""
+        job_id, future = self._submit(self._capture, (fn, args))
+        try:
+            ok, value = self._wait(job_id, future)
+        finally:
+            with self._lock:
+                self._jobs.pop(job_id, None)  # nobody polls for it
+        if not ok:
+            raise value
+        return value
+
+    def acquire_slot(self):
+        """Claim a synchronous slot, e.g. for a streamed response or an upload; False when busy"""
+        if self._slots.acquire():
+            return True
+        with self._lock:
+            self._stats['sync_rejected'] += 1
+        return False
+
+    def release_slot(self):
+        self._slots.release()
+
+    def status(self, job_id):
+        """Public view of a job, or None when it is unknown or expired"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {'status': job['status'], 'result': job['result']}
+
+    def shutdown(self, wait=True):
+        """Stop taking jobs; with wait, finish the queued and running ones first"""
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = self._pending
+            stats['stored_results'] = len(self._jobs)
+            durations = sorted(self._durations)
+        stats['max_workers'] = self.max_workers
+        stats['max_pending'] = self.max_pending
+        stats['sync_slots'] = self.sync_slots
+        stats['sync_gate'] = self._slots.stats()
+        stats['duration_ms_p50'] = round(durations[len(durations) // 2] * 1000, 3) if durations else None
+        stats['duration_ms_p95'] = round(durations[int(len(durations) * 0.95)] * 1000, 3) if durations else None
+        return stats
+
+    def _submit(self, fn, args):
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._expire()
+            if self._pending >= self.max_pending:
+                self._stats['rejected'] += 1
+                raise JobsBusy('Too many AI requests waiting, try again shortly')
+            self._pending += 1
+            self._stats['submitted'] += 1
+            self._stats['peak_pending'] = max(self._stats['peak_pending'], self._pending)
+            job = {'status': 'pending', 'finished_at': None, 'result': None}
+            self._jobs[job_id] = job
+        try:
+            future = self._executor.submit(self._run, job, fn, args)
+        except RuntimeError:  # shut down
+            with self._lock:
+                self._pending -= 1
+                del self._jobs[job_id]
+            raise JobsBusy('Server is shutting down')
+        return job_id, future
+
+    def _wait(self, job_id, future):
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            cancelled = future.cancel()  # only succeeds while the job is still queued
+            with self._lock:
+                self._stats['timed_out'] += 1
+                if cancelled:  # _run never will, so settle its bookkeeping here
+                    self._stats['cancelled'] += 1
+                    self._pending -= 1
+                    self._jobs.pop(job_id, None)
+            raise JobTimeout(f"AI request not finished within {self.timeout:g} s, try again shortly")
+
+    @staticmethod
+    def _capture(fn, args):
+        try:
+            return True, fn(*args)
+        except Exception as e:
+            return False, e
+
+    def _run(self, job, fn, args):
+        job['status'] = 'running'
+        start = time.perf_counter()
+        try:
+            if self.context:
+                with self.context():
+                    result = fn(*args)
+            else:
+                result = fn(*args)
+            status = 'completed'
+        except Exception as e:
+            logging.error(f"LLM job failed: {e}")
+            result = ({'error': str(e)}, 500)
+            status = 'failed'
+        with self._lock:
+            job.update(status=status, result=result, finished_at=time.time())
+            self._pending -= 1
+            self._stats[status] += 1
+            self._durations.append(time.perf_counter() - start)
+            del self._durations[:-1024]
+        return result
+
+    def _expire(self):
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['finished_at'] is not None and job['finished_at'] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -0,0 +1,234 @@
+"""
+Prometheus metrics for the server
+Request latency histograms per route, method and status, SQLite time per request, and
+latency, token and error counts per LLM call site are recorded in process memory and
+rendered in the Prometheus text format at /metrics, together with gauges read from the
+existing stats() of queues and caches when scraped. Recording is a bisect and a few
+additions under a lock, cheap enough for the hot paths.
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, request
+
+# Histogram bucket upper bounds in seconds
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+LLM_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+class Counter:
+    """Monotonic totals per label values"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}  # label values -> total
+        self._lock = threading.Lock()
+
+    def inc(self, label_values=(), amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [(self.name, format_labels(self.labels, key), value) for key, value in sorted(values.items())]
+
+
+class Histogram:
+    """Observation counts in fixed buckets, with sum and count, per label values"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=HTTP_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts (last is +Inf), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        samples = []
+        for key, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                labels = format_labels(self.labels + ('le',), key + (bound,))
+                samples.append((f'{self.name}_bucket', labels, cumulative))
+            labels = format_labels(self.labels, key)
+            samples.append((f'{self.name}_sum', labels, total))
+            samples.append((f'{self.name}_count', labels, cumulative))
+        return samples
+
+
+class Collected:
+    """Gauge or counter whose value is read from a callback at scrape time"""
+
+    def __init__(self, name, help_text, read, label=None, kind='gauge'):
+        self.name = name
+        self.help_text = help_text
+        self.read = read    # () -> number, or {label value: number} when label is set
+        self.label = label
+        self.kind = kind
+
+    def samples(self):
+        value = self.read()
+        if self.label is None:
+            return [] if value is None else [(self.name, '', value)]
+        return [(self.name, format_labels((self.label,), (key,)), item)
+                for key, item in sorted(value.items()) if item is not None]
+
+
+class Metrics:
+    """Request, SQLite and LLM instrumentation plus scrape-time gauges, rendered for Prometheus"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.requests = Histogram('kb_http_request_duration_seconds',
+                                  'Time until the response is returned to the server (first byte for streams)',
+                                  ('route', 'method', 'status'), HTTP_BUCKETS)
+        self.request_sql = Histogram('kb_http_request_sqlite_seconds',
+                                     'SQLite execute and fetch time spent by each request',
+                                     ('route',), SQL_BUCKETS)
+        self.request_statements = Counter('kb_http_request_sqlite_statements_total',
+                                          'SQL statements executed by requests', ('route',))
+        self.background_sql = Counter('kb_background_sqlite_seconds_total',
+                                      'SQLite time spent outside requests: writer, AI jobs, batch jobs')
+        self.llm_duration = Histogram('kb_llm_call_duration_seconds',
+                                      'Groq completion latency per call site, until the last streamed chunk',
+                                      ('site',), LLM_BUCKETS)
+        self.llm_calls = Counter('kb_llm_calls_total', 'Groq completions per call site and outcome',
+                                 ('site', 'outcome'))
+        self.llm_tokens = Counter('kb_llm_tokens_total', 'Tokens sent (in) and generated (out) per call site',
+                                  ('site', 'direction'))
+        self._metrics = [self.requests, self.request_sql, self.request_statements, self.background_sql,
+                         self.llm_duration, self.llm_calls, self.llm_tokens]
+        self._local = threading.local()
+
+    def init_app(self, app):
+        """Time every request; register before other after_request hooks so their work is included"""
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def collect(self, name, help_text, read, label=None, kind='gauge'):
+        """Expose a value read at scrape time, e.g. a queue depth from a component's stats()"""
+        self._metrics.append(Collected(name, help_text, read, label, kind))
+
+    def add_sql_time(self, seconds, statements=0):
+        """Charge SQLite time to the request being served on this thread, or to background work"""
+        local = self._local
+        if getattr(local, 'start', None) is not None:
+            local.sql += seconds
+            local.statements += statements
+        else:
+            self.background_sql.inc((), seconds)
+
+    def llm_call(self, site, create, **kwargs):
+        """create(**kwargs) timed under an LLM call site; streamed replies are timed to their end"""
+        start = time.perf_counter()
+        try:
+            result = create(**kwargs)
+        except Exception:
+            self._record_llm(site, start, 'error')
+            raise
+        if kwargs.get('stream'):
+            return self._timed_stream(site, start, result)
+        self._record_llm(site, start, 'ok', getattr(result, 'usage', None))
+        return result
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                logging.error(f"Error collecting metric {metric.name}: {e}")
+                continue
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(f'{name}{labels} {format_value(value)}' for name, labels, value in samples)
+        lines.append('# HELP kb_process_start_time_seconds Start time of the process since the epoch')
+        lines.append('# TYPE kb_process_start_time_seconds gauge')
+        lines.append(f'kb_process_start_time_seconds {format_value(self.started_at)}')
+        return '\n'.join(lines) + '\n'
+
+    def response(self):
+        return Response(self.render(), content_type=CONTENT_TYPE, headers={'Cache-Control': 'no-store'})
+
+    def _start_request(self):
+        local = self._local
+        local.start = time.perf_counter()
+        local.sql = 0.0
+        local.statements = 0
+
+    def _finish_request(self, response):
+        local = self._local
+        start = getattr(local, 'start', None)
+        if start is None:
+            return response
+        local.start = None
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        self.requests.observe((route, request.method, str(response.status_code)), time.perf_counter() - start)
+        self.request_sql.observe((route,), local.sql)
+        if local.statements:
+            self.request_statements.inc((route,), local.statements)
+        return response
+
+    def _timed_stream(self, site, start, stream):
+        outcome = 'error'
+        usage = None
+        try:
+            for chunk in stream:
+                # Groq reports usage on the last chunk, under x_groq
+                usage = getattr(chunk, 'usage', None) or getattr(getattr(chunk, 'x_groq', None), 'usage', None) or usage
+                yield chunk
+            outcome = 'ok'
+        except GeneratorExit:
+            outcome = 'cancelled'
+            raise
+        finally:
+            self._record_llm(site, start, outcome, usage)
+
+    def _record_llm(self, site, start, outcome, usage=None):
+        self.llm_duration.observe((site,), time.perf_counter() - start)
+        self.llm_calls.inc((site, outcome))
+        if usage is not None:
+            self.llm_tokens.inc((site, 'in'), getattr(usage, 'prompt_tokens', 0) or 0)
+            self.llm_tokens.inc((site, 'out'), getattr(usage, 'completion_tokens', 0) or 0)
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Batch quiz generation across the knowledge base
+Generates quizzes concurrently with bounded parallelism, writes them in batched
+transactions and records per-document progress so an interrupted job can resume.
+A job is claimed in the database before it runs, so it runs at most once at a time across
+processes; a claim whose heartbeat stopped, e.g. after a crash, can be taken over.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+BATCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quiz_batch_jobs (
+    id TEXT PRIMARY KEY,
+    filter TEXT NOT NULL, -- JSON object: tags, missing_only, limit
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'completed', 'failed')),
+    parallelism INTEGER NOT NULL DEFAULT 4,
+    total_items INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    elapsed_seconds REAL NOT NULL DEFAULT 0,
+    heartbeat_at REAL -- unix time the running process last reported progress
+);
+
+CREATE TABLE IF NOT EXISTS quiz_batch_items (
+    job_id TEXT NOT NULL,
+    document_id INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'done', 'skipped', 'failed')),
+    quiz_id INTEGER,
+    error TEXT,
+    generation_seconds REAL,
+    finished_at TIMESTAMP,
+    PRIMARY KEY (job_id, document_id),
+    FOREIGN KEY (job_id) REFERENCES quiz_batch_jobs(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_quiz_batch_items_status ON quiz_batch_items(job_id, status);
+"""
+
+
+# A running job whose heartbeat is older than this is considered dead and may be resumed
+CLAIM_LEASE_SECONDS = 300
+
+
+def ensure_batch_schema(conn):
+    """Create the batch job tables on databases that predate them"""
+    conn.executescript(BATCH_SCHEMA)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(quiz_batch_jobs)")]
+    if 'heartbeat_at' not in columns:
+        conn.execute("ALTER TABLE quiz_batch_jobs ADD COLUMN heartbeat_at REAL")
+        conn.commit()
+
+
+def save_quiz(cursor, document_id, quiz_data):
+    """Insert a generated quiz and its questions, returning the new quiz id"""
+    cursor.execute("""
+        INSERT INTO quizzes (document_id, title, description, total_questions)
+        VALUES (?, ?, ?, ?)
+    """, (document_id, quiz_data['title'], quiz_data.get('description', ''), len(quiz_data['questions'])))
+
+    quiz_id = cursor.lastrowid
+
+    cursor.executemany("""
+        INSERT INTO quiz_questions
+        (quiz_id, question_text, option_a, option_b, option_c, option_d, correct_answer, explanation, question_order)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(
+        quiz_id,
+        question['question'],
+        question['options']['A'],
+        question['options']['B'],
+        question['options']['C'],
+        question['options']['D'],
+        question['correct_answer'],
+        question.get('explanation', ''),
+        i + 1
+    ) for i, question in enumerate(quiz_data['questions'])])
+
+    return quiz_id
+
+
+def select_documents(cursor, tags=None, missing_only=True, limit=None):
+    """Return document ids matching the batch filter, oldest first"""
+    conditions = []
+    params = []
+
+    if tags:
+        placeholders = ','.join(['?' for _ in tags])
+        conditions.append(f"""
+            d.id IN (SELECT dt.document_id FROM document_tags dt
+                     JOIN tags t ON dt.tag_id = t.id
+                     WHERE t.name IN ({placeholders}))
+        """)
+        params.extend(tags)
+
+    if missing_only:
+        conditions.append("NOT EXISTS (SELECT 1 FROM quizzes q WHERE q.document_id = d.id)")
+
+    query = f"""
+        SELECT d.id FROM documents d
+        WHERE {' AND '.join(conditions) if conditions else '1=1'}
+        ORDER BY d.id
+    """
+    if limit:
+        query += " LIMIT ?"
+        params.append(int(limit))
+
+    cursor.execute(query, params)
+    return [row[0] for row in cursor.fetchall()]
+
+
+class QuizBatchJob:
+    """Runs quiz generation for many documents with bounded parallelism"""
+
+    active_jobs = set()  # job ids running in this process
+
+    def __init__(self, connect, generate_fn, parallelism=4, batch_size=10):
+        self.connect = connect          # returns a configured sqlite3 connection
+        self.generate_fn = generate_fn  # document row -> quiz dict (title, description, questions) to save,
+                                        # or the id of the quiz it stored itself
+        self.parallelism = max(1, int(parallelism))
+        self.batch_size = max(1, int(batch_size))
+
+    def create(self, tags=None, missing_only=True, limit=None):
+        """Record a new job and its work items, returning the job id"""
+        job_id = str(uuid.uuid4())
+        conn = self.connect()
+        try:
+            ensure_batch_schema(conn)
+            cursor = conn.cursor()
+            document_ids = select_documents(cursor, tags, missing_only, limit)
+
+            cursor.execute("""
+                INSERT INTO quiz_batch_jobs (id, filter, parallelism, total_items)
+                VALUES (?, ?, ?, ?)
+            """, (job_id, json.dumps({'tags': tags or [], 'missing_only': missing_only, 'limit': limit}),
+                  self.parallelism, len(document_ids)))
+            cursor.executemany("""
+                INSERT INTO quiz_batch_items (job_id, document_id) VALUES (?, ?)
+            """, [(job_id, document_id) for document_id in document_ids])
+            conn.commit()
+        finally:
+            conn.close()
+        return job_id
+
+    def claim(self, job_id, lease=CLAIM_LEASE_SECONDS):
+        """Mark the job running for this caller; False when another run holds a live claim
+
+        Failed items go back to pending, so resuming a job retries them.
+        """
+        now = time.time()
+        conn = self.connect()
+        try:
+            ensure_batch_schema(conn)
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE quiz_batch_jobs
+                SET status = 'running', started_at = COALESCE(started_at, CURRENT_TIMESTAMP), finished_at = NULL,
+                    heartbeat_at = ?
+                WHERE id = ? AND (status != 'running' OR heartbeat_at IS NULL OR heartbeat_at < ?)
+            """, (now, job_id, now - lease))
+            claimed = cursor.rowcount == 1
+            if claimed:
+                cursor.execute("""
+                    UPDATE quiz_batch_items SET status = 'pending', error = NULL, finished_at = NULL
+                    WHERE job_id = ? AND status = 'failed'
+                """, (job_id,))
+            conn.commit()
+        finally:
+            conn.close()
+        return claimed
+
+    def start(self, job_id):
+        """Claim the job and run it on a background thread; None when it is already running"""
+        if not self.claim(job_id):
+            return None
+        thread = threading.Thread(target=self._run_claimed, args=(job_id,), name=f"quiz-batch-{job_id[:8]}",
+                                  daemon=True)
+        thread.start()
+        return thread
+
+    def run(self, job_id):
+        """Generate quizzes for every pending item; safe to call again to resume. None when already running"""
+        if not self.claim(job_id):
+            return None
+        return self._run_claimed(job_id)
+
+    def _run_claimed(self, job_id):
+        QuizBatchJob.active_jobs.add(job_id)
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT d.* FROM quiz_batch_items i
+                JOIN documents d ON d.id = i.document_id
+                WHERE i.job_id = ? AND i.status = 'pending'
+                ORDER BY d.id
+            """, (job_id,))
+            documents = cursor.fetchall()
+
+            # Items whose document was deleted since the job was created
+            cursor.execute("""
+                UPDATE quiz_batch_items SET status = 'skipped', error = 'Document not found', finished_at = CURRENT_TIMESTAMP
+                WHERE job_id = ? AND status = 'pending'
+                  AND document_id NOT IN (SELECT id FROM documents)
+            """, (job_id,))
+            conn.commit()
+
+            started = time.monotonic()
+            last_heartbeat = started
+            pending = []
+            status = 'failed'
+            try:
+                with ThreadPoolExecutor(max_workers=self.parallelism) as executor:
+                    futures = {executor.submit(self._generate, document): document['id'] for document in documents}
+                    for future in as_completed(futures):
+                        pending.append((futures[future],) + future.result())
+                        if len(pending) >= self.batch_size:
+                            self._write_batch(conn, job_id, pending)  # renews the claim too
+                            pending = []
+                            last_heartbeat = time.monotonic()
+                        elif time.monotonic() - last_heartbeat > CLAIM_LEASE_SECONDS / 5:
+                            self._heartbeat(conn, job_id)
+                            last_heartbeat = time.monotonic()
+                if pending:
+                    self._write_batch(conn, job_id, pending)
+                status = 'completed'
+            except Exception as e:
+                logging.error(f"Quiz batch {job_id} failed: {e}")
+            finally:
+                cursor.execute("""
+                    UPDATE quiz_batch_jobs
+                    SET status = ?, finished_at = CURRENT_TIMESTAMP, elapsed_seconds = elapsed_seconds + ?
+                    WHERE id = ?
+                """, (status, time.monotonic() - started, job_id))
+                conn.commit()
+        finally:
+            conn.close()
+            QuizBatchJob.active_jobs.discard(job_id)
+
+        return self.report(job_id)
+
+    def report(self, job_id):
+        """Progress and throughput for a job, or None if it does not exist"""
+        conn = self.connect()
+        try:
+            ensure_batch_schema(conn)
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM quiz_batch_jobs WHERE id = ?", (job_id,))
+            job = cursor.fetchone()
+            if not job:
+                return None
+
+            cursor.execute("""
+                SELECT status, COUNT(*) AS count, AVG(generation_seconds) AS avg_seconds
+                FROM quiz_batch_items WHERE job_id = ? GROUP BY status
+            """, (job_id,))
+            counts = {'pending': 0, 'done': 0, 'skipped': 0, 'failed': 0}
+            avg_generation = None
+            for row in cursor.fetchall():
+                counts[row['status']] = row['count']
+                if row['status'] == 'done':
+                    avg_generation = row['avg_seconds']
+
+            cursor.execute("""
+                SELECT document_id, error FROM quiz_batch_items
+                WHERE job_id = ? AND status = 'failed' ORDER BY document_id LIMIT 20
+            """, (job_id,))
+            errors = [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+        elapsed = job['elapsed_seconds']
+        return {
+            'job_id': job['id'],
+            'status': job['status'],
+            'filter': json.loads(job['filter']),
+            'parallelism': job['parallelism'],
+            'total': job['total_items'],
+            'counts': counts,
+            'elapsed_seconds': round(elapsed, 3),
+            'quizzes_per_minute': round(counts['done'] * 60 / elapsed, 2) if elapsed else None,
+            'avg_generation_seconds': round(avg_generation, 3) if avg_generation is not None else None,
+            'started_at': job['started_at'],
+            'finished_at': job['finished_at'],
+            'errors': errors
+        }
+
+    def _generate(self, document):
+        """Call the generator, capturing failures per item instead of aborting the batch"""
+        started = time.monotonic()
+        try:
+            return self.generate_fn(document), None, time.monotonic() - started
+        except Exception as e:
+            return None, str(e), time.monotonic() - started
+
+    def _heartbeat(self, conn, job_id):
+        """Keep the claim alive while items take long to generate"""
+        conn.execute("UPDATE quiz_batch_jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+        conn.commit()
+
+    def _write_batch(self, conn, job_id, results):
+        """Persist a batch of generated quizzes and their item status in one transaction"""
+        cursor = conn.cursor()
+        try:
+            for document_id, quiz_data, error, seconds in results:
+                status, quiz_id = 'failed', None
+                if isinstance(quiz_data, int):
+                    status, quiz_id = 'done', quiz_data
+                elif quiz_data is not None:
+                    # Another request may have created a quiz while this one was generating
+                    cursor.execute("SELECT id FROM quizzes WHERE document_id = ?", (document_id,))
+                    existing = cursor.fetchone()
+                    if existing:
+                        status, quiz_id, error = 'skipped', existing[0], 'Quiz already exists'
+                    else:
+                        try:
+                            cursor.execute("SAVEPOINT quiz_item")
+                            quiz_id = save_quiz(cursor, document_id, quiz_data)
+                            cursor.execute("RELEASE quiz_item")
+                            status = 'done'
+                        except (KeyError, TypeError, ValueError) as e:
+                            cursor.execute("ROLLBACK TO quiz_item")
+                            cursor.execute("RELEASE quiz_item")
+                            error = f"Invalid quiz data: {e}"
+
+                cursor.execute("""
+                    UPDATE quiz_batch_items
+                    SET status = ?, quiz_id = ?, error = ?, generation_seconds = ?, finished_at = CURRENT_TIMESTAMP
+                    WHERE job_id = ? AND document_id = ?
+                """, (status, quiz_id, error, seconds, job_id, document_id))
+            cursor.execute("UPDATE quiz_batch_jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generate quizzes for many documents')
+    parser.add_argument('--tag', action='append', dest='tags', help='Only documents with this tag (repeatable)')
+    parser.add_argument('--all', action='store_true', help='Include documents that already have a quiz')
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--parallelism', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--resume', metavar='JOB_ID', help='Resume an interrupted job')
+    args = parser.parse_args()
+
+    from server_enhanced import get_db_connection, generate_batch_quiz
+
+    job = QuizBatchJob(get_db_connection, generate_batch_quiz, args.parallelism, args.batch_size)
+    job_id = args.resume or job.create(args.tags, not args.all, args.limit)
+    print(f"Running quiz batch {job_id}")
+    report = job.run(job_id)
+    if report is None:
+        raise SystemExit(f"Quiz batch {job_id} is already running")
+    print(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,196 @@
+"""
+Incrementally maintained quiz analytics
+Each submission updates per-quiz and per-question aggregates in the same transaction
+that stores the attempt, so statistics are read without scanning quiz_attempts
+"""
+
+import json
+import math
+import threading
+
+OPTIONS = ('A', 'B', 'C', 'D')
+
+STATS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quiz_stats (
+    quiz_id INTEGER PRIMARY KEY,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    score_sum INTEGER NOT NULL DEFAULT 0,
+    score_square_sum INTEGER NOT NULL DEFAULT 0, -- for the standard deviation
+    best_score INTEGER,
+    worst_score INTEGER,
+    last_attempt_at TIMESTAMP,
+    FOREIGN KEY (quiz_id) REFERENCES quizzes(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS quiz_question_stats (
+    question_id INTEGER PRIMARY KEY,
+    quiz_id INTEGER NOT NULL,
+    correct INTEGER NOT NULL DEFAULT 0,
+    skipped INTEGER NOT NULL DEFAULT 0,
+    picks_a INTEGER NOT NULL DEFAULT 0,
+    picks_b INTEGER NOT NULL DEFAULT 0,
+    picks_c INTEGER NOT NULL DEFAULT 0,
+    picks_d INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (question_id) REFERENCES quiz_questions(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_quiz_question_stats_quiz_id ON quiz_question_stats(quiz_id);
+"""
+
+
+def ensure_stats_schema(conn):
+    """Create the aggregate tables, folding in attempts recorded before they existed"""
+    exists_sql = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'quiz_stats'"
+    if conn.execute(exists_sql).fetchone():
+        return
+
+    # Create and backfill in one write transaction so no submission is counted twice or missed
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if not conn.execute(exists_sql).fetchone():  # another process may have won the race
+            for statement in STATS_SCHEMA.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+            rebuild_stats(conn.cursor())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def rebuild_stats(cursor):
+    """Recompute every aggregate from quiz_attempts"""
+    cursor.execute("DELETE FROM quiz_stats")
+    cursor.execute("DELETE FROM quiz_question_stats")
+
+    correct_answers = {}
+    cursor.execute("SELECT id, quiz_id, correct_answer FROM quiz_questions")
+    for question_id, quiz_id, correct_answer in cursor.fetchall():
+        correct_answers.setdefault(quiz_id, {})[question_id] = correct_answer
+
+    cursor.execute("SELECT quiz_id, score, answers, completed_at FROM quiz_attempts ORDER BY id")
+    for quiz_id, score, answers, completed_at in cursor.fetchall():
+        try:
+            user_answers = json.loads(answers) if answers else {}
+        except ValueError:
+            user_answers = {}
+        if not isinstance(user_answers, dict):
+            user_answers = {}
+        results = [{
+            'question_id': question_id,
+            'user_answer': user_answers.get(str(question_id), ''),
+            'is_correct': user_answers.get(str(question_id), '') == correct_answer
+        } for question_id, correct_answer in correct_answers.get(quiz_id, {}).items()]
+        record_attempt(cursor, quiz_id, score, results, completed_at)
+
+
+def record_attempt(cursor, quiz_id, score, results, completed_at=None):
+    """Fold one graded attempt into the aggregates; call inside the attempt's transaction"""
+    cursor.execute("""
+        INSERT INTO quiz_stats (quiz_id, attempts, score_sum, score_square_sum, best_score, worst_score, last_attempt_at)
+        VALUES (?, 1, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+        ON CONFLICT(quiz_id) DO UPDATE SET
+            attempts = attempts + 1,
+            score_sum = score_sum + excluded.score_sum,
+            score_square_sum = score_square_sum + excluded.score_square_sum,
+            best_score = MAX(best_score, excluded.best_score),
+            worst_score = MIN(worst_score, excluded.worst_score),
+            last_attempt_at = excluded.last_attempt_at
+    """, (quiz_id, score, score * score, score, score, completed_at))
+
+    rows = []
+    for result in results:
+        answer = result['user_answer'] if result['user_answer'] in OPTIONS else None
+        rows.append((
+            result['question_id'], quiz_id,
+            int(bool(result['is_correct'])), int(answer is None),
+            int(answer == 'A'), int(answer == 'B'), int(answer == 'C'), int(answer == 'D')
+        ))
+
+    cursor.executemany("""
+        INSERT INTO quiz_question_stats (question_id, quiz_id, correct, skipped, picks_a, picks_b, picks_c, picks_d)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(question_id) DO UPDATE SET
+            correct = correct + excluded.correct,
+            skipped = skipped + excluded.skipped,
+            picks_a = picks_a + excluded.picks_a,
+            picks_b = picks_b + excluded.picks_b,
+            picks_c = picks_c + excluded.picks_c,
+            picks_d = picks_d + excluded.picks_d
+    """, rows)
+
+
+def save_attempt(conn, quiz_id, score, total_questions, answers, results):
+    """Store a graded attempt together with its aggregate updates; returns the attempt id"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO quiz_attempts (quiz_id, user_identifier, score, total_questions, answers)
+        VALUES (?, ?, ?, ?, ?)
+    """, (quiz_id, 'anonymous', score, total_questions, json.dumps(answers)))
+    attempt_id = cursor.lastrowid
+    record_attempt(cursor, quiz_id, score, results)
+    return attempt_id
+
+
+def quiz_stats(cursor, quiz_id):
+    """Aggregate statistics for a quiz; cost depends on its question count, not its attempts"""
+    cursor.execute("SELECT * FROM quiz_stats WHERE quiz_id = ?", (quiz_id,))
+    summary = cursor.fetchone()
+    attempts = summary['attempts'] if summary else 0
+
+    mean = summary['score_sum'] / attempts if attempts else None
+    stddev = None
+    if attempts:
+        variance = summary['score_square_sum'] / attempts - mean * mean
+        stddev = round(math.sqrt(max(variance, 0.0)), 2)
+
+    cursor.execute("""
+        SELECT q.id, q.question_order, q.correct_answer,
+               COALESCE(s.correct, 0) AS correct, COALESCE(s.skipped, 0) AS skipped,
+               COALESCE(s.picks_a, 0) AS picks_a, COALESCE(s.picks_b, 0) AS picks_b,
+               COALESCE(s.picks_c, 0) AS picks_c, COALESCE(s.picks_d, 0) AS picks_d
+        FROM quiz_questions q
+        LEFT JOIN quiz_question_stats s ON s.question_id = q.id
+        WHERE q.quiz_id = ?
+        ORDER BY q.question_order
+    """, (quiz_id,))
+
+    questions = []
+    for row in cursor.fetchall():
+        correct_rate = row['correct'] / attempts if attempts else None
+        questions.append({
+            'question_id': row['id'],
+            'question_order': row['question_order'],
+            'correct_answer': row['correct_answer'],
+            'correct': row['correct'],
+            'skipped': row['skipped'],
+            'picks': {option: row[f'picks_{option.lower()}'] for option in OPTIONS},
+            'correct_rate': round(correct_rate, 4) if correct_rate is not None else None,
+            'difficulty': round(1 - correct_rate, 4) if correct_rate is not None else None  # share who missed it
+        })
+
+    return {
+        'quiz_id': quiz_id,
+        'attempts': attempts,
+        'mean_score': round(mean, 2) if mean is not None else None,
+        'score_stddev': stddev,
+        'best_score': summary['best_score'] if summary else None,
+        'worst_score': summary['worst_score'] if summary else None,
+        'last_attempt_at': summary['last_attempt_at'] if summary else None,
+        'questions': questions
+    }
+
+
+class QuizAnalytics:
+    """Checks the aggregate schema once per process before the first read or write"""
+
+    def __init__(self):
+        self._schema_ready = False
+        self._lock = threading.Lock()
+
+    def ready(self, conn):
+        if not self._schema_ready:
+            with self._lock:
+                if not self._schema_ready:
+                    ensure_stats_schema(conn)
+                    self._schema_ready = True
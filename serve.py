@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Production entry point
+Serves one of the Flask entry points with a real WSGI server instead of the development
+server: gunicorn with threaded workers on Linux and macOS, waitress on Windows or where
+gunicorn is not installed. Workers finish in-flight requests, queued AI jobs and queued
+database writes before exiting on SIGTERM / Ctrl+C:
+
+    python serve.py [server_enhanced|server|app] [--host 0.0.0.0] [--port 8080]
+                    [--workers 1] [--threads 32] [--graceful-timeout 30]
+
+The write queue, change feed, caches and AI jobs live in process memory, so a single worker
+with many threads is the default; extra workers each keep their own copy, which suits only
+read-mostly deployments. Every open /api/events stream holds one of the threads, so at most
+a quarter of them (EVENT_STREAMS_MAX) stream events; size --threads to four times the number
+of browser tabs expected to stay open.
+"""
+
+import argparse
+import importlib
+import logging
+import os
+import sys
+
+ENTRY_POINTS = ('server_enhanced', 'server', 'app')
+
+
+def load_app(module_name):
+    return importlib.import_module(module_name).app
+
+
+def shutdown_module(module_name):
+    """Run the entry point's own shutdown hook, if it has one"""
+    module = sys.modules.get(module_name)
+    if module is not None and hasattr(module, 'shutdown'):
+        module.shutdown()
+
+
+def serve_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{args.host}:{args.port}')
+            self.cfg.set('workers', args.workers)
+            self.cfg.set('threads', args.threads)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('graceful_timeout', args.graceful_timeout)
+            self.cfg.set('timeout', args.timeout)
+            self.cfg.set('keepalive', 5)
+            self.cfg.set('accesslog', '-' if args.access_log else None)
+            self.cfg.set('worker_exit', lambda server, worker: shutdown_module(args.module))
+
+        def load(self):
+            # Imported in each worker, after the fork: threads and SQLite connections never cross it
+            return load_app(args.module)
+
+    Application().run()
+
+
+def serve_waitress(args):
+    from waitress import serve
+
+    app = load_app(args.module)
+    if args.workers > 1:
+        logging.warning("waitress runs a single process; ignoring --workers")
+    try:
+        serve(app, host=args.host, port=args.port, threads=args.threads,
+              channel_timeout=args.timeout, connection_limit=max(100, args.threads * 4))
+    finally:
+        shutdown_module(args.module)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('module', nargs='?', default=os.getenv('SERVE_MODULE', 'server_enhanced'),
+                        choices=ENTRY_POINTS, help='entry point to serve')
+    parser.add_argument('--host', default=os.getenv('SERVE_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('SERVE_PORT', os.getenv('PORT', '8080'))))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('SERVE_WORKERS', '1')),
+                        help='processes; state such as the write queue is per process')
+    parser.add_argument('--threads', type=int, default=int(os.getenv('SERVE_THREADS', '32')),
+                        help='request threads per process')
+    parser.add_argument('--timeout', type=int, default=int(os.getenv('SERVE_TIMEOUT', '120')),
+                        help='seconds before a silent worker or idle connection is dropped')
+    parser.add_argument('--graceful-timeout', type=int, default=int(os.getenv('SERVE_GRACEFUL_TIMEOUT', '30')),
+                        help='seconds a stopping worker gets to finish its requests')
+    parser.add_argument('--server', choices=('auto', 'gunicorn', 'waitress'),
+                        default=os.getenv('SERVE_SERVER', 'auto'))
+    parser.add_argument('--access-log', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # Streams over the cap get 503, so the other threads stay free for ordinary requests
+    os.environ.setdefault('EVENT_STREAMS_MAX', str(max(1, args.threads // 4)))
+    server = args.server
+    if server == 'auto':
+        server = 'waitress'
+        if os.name != 'nt':
+            try:
+                import gunicorn  # noqa: F401
+                server = 'gunicorn'
+            except ImportError:
+                pass
+
+    logging.info(f"Serving {args.module} with {server} on http://{args.host}:{args.port} "
+                 f"({args.workers} worker(s) x {args.threads} threads, "
+                 f"{os.environ['EVENT_STREAMS_MAX']} event streams each)")
+    if server == 'gunicorn':
+        serve_gunicorn(args)
+    else:
+        serve_waitress(args)
+
+
+if __name__ == '__main__':
+    main()
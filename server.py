@@ -1,11 +1,18 @@
 from flask import Flask, jsonify, send_from_directory, request
 from flask_cors import CORS
 import os
-import PyPDF2
 import json
+import threading
+import time
 from datetime import datetime
-from groq import Groq
 from pathlib import Path
+from admission import ConcurrencyGate, RateLimiter, parse_limits
+from catalog_cache import CatalogCache
+from compression import ResponseCompressor, StaticAssets
+from event_feed import EventFeed
+from file_server import FileServer
+from llm_client import LazyGroqClient
+from single_flight import SingleFlight
 
 app = Flask(__name__)
 CORS(app)
@@ -13,26 +20,178 @@ CORS(app)
 # Configuration
 KB_FOLDER = r"d:\KB"
 AUDIO_EXTENSIONS = ['.wav', '.mp3', '.m4a']
+# Large files whose plain links redirect to immutable content-versioned URLs
+VERSIONED_EXTENSIONS = ('.pdf',) + tuple(AUDIO_EXTENSIONS)
+# Let the front web server stream files: '' (Flask sends them), 'sendfile' or 'accel' (nginx)
+FILE_OFFLOAD = os.getenv('FILE_OFFLOAD', '')
+FILE_ACCEL_PREFIX = os.getenv('FILE_ACCEL_PREFIX', '/protected-files')
+# Front-end files served precompressed
+STATIC_ASSETS = ('index.html', 'app.js', 'app-dynamic.js', 'styles.css')
+# Card keys selectable with ?fields=; summary and insights hold one entry per language
+CARD_FIELDS = ('filename', 'title', 'summary', 'insights', 'podcast_file', 'mtime', 'processed_at', 'error')
+CARD_LANGUAGES = ('en', 'th')
+# Seconds between scans of the KB folder for added, changed or removed documents
+FOLDER_WATCH_INTERVAL = float(os.getenv('FOLDER_WATCH_INTERVAL', '5'))
+# Open /api/events streams per process; each holds a request thread, serve.py defaults it to --threads / 4
+EVENT_STREAMS_MAX = int(os.getenv('EVENT_STREAMS_MAX', '8'))
+# Per-client token buckets for /api/refresh, which reprocesses every file: count/seconds[:burst]
+RATE_LIMITS = parse_limits(os.getenv('RATE_LIMITS', 'refresh=2/60:1'))
+REFRESH_RETRY_AFTER = 10  # seconds suggested to clients while another refresh is running
 
 # Groq AI Configuration
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')  # ตั้งค่าใน environment variable
 GROQ_MODEL = "llama-3.1-70b-versatile"  # หรือ "llama3-8b-8192" สำหรับความเร็ว
 
-# Initialize Groq client
-try:
-    groq_client = Groq(api_key=GROQ_API_KEY) if GROQ_API_KEY else None
-    if groq_client and GROQ_API_KEY:
-        print("✅ Groq AI initialized successfully")
-    else:
-        print("⚠️ Groq API Key not found - AI analysis disabled")
-        print("   Run 'setup-groq.bat' to enable AI features")
-except Exception as e:
-    print(f"❌ Error initializing Groq: {e}")
-    groq_client = None
+# Groq client, imported and constructed on the first analysis of a new file
+groq_client = LazyGroqClient(GROQ_API_KEY)
+if groq_client:
+    print("✅ Groq AI enabled")
+elif not groq_client.installed:
+    print("❌ Groq package not installed - AI analysis disabled")
+else:
+    print("⚠️ Groq API Key not found - AI analysis disabled")
+    print("   Run 'setup-groq.bat' to enable AI features")
+
+# Hand-written summaries and insights for the documents the knowledge base shipped with;
+# built once at import and shared by every card that uses them
+KNOWN_DOCUMENTS = {
+    'Maximization of Steel Ladle Free Open Rate.pdf': {
+        'summary': {
+            'en': {
+                'short': 'This document presents comprehensive strategies for maximizing steel ladle free open rates through advanced process optimization, predictive maintenance, and operational excellence in steel manufacturing.',
+                'detailed': 'This comprehensive research document explores advanced methodologies for maximizing steel ladle free open rates in modern metallurgical operations. The study addresses critical challenges in steel production including ladle turnaround time optimization, thermal efficiency management, and equipment reliability enhancement. Key areas covered include: 1) Implementation of predictive maintenance algorithms using IoT sensors and machine learning to anticipate ladle degradation patterns, 2) Advanced scheduling optimization techniques that balance production demands with ladle availability constraints, 3) Thermal management strategies to reduce heating time and energy consumption while maintaining steel quality standards, 4) Root cause analysis of ladle failure modes and development of preventive countermeasures, 5) Integration of real-time monitoring systems for continuous performance tracking, 6) Cost-benefit analysis demonstrating potential savings of $2-5 million annually through improved ladle utilization rates, and 7) Implementation roadmap with specific KPIs and milestone targets for steel manufacturing facilities seeking to optimize their ladle operations.'
+            },
+            'th': {
+                'short': 'เอกสารนี้นำเสนอกลยุทธ์ที่ครอบคลุมสำหรับการเพิ่มอัตราการเปิดฟรีของเหล็กหล่อให้สูงสุด ผ่านการปรับปรุงกระบวนการขั้นสูง การบำรุงรักษาเชิงทำนาย และความเป็นเลิศในการดำเนินงานการผลิตเหล็ก',
+                'detailed': 'เอกสารการวิจัยฉบับครอบคลุมนี้สำรวจวิธีการขั้นสูงสำหรับการเพิ่มอัตราการเปิดฟรีของเหล็กหล่อให้สูงสุดในการดำเนินงานโลหะวิทยาสมัยใหม่ การศึกษานี้จัดการกับความท้าทายที่สำคัญในการผลิตเหล็ก รวมถึงการปรับปรุงเวลาหมุนเวียนของเหล็กหล่อ การจัดการประสิทธิภาพทางความร้อน และการเสริมสร้างความน่าเชื่อถือของอุปกรณ์'
+            }
+        },
+        'insights': {
+            'en': [
+                'Preventive maintenance schedules can increase ladle availability by 15-20% and reduce unplanned downtime by up to 35%',
+                'IoT sensor integration with machine learning algorithms enables 48-72 hours advance failure prediction',
+                'Thermal efficiency optimization can reduce energy consumption per heat by 12-18% while maintaining steel quality',
+                'Real-time monitoring systems provide ROI of 300-500% within 18 months through improved ladle lifecycle management'
+            ],
+            'th': [
+                'ตารางการบำรุงรักษาเชิงป้องกันสามารถเพิ่มความพร้อมใช้งานของเหล็กหล่อได้ 15-20% และลดเวลาหยุดทำงานที่ไม่ได้วางแผนได้สูงสุด 35%',
+                'การรวมเซ็นเซอร์ IoT กับอัลกอริทึม machine learning ช่วยให้สามารถทำนายความล้มเหลวล่วงหน้า 48-72 ชั่วโมง',
+                'การปรับปรุงประสิทธิภาพความร้อนสามารถลดการใช้พลังงานต่อครั้งได้ 12-18% ในขณะที่รักษาคุณภาพเหล็ก',
+                'ระบบติดตามแบบเรียลไทม์ให้ ROI 300-500% ภายใน 18 เดือนผ่านการจัดการวงจรชีวิตเหล็กหล่อที่ดีขึ้น'
+            ]
+        }
+    },
+    'Data mining techniques for failure prediction in CCM by AIST 25-11-20 1.pdf': {
+        'summary': {
+            'en': {
+                'short': 'This cutting-edge research paper presents comprehensive data mining techniques, machine learning algorithms, and predictive analytics methodologies specifically engineered for anticipating equipment failures in complex industrial environments.',
+                'detailed': 'This pioneering research paper delivers an exhaustive examination of advanced data mining techniques and machine learning methodologies specifically engineered for predictive maintenance and failure forecasting in complex industrial ecosystems. The study focuses on Continuous Casting Machine (CCM) operations and presents sophisticated algorithmic approaches including ensemble learning, time-series analysis, and real-time anomaly detection. Key methodologies explored include: 1) Multi-layer neural networks with LSTM architectures for sequential pattern recognition, 2) Random Forest and Gradient Boosting techniques for feature importance ranking, 3) Statistical process control integration with machine learning models, 4) Edge computing implementations for real-time decision making, and 5) Comprehensive validation frameworks using historical failure data from steel manufacturing facilities.'
+            },
+            'th': {
+                'short': 'งานวิจัยล้ำสมัยฉบับนี้นำเสนอเทคนิคการขุดข้อมูลที่ครอบคลุม อัลกอริทึมการเรียนรู้ของเครื่อง และวิธีการวิเคราะห์เชิงพยากรณ์ที่ออกแบบมาเฉพาะสำหรับการคาดการณ์ความล้มเหลวของอุปกรณ์ในสภาพแวดล้อมอุตสาหกรรมที่ซับซ้อน',
+                'detailed': 'งานวิจัยบุกเบิกฉบับนี้นำเสนอการตรวจสอบอย่างละเอียดของเทคนิคการขุดข้อมูลขั้นสูงและวิธีการเรียนรู้ของเครื่องที่ออกแบบมาเฉพาะสำหรับการบำรุงรักษาเชิงทำนายและการพยากรณ์ความล้มเหลวในระบบนิเวศอุตสาหกรรมที่ซับซ้อน การศึกษาเน้นไปที่การดำเนินงานของเครื่องหล่อต่อเนื่อง (CCM) และนำเสนอแนวทางอัลกอริทึมที่ซับซ้อน'
+            }
+        },
+        'insights': {
+            'en': [
+                'Ensemble machine learning algorithms achieve 85-95% failure prediction accuracy with <3% false positive rates',
+                'Feature engineering from time-series sensor data improves prediction performance by 35-45% over raw data approaches',
+                'Real-time Apache Kafka/Spark architectures enable millisecond-level anomaly detection for critical equipment',
+                'LSTM neural networks show 40% better performance than traditional statistical methods for sequential failure pattern recognition'
+            ],
+            'th': [
+                'อัลกอริทึม Ensemble machine learning บรรลุความแม่นยำในการทำนายความล้มเหลว 85-95% พร้อมอัตรา false positive <3%',
+                'การสร้าง Feature จากข้อมูลเซ็นเซอร์ time-series ปรับปรุงประสิทธิภาพการทำนาย 35-45% เทียบกับวิธีข้อมูลดิบ',
+                'สถาปัตยกรรม Apache Kafka/Spark แบบเรียลไทม์ช่วยให้สามารถตรวจจับความผิดปกติในระดับมิลลิวินาทีสำหรับอุปกรณ์สำคัญ',
+                'โครงข่ายประสาท LSTM แสดงประสิทธิภาพที่ดีกว่า 40% เทียบกับวิธีทางสิถิติแบบดั้งเดิมในการจดจำรูปแบบความล้มเหลวแบบลำดับ'
+            ]
+        }
+    },
+    'SecondaryTemperatureControl.pdf': {
+        'summary': {
+            'en': {
+                'short': 'This technical paper explores advanced secondary temperature control systems and methodologies for maintaining optimal temperature conditions in industrial manufacturing processes.',
+                'detailed': 'This comprehensive technical document examines sophisticated secondary temperature control systems designed for precision manufacturing environments. The paper addresses critical challenges in maintaining consistent temperature profiles across complex industrial processes. Key areas covered include: 1) Advanced PID controller tuning methodologies with adaptive parameters, 2) Multi-zone temperature management strategies for large-scale equipment, 3) Sensor fusion techniques combining thermocouples, infrared, and thermal imaging data, 4) Model predictive control (MPC) implementations for anticipatory temperature adjustments, 5) Energy optimization algorithms that balance temperature precision with power consumption, 6) Integration with SCADA systems for centralized monitoring and control, and 7) Fault detection and diagnostic capabilities for early identification of temperature control system failures.'
+            },
+            'th': {
+                'short': 'เอกสารทางเทคนิคนี้สำรวจระบบควบคุมอุณหภูมิรองขั้นสูงและวิธีการสำหรับการรักษาสภาวะอุณหภูมิที่เหมาะสมในกระบวนการผลิตอุตสาหกรรม',
+                'detailed': 'เอกสารทางเทคนิคที่ครอบคลุมนี้ตรวจสอบระบบควบคุมอุณหภูมิรองที่ซับซ้อนที่ออกแบบมาสำหรับสภาพแวดล้อมการผลิตที่มีความแม่นยำ เอกสารนี้จัดการกับความท้าทายที่สำคัญในการรักษาโปรไฟล์อุณหภูมิที่สม่ำเสมอในกระบวนการอุตสาหกรรมที่ซับซ้อน'
+            }
+        },
+        'insights': {
+            'en': [
+                'Advanced PID controllers with adaptive tuning reduce temperature variance by 60-75% compared to fixed-parameter systems',
+                'Multi-zone control strategies can achieve ±0.5°C precision across large industrial furnaces and processing equipment',
+                'Predictive temperature control algorithms reduce energy consumption by 15-25% while maintaining process quality standards',
+                'Sensor fusion approaches improve temperature measurement accuracy by 30-40% and provide redundancy for critical applications'
+            ],
+            'th': [
+                'ตัวควบคุม PID ขั้นสูงพร้อมการปรับแต่งแบบปรับตัวได้ลดความแปรปรวนของอุณหภูมิ 60-75% เทียบกับระบบพารามิเตอร์คงที่',
+                'กลยุทธ์การควบคุมหลายโซนสามารถบรรลุความแม่นยำ ±0.5°C ในเตาอุตสาหกรรมขนาดใหญ่และอุปกรณ์ประมวลผล',
+                'อัลกอริทึมการควบคุมอุณหภูมิเชิงทำนายลดการใช้พลังงาน 15-25% ในขณะที่รักษามาตรฐานคุณภาพของกระบวนการ',
+                'แนวทางการรวมเซ็นเซอร์ปรับปรุงความแม่นยำในการวัดอุณหภูมิ 30-40% และให้ความซ้ำซ้อนสำหรับการใช้งานที่สำคัญ'
+            ]
+        }
+    },
+    'the-learning-organization-how-to-accelerate-ai-adoption_final2.pdf': {
+        'summary': {
+            'en': {
+                'short': 'This strategic guide explores how organizations can transform into learning organizations to accelerate AI adoption, covering change management, skill development, and cultural transformation strategies.',
+                'detailed': 'This comprehensive strategic document provides a roadmap for organizations seeking to accelerate their artificial intelligence adoption through learning organization principles. The guide addresses fundamental challenges in AI transformation including organizational resistance, skill gaps, and cultural barriers. Key frameworks presented include: 1) The Learning Organization Maturity Model with five distinct stages of AI readiness, 2) Change management methodologies specifically tailored for AI implementation projects, 3) Comprehensive training and reskilling programs for different organizational levels, 4) Leadership development strategies for AI-driven transformation, 5) Cultural assessment tools and intervention strategies, 6) Measurement frameworks for tracking AI adoption progress and ROI, 7) Case studies from successful AI transformations across various industries, and 8) Implementation timelines and milestone planning for sustainable AI integration.'
+            },
+            'th': {
+                'short': 'คู่มือเชิงกลยุทธ์นี้สำรวจวิธีที่องค์กรสามารถเปลี่ยนแปลงเป็นองค์กรแห่งการเรียนรู้เพื่อเร่งการนำ AI มาใช้ ครอบคลุมการจัดการการเปลี่ยนแปลง การพัฒนาทักษะ และกลยุทธ์การเปลี่ยนแปลงวัฒนธรรม',
+                'detailed': 'เอกสารเชิงกลยุทธ์ที่ครอบคลุมนี้ให้แผนที่นำทางสำหรับองค์กรที่แสวงหาการเร่งการนำปัญญาประดิษฐ์มาใช้ผ่านหิลักการองค์กรแห่งการเรียนรู้ คู่มือนี้จัดการกับความท้าทายพื้นฐานในการเปลี่ยนแปลง AI รวมถึงความต้านทานขององค์กร ช่องว่างทักษะ และอุปสรรคทางวัฒนธรรม'
+            }
+        },
+        'insights': {
+            'en': [
+                'Organizations with strong learning cultures achieve 3-5x faster AI adoption rates compared to traditional hierarchical structures',
+                'Continuous learning programs reduce AI implementation resistance by 70% and increase employee engagement in transformation initiatives',
+                'Leadership commitment and visible sponsorship increase AI project success rates by 85% across all organizational levels',
+                'Cross-functional AI teams with diverse skill sets deliver 50% better outcomes than siloed technical implementations'
+            ],
+            'th': [
+                'องค์กรที่มีวัฒนธรรมการเรียนรู้ที่แข็งแกร่งบรรลุอัตราการนำ AI มาใช้เร็วกว่า 3-5 เท่าเทียบกับโครงสร้างลำดับชั้นแบบดั้งเดิม',
+                'โปรแกรมการเรียนรู้อย่างต่อเนื่องลดความต้านทานการใช้งาน AI 70% และเพิ่มการมีส่วนร่วมของพนักงานในการริเริ่มการเปลี่ยนแปลง',
+                'ความมุ่งมั่นของผู้นำและการสนับสนุนที่มองเห็นได้เพิ่มอัตราความสำเร็จของโครงการ AI 85% ในทุกระดับขององค์กร',
+                'ทีม AI ข้ามสายงานที่มีทักษะหลากหลายให้ผลลัพธ์ที่ดีกว่า 50% เทียบกับการใช้งานทางเทคนิคแบบแยกส่วน'
+            ]
+        }
+    },
+    'Development of new online sensor for surface defect contamination 1-3-25 (AIST) 1.PDF': {
+        'summary': {
+            'en': {
+                'short': 'This technical research paper presents the development of advanced online sensor technology for real-time detection and monitoring of surface defect contamination in industrial manufacturing processes.',
+                'detailed': 'This cutting-edge research document details the development and implementation of sophisticated online sensor systems specifically engineered for real-time surface defect and contamination detection in industrial manufacturing environments. The study encompasses comprehensive sensor design methodologies, advanced signal processing algorithms, and machine learning-based detection systems. Key technological innovations include: 1) High-resolution optical sensing arrays with multi-spectral analysis capabilities, 2) Real-time image processing algorithms optimized for defect pattern recognition, 3) AI-powered classification systems for contamination type identification, 4) Integration protocols for seamless incorporation into existing manufacturing lines, 5) Edge computing implementations for millisecond-level response times, and 6) Comprehensive validation testing across various industrial applications with documented performance metrics.'
+            },
+            'th': {
+                'short': 'งานวิจัยทางเทคนิคนี้นำเสนอการพัฒนาเทคโนโลยีเซ็นเซอร์ออนไลน์ขั้นสูงสำหรับการตรวจจับและติดตามการปนเปื้อนบกพร่องผิวหน้าแบบเรียลไทม์ในกระบวนการผลิตอุตสาหกรรม',
+                'detailed': 'เอกสารการวิจัยล้ำสมัยนี้รายละเอียดการพัฒนาและการใช้งานระบบเซ็นเซอร์ออนไลน์ที่ซับซ้อนที่ออกแบบมาเฉพาะสำหรับการตรวจจับบกพร่องผิวหน้าและการปนเปื้อนแบบเรียลไทม์ในสภาพแวดล้อมการผลิตอุตสาหกรรม การศึกษาครอบคลุมวิธีการออกแบบเซ็นเซอร์ที่ครอบคลุม อัลกอริทึมการประมวลผลสัญญาณขั้นสูง และระบบตรวจจับที่ใช้การเรียนรู้ของเครื่อง'
+            }
+        },
+        'insights': {
+            'en': [
+                'Online sensor systems achieve 99.2% accuracy in surface defect detection with <0.1% false positive rates in real-time operations',
+                'Multi-spectral optical sensing reduces contamination detection time from hours to milliseconds, improving production efficiency by 35%',
+                'AI-powered classification algorithms can identify 15+ contamination types simultaneously with 97% accuracy across different materials',
+                'Edge computing integration enables instant quality control decisions, reducing material waste by 25-30% in manufacturing processes'
+            ],
+            'th': [
+                'ระบบเซ็นเซอร์ออนไลน์บรรลุความแม่นยำ 99.2% ในการตรวจจับบกพร่องผิวหน้าพร้อมอัตรา false positive <0.1% ในการดำเนินงานแบบเรียลไทม์',
+                'การตรวจจับออปติคัลแบบหลายสเปกตรัมลดเวลาการตรวจจับการปนเปื้อนจากชั่วโมงเป็นมิลลิวินาที ปรับปรุงประสิทธิภาพการผลิต 35%',
+                'อัลกอริทึมการจำแนกที่ขับเคลื่อนด้วย AI สามารถระบุการปนเปื้อน 15+ ประเภทพร้อมกันด้วยความแม่นยำ 97% ในวัสดุที่แตกต่างกัน',
+                'การรวม Edge computing ช่วยให้การตัดสินใจควบคุมคุณภาพทันที ลดการสูญเสียวัสดุ 25-30% ในกระบวนการผลิต'
+            ]
+        }
+    }
+}
 
 class KnowledgeBaseServer:
     def __init__(self):
         self.cache_file = os.path.join(KB_FOLDER, 'knowledge_cache.json')
+        self.flights = SingleFlight()  # concurrent requests for one PDF share its processing
+        self._cache_lock = threading.Lock()  # guards self.cache and its file against concurrent PDFs and refreshes
         self.load_cache()
     
     def scan_kb_folder(self):
@@ -67,8 +226,16 @@ class KnowledgeBaseServer:
         except Exception as e:
             print(f"Error saving cache: {e}")
     
+    def invalidate(self):
+        """Drop every cached card, so each PDF is processed again on its next request"""
+        with self._cache_lock:
+            self.cache = {}
+            self.save_cache()
+    
     def extract_pdf_text(self, pdf_path):
         """Extract text from PDF file"""
+        import PyPDF2  # only files without cached cards need it
+        
         try:
             with open(pdf_path, 'rb') as file:
                 reader = PyPDF2.PdfReader(file)
@@ -82,139 +249,7 @@ class KnowledgeBaseServer:
     
     def get_enhanced_summaries_and_insights(self, filename):
         """Get enhanced summaries and insights for known files"""
-        enhanced_data = {
-            'Maximization of Steel Ladle Free Open Rate.pdf': {
-                'summary': {
-                    'en': {
-                        'short': 'This document presents comprehensive strategies for maximizing steel ladle free open rates through advanced process optimization, predictive maintenance, and operational excellence in steel manufacturing.',
-                        'detailed': 'This comprehensive research document explores advanced methodologies for maximizing steel ladle free open rates in modern metallurgical operations. The study addresses critical challenges in steel production including ladle turnaround time optimization, thermal efficiency management, and equipment reliability enhancement. Key areas covered include: 1) Implementation of predictive maintenance algorithms using IoT sensors and machine learning to anticipate ladle degradation patterns, 2) Advanced scheduling optimization techniques that balance production demands with ladle availability constraints, 3) Thermal management strategies to reduce heating time and energy consumption while maintaining steel quality standards, 4) Root cause analysis of ladle failure modes and development of preventive countermeasures, 5) Integration of real-time monitoring systems for continuous performance tracking, 6) Cost-benefit analysis demonstrating potential savings of $2-5 million annually through improved ladle utilization rates, and 7) Implementation roadmap with specific KPIs and milestone targets for steel manufacturing facilities seeking to optimize their ladle operations.'
-                    },
-                    'th': {
-                        'short': 'เอกสารนี้นำเสนอกลยุทธ์ที่ครอบคลุมสำหรับการเพิ่มอัตราการเปิดฟรีของเหล็กหล่อให้สูงสุด ผ่านการปรับปรุงกระบวนการขั้นสูง การบำรุงรักษาเชิงทำนาย และความเป็นเลิศในการดำเนินงานการผลิตเหล็ก',
-                        'detailed': 'เอกสารการวิจัยฉบับครอบคลุมนี้สำรวจวิธีการขั้นสูงสำหรับการเพิ่มอัตราการเปิดฟรีของเหล็กหล่อให้สูงสุดในการดำเนินงานโลหะวิทยาสมัยใหม่ การศึกษานี้จัดการกับความท้าทายที่สำคัญในการผลิตเหล็ก รวมถึงการปรับปรุงเวลาหมุนเวียนของเหล็กหล่อ การจัดการประสิทธิภาพทางความร้อน และการเสริมสร้างความน่าเชื่อถือของอุปกรณ์'
-                    }
-                },
-                'insights': {
-                    'en': [
-                        'Preventive maintenance schedules can increase ladle availability by 15-20% and reduce unplanned downtime by up to 35%',
-                        'IoT sensor integration with machine learning algorithms enables 48-72 hours advance failure prediction',
-                        'Thermal efficiency optimization can reduce energy consumption per heat by 12-18% while maintaining steel quality',
-                        'Real-time monitoring systems provide ROI of 300-500% within 18 months through improved ladle lifecycle management'
-                    ],
-                    'th': [
-                        'ตารางการบำรุงรักษาเชิงป้องกันสามารถเพิ่มความพร้อมใช้งานของเหล็กหล่อได้ 15-20% และลดเวลาหยุดทำงานที่ไม่ได้วางแผนได้สูงสุด 35%',
-                        'การรวมเซ็นเซอร์ IoT กับอัลกอริทึม machine learning ช่วยให้สามารถทำนายความล้มเหลวล่วงหน้า 48-72 ชั่วโมง',
-                        'การปรับปรุงประสิทธิภาพความร้อนสามารถลดการใช้พลังงานต่อครั้งได้ 12-18% ในขณะที่รักษาคุณภาพเหล็ก',
-                        'ระบบติดตามแบบเรียลไทม์ให้ ROI 300-500% ภายใน 18 เดือนผ่านการจัดการวงจรชีวิตเหล็กหล่อที่ดีขึ้น'
-                    ]
-                }
-            },
-            'Data mining techniques for failure prediction in CCM by AIST 25-11-20 1.pdf': {
-                'summary': {
-                    'en': {
-                        'short': 'This cutting-edge research paper presents comprehensive data mining techniques, machine learning algorithms, and predictive analytics methodologies specifically engineered for anticipating equipment failures in complex industrial environments.',
-                        'detailed': 'This pioneering research paper delivers an exhaustive examination of advanced data mining techniques and machine learning methodologies specifically engineered for predictive maintenance and failure forecasting in complex industrial ecosystems. The study focuses on Continuous Casting Machine (CCM) operations and presents sophisticated algorithmic approaches including ensemble learning, time-series analysis, and real-time anomaly detection. Key methodologies explored include: 1) Multi-layer neural networks with LSTM architectures for sequential pattern recognition, 2) Random Forest and Gradient Boosting techniques for feature importance ranking, 3) Statistical process control integration with machine learning models, 4) Edge computing implementations for real-time decision making, and 5) Comprehensive validation frameworks using historical failure data from steel manufacturing facilities.'
-                    },
-                    'th': {
-                        'short': 'งานวิจัยล้ำสมัยฉบับนี้นำเสนอเทคนิคการขุดข้อมูลที่ครอบคลุม อัลกอริทึมการเรียนรู้ของเครื่อง และวิธีการวิเคราะห์เชิงพยากรณ์ที่ออกแบบมาเฉพาะสำหรับการคาดการณ์ความล้มเหลวของอุปกรณ์ในสภาพแวดล้อมอุตสาหกรรมที่ซับซ้อน',
-                        'detailed': 'งานวิจัยบุกเบิกฉบับนี้นำเสนอการตรวจสอบอย่างละเอียดของเทคนิคการขุดข้อมูลขั้นสูงและวิธีการเรียนรู้ของเครื่องที่ออกแบบมาเฉพาะสำหรับการบำรุงรักษาเชิงทำนายและการพยากรณ์ความล้มเหลวในระบบนิเวศอุตสาหกรรมที่ซับซ้อน การศึกษาเน้นไปที่การดำเนินงานของเครื่องหล่อต่อเนื่อง (CCM) และนำเสนอแนวทางอัลกอริทึมที่ซับซ้อน'
-                    }
-                },
-                'insights': {
-                    'en': [
-                        'Ensemble machine learning algorithms achieve 85-95% failure prediction accuracy with <3% false positive rates',
-                        'Feature engineering from time-series sensor data improves prediction performance by 35-45% over raw data approaches',
-                        'Real-time Apache Kafka/Spark architectures enable millisecond-level anomaly detection for critical equipment',
-                        'LSTM neural networks show 40% better performance than traditional statistical methods for sequential failure pattern recognition'
-                    ],
-                    'th': [
-                        'อัลกอริทึม Ensemble machine learning บรรลุความแม่นยำในการทำนายความล้มเหลว 85-95% พร้อมอัตรา false positive <3%',
-                        'การสร้าง Feature จากข้อมูลเซ็นเซอร์ time-series ปรับปรุงประสิทธิภาพการทำนาย 35-45% เทียบกับวิธีข้อมูลดิบ',
-                        'สถาปัตยกรรม Apache Kafka/Spark แบบเรียลไทม์ช่วยให้สามารถตรวจจับความผิดปกติในระดับมิลลิวินาทีสำหรับอุปกรณ์สำคัญ',
-                        'โครงข่ายประสาท LSTM แสดงประสิทธิภาพที่ดีกว่า 40% เทียบกับวิธีทางสิถิติแบบดั้งเดิมในการจดจำรูปแบบความล้มเหลวแบบลำดับ'
-                    ]
-                }
-            },
-            'SecondaryTemperatureControl.pdf': {
-                'summary': {
-                    'en': {
-                        'short': 'This technical paper explores advanced secondary temperature control systems and methodologies for maintaining optimal temperature conditions in industrial manufacturing processes.',
-                        'detailed': 'This comprehensive technical document examines sophisticated secondary temperature control systems designed for precision manufacturing environments. The paper addresses critical challenges in maintaining consistent temperature profiles across complex industrial processes. Key areas covered include: 1) Advanced PID controller tuning methodologies with adaptive parameters, 2) Multi-zone temperature management strategies for large-scale equipment, 3) Sensor fusion techniques combining thermocouples, infrared, and thermal imaging data, 4) Model predictive control (MPC) implementations for anticipatory temperature adjustments, 5) Energy optimization algorithms that balance temperature precision with power consumption, 6) Integration with SCADA systems for centralized monitoring and control, and 7) Fault detection and diagnostic capabilities for early identification of temperature control system failures.'
-                    },
-                    'th': {
-                        'short': 'เอกสารทางเทคนิคนี้สำรวจระบบควบคุมอุณหภูมิรองขั้นสูงและวิธีการสำหรับการรักษาสภาวะอุณหภูมิที่เหมาะสมในกระบวนการผลิตอุตสาหกรรม',
-                        'detailed': 'เอกสารทางเทคนิคที่ครอบคลุมนี้ตรวจสอบระบบควบคุมอุณหภูมิรองที่ซับซ้อนที่ออกแบบมาสำหรับสภาพแวดล้อมการผลิตที่มีความแม่นยำ เอกสารนี้จัดการกับความท้าทายที่สำคัญในการรักษาโปรไฟล์อุณหภูมิที่สม่ำเสมอในกระบวนการอุตสาหกรรมที่ซับซ้อน'
-                    }
-                },
-                'insights': {
-                    'en': [
-                        'Advanced PID controllers with adaptive tuning reduce temperature variance by 60-75% compared to fixed-parameter systems',
-                        'Multi-zone control strategies can achieve ±0.5°C precision across large industrial furnaces and processing equipment',
-                        'Predictive temperature control algorithms reduce energy consumption by 15-25% while maintaining process quality standards',
-                        'Sensor fusion approaches improve temperature measurement accuracy by 30-40% and provide redundancy for critical applications'
-                    ],
-                    'th': [
-                        'ตัวควบคุม PID ขั้นสูงพร้อมการปรับแต่งแบบปรับตัวได้ลดความแปรปรวนของอุณหภูมิ 60-75% เทียบกับระบบพารามิเตอร์คงที่',
-                        'กลยุทธ์การควบคุมหลายโซนสามารถบรรลุความแม่นยำ ±0.5°C ในเตาอุตสาหกรรมขนาดใหญ่และอุปกรณ์ประมวลผล',
-                        'อัลกอริทึมการควบคุมอุณหภูมิเชิงทำนายลดการใช้พลังงาน 15-25% ในขณะที่รักษามาตรฐานคุณภาพของกระบวนการ',
-                        'แนวทางการรวมเซ็นเซอร์ปรับปรุงความแม่นยำในการวัดอุณหภูมิ 30-40% และให้ความซ้ำซ้อนสำหรับการใช้งานที่สำคัญ'
-                    ]
-                }
-            },
-            'the-learning-organization-how-to-accelerate-ai-adoption_final2.pdf': {
-                'summary': {
-                    'en': {
-                        'short': 'This strategic guide explores how organizations can transform into learning organizations to accelerate AI adoption, covering change management, skill development, and cultural transformation strategies.',
-                        'detailed': 'This comprehensive strategic document provides a roadmap for organizations seeking to accelerate their artificial intelligence adoption through learning organization principles. The guide addresses fundamental challenges in AI transformation including organizational resistance, skill gaps, and cultural barriers. Key frameworks presented include: 1) The Learning Organization Maturity Model with five distinct stages of AI readiness, 2) Change management methodologies specifically tailored for AI implementation projects, 3) Comprehensive training and reskilling programs for different organizational levels, 4) Leadership development strategies for AI-driven transformation, 5) Cultural assessment tools and intervention strategies, 6) Measurement frameworks for tracking AI adoption progress and ROI, 7) Case studies from successful AI transformations across various industries, and 8) Implementation timelines and milestone planning for sustainable AI integration.'
-                    },
-                    'th': {
-                        'short': 'คู่มือเชิงกลยุทธ์นี้สำรวจวิธีที่องค์กรสามารถเปลี่ยนแปลงเป็นองค์กรแห่งการเรียนรู้เพื่อเร่งการนำ AI มาใช้ ครอบคลุมการจัดการการเปลี่ยนแปลง การพัฒนาทักษะ และกลยุทธ์การเปลี่ยนแปลงวัฒนธรรม',
-                        'detailed': 'เอกสารเชิงกลยุทธ์ที่ครอบคลุมนี้ให้แผนที่นำทางสำหรับองค์กรที่แสวงหาการเร่งการนำปัญญาประดิษฐ์มาใช้ผ่านหิลักการองค์กรแห่งการเรียนรู้ คู่มือนี้จัดการกับความท้าทายพื้นฐานในการเปลี่ยนแปลง AI รวมถึงความต้านทานขององค์กร ช่องว่างทักษะ และอุปสรรคทางวัฒนธรรม'
-                    }
-                },
-                'insights': {
-                    'en': [
-                        'Organizations with strong learning cultures achieve 3-5x faster AI adoption rates compared to traditional hierarchical structures',
-                        'Continuous learning programs reduce AI implementation resistance by 70% and increase employee engagement in transformation initiatives',
-                        'Leadership commitment and visible sponsorship increase AI project success rates by 85% across all organizational levels',
-                        'Cross-functional AI teams with diverse skill sets deliver 50% better outcomes than siloed technical implementations'
-                    ],
-                    'th': [
-                        'องค์กรที่มีวัฒนธรรมการเรียนรู้ที่แข็งแกร่งบรรลุอัตราการนำ AI มาใช้เร็วกว่า 3-5 เท่าเทียบกับโครงสร้างลำดับชั้นแบบดั้งเดิม',
-                        'โปรแกรมการเรียนรู้อย่างต่อเนื่องลดความต้านทานการใช้งาน AI 70% และเพิ่มการมีส่วนร่วมของพนักงานในการริเริ่มการเปลี่ยนแปลง',
-                        'ความมุ่งมั่นของผู้นำและการสนับสนุนที่มองเห็นได้เพิ่มอัตราความสำเร็จของโครงการ AI 85% ในทุกระดับขององค์กร',
-                        'ทีม AI ข้ามสายงานที่มีทักษะหลากหลายให้ผลลัพธ์ที่ดีกว่า 50% เทียบกับการใช้งานทางเทคนิคแบบแยกส่วน'
-                    ]
-                }
-            },
-            'Development of new online sensor for surface defect contamination 1-3-25 (AIST) 1.PDF': {
-                'summary': {
-                    'en': {
-                        'short': 'This technical research paper presents the development of advanced online sensor technology for real-time detection and monitoring of surface defect contamination in industrial manufacturing processes.',
-                        'detailed': 'This cutting-edge research document details the development and implementation of sophisticated online sensor systems specifically engineered for real-time surface defect and contamination detection in industrial manufacturing environments. The study encompasses comprehensive sensor design methodologies, advanced signal processing algorithms, and machine learning-based detection systems. Key technological innovations include: 1) High-resolution optical sensing arrays with multi-spectral analysis capabilities, 2) Real-time image processing algorithms optimized for defect pattern recognition, 3) AI-powered classification systems for contamination type identification, 4) Integration protocols for seamless incorporation into existing manufacturing lines, 5) Edge computing implementations for millisecond-level response times, and 6) Comprehensive validation testing across various industrial applications with documented performance metrics.'
-                    },
-                    'th': {
-                        'short': 'งานวิจัยทางเทคนิคนี้นำเสนอการพัฒนาเทคโนโลยีเซ็นเซอร์ออนไลน์ขั้นสูงสำหรับการตรวจจับและติดตามการปนเปื้อนบกพร่องผิวหน้าแบบเรียลไทม์ในกระบวนการผลิตอุตสาหกรรม',
-                        'detailed': 'เอกสารการวิจัยล้ำสมัยนี้รายละเอียดการพัฒนาและการใช้งานระบบเซ็นเซอร์ออนไลน์ที่ซับซ้อนที่ออกแบบมาเฉพาะสำหรับการตรวจจับบกพร่องผิวหน้าและการปนเปื้อนแบบเรียลไทม์ในสภาพแวดล้อมการผลิตอุตสาหกรรม การศึกษาครอบคลุมวิธีการออกแบบเซ็นเซอร์ที่ครอบคลุม อัลกอริทึมการประมวลผลสัญญาณขั้นสูง และระบบตรวจจับที่ใช้การเรียนรู้ของเครื่อง'
-                    }
-                },
-                'insights': {
-                    'en': [
-                        'Online sensor systems achieve 99.2% accuracy in surface defect detection with <0.1% false positive rates in real-time operations',
-                        'Multi-spectral optical sensing reduces contamination detection time from hours to milliseconds, improving production efficiency by 35%',
-                        'AI-powered classification algorithms can identify 15+ contamination types simultaneously with 97% accuracy across different materials',
-                        'Edge computing integration enables instant quality control decisions, reducing material waste by 25-30% in manufacturing processes'
-                    ],
-                    'th': [
-                        'ระบบเซ็นเซอร์ออนไลน์บรรลุความแม่นยำ 99.2% ในการตรวจจับบกพร่องผิวหน้าพร้อมอัตรา false positive <0.1% ในการดำเนินงานแบบเรียลไทม์',
-                        'การตรวจจับออปติคัลแบบหลายสเปกตรัมลดเวลาการตรวจจับการปนเปื้อนจากชั่วโมงเป็นมิลลิวินาที ปรับปรุงประสิทธิภาพการผลิต 35%',
-                        'อัลกอริทึมการจำแนกที่ขับเคลื่อนด้วย AI สามารถระบุการปนเปื้อน 15+ ประเภทพร้อมกันด้วยความแม่นยำ 97% ในวัสดุที่แตกต่างกัน',
-                        'การรวม Edge computing ช่วยให้การตัดสินใจควบคุมคุณภาพทันที ลดการสูญเสียวัสดุ 25-30% ในกระบวนการผลิต'
-                    ]
-                }
-            }
-        }
-        return enhanced_data.get(filename, {
+        return KNOWN_DOCUMENTS.get(filename) or {
             'summary': {
                 'en': {
                     'short': f'Analysis of {filename} - Processing document content...',
@@ -229,19 +264,13 @@ class KnowledgeBaseServer:
                 'en': ['Document analysis in progress - insights will be available shortly'],
                 'th': ['กำลังวิเคราะห์เอกสาร - ข้อมูลเชิงลึกจะพร้อมใช้งานในเร็วๆ นี้']
             }
-        })
+        }
 
     def generate_summary_and_insights(self, text, filename):
         """Generate summary and insights from text content using Groq AI"""
-        # First check if we have enhanced data for known files
-        enhanced_data = self.get_enhanced_summaries_and_insights(filename)
-        
-        # If this file has enhanced data, use it
-        if filename in ['Maximization of Steel Ladle Free Open Rate.pdf', 
-                       'Data mining techniques for failure prediction in CCM by AIST 25-11-20 1.pdf',
-                       'SecondaryTemperatureControl.pdf',
-                       'the-learning-organization-how-to-accelerate-ai-adoption_final2.pdf',
-                       'Development of new online sensor for surface defect contamination 1-3-25 (AIST) 1.PDF']:
+        # Known files use their hand-written summaries and insights
+        if filename in KNOWN_DOCUMENTS:
+            enhanced_data = KNOWN_DOCUMENTS[filename]
             return {
                 'summary': enhanced_data['summary'],
                 'insights': enhanced_data['insights']
@@ -348,6 +377,18 @@ class KnowledgeBaseServer:
             }
         }
     
+    def folder_signature(self):
+        """Names and modification times of the PDF and audio files the cards are built from"""
+        try:
+            extensions = tuple(['.pdf'] + AUDIO_EXTENSIONS)
+            return tuple(sorted(
+                (entry.name, entry.stat().st_mtime_ns)
+                for entry in os.scandir(KB_FOLDER)
+                if entry.is_file() and entry.name.lower().endswith(extensions)
+            ))
+        except OSError:
+            return ()
+    
     def find_audio_file(self, pdf_filename):
         """Find corresponding audio file for PDF"""
         base_name = os.path.splitext(pdf_filename)[0]
@@ -360,13 +401,17 @@ class KnowledgeBaseServer:
         return None
     
     def process_pdf_file(self, pdf_path, filename):
-        """Process a single PDF file"""
+        """Process a single PDF file; concurrent calls for the same file share one run"""
+        return self.flights.do(('pdf', filename), self._process_pdf_file, pdf_path, filename)
+    
+    def _process_pdf_file(self, pdf_path, filename):
         try:
             # Check if already cached and file hasn't changed
             file_mtime = os.path.getmtime(pdf_path)
-            if filename in self.cache and self.cache[filename].get('mtime') == file_mtime:
+            cached = self.cache.get(filename)  # one lookup: a refresh may swap the cache meanwhile
+            if cached and cached.get('mtime') == file_mtime:
                 print(f"Using cached data for {filename}")
-                return self.cache[filename]
+                return cached
             
             print(f"Processing {filename}...")
             
@@ -391,8 +436,9 @@ class KnowledgeBaseServer:
             }
             
             # Cache the result
-            self.cache[filename] = card_data
-            self.save_cache()
+            with self._cache_lock:
+                self.cache[filename] = card_data
+                self.save_cache()
             
             print(f"Processed {filename} successfully")
             return card_data
@@ -448,25 +494,124 @@ class KnowledgeBaseServer:
 # Initialize the knowledge base server
 kb_server = KnowledgeBaseServer()
 
+# Serialized card list, rebuilt only when files in the KB folder change
+catalog_cache = CatalogCache()
+
+# KB folder files with range requests and content-versioned caching
+file_server = FileServer(offload=FILE_OFFLOAD, accel_prefix=FILE_ACCEL_PREFIX)
+
+# gzip/brotli for API responses; front-end files are compressed once at startup
+response_compressor = ResponseCompressor()
+response_compressor.init_app(app)
+static_assets = StaticAssets(KB_FOLDER, response_compressor)
+static_assets.preload(STATIC_ASSETS)
+
+# Document changes pushed to browsers over /api/events
+event_feed = EventFeed(max_clients=EVENT_STREAMS_MAX)
+
+# 429 for clients refreshing too often; one refresh runs at a time, others get 503 at once
+rate_limiter = RateLimiter(RATE_LIMITS, {'refresh_cards': 'refresh'})
+rate_limiter.init_app(app)
+refresh_gate = ConcurrencyGate(1)
+
+def document_versions():
+    """PDF file name -> modification times of the PDF and of its podcast"""
+    signature = dict(kb_server.folder_signature())
+    return {
+        name: (mtime, signature.get(kb_server.find_audio_file(name)))
+        for name, mtime in signature.items()
+        if name.lower().endswith('.pdf')
+    }
+
+def watch_kb_folder():
+    """Publish an event for every document added to, changed in or removed from the KB folder"""
+    known = document_versions()
+    while True:
+        time.sleep(FOLDER_WATCH_INTERVAL)
+        try:
+            current = document_versions()
+            for name in sorted(current.keys() - known.keys()):
+                event_feed.publish('document.added', {'filename': name})
+            for name in sorted(name for name in current.keys() & known.keys() if current[name] != known[name]):
+                event_feed.publish('document.updated', {'filename': name})
+            for name in sorted(known.keys() - current.keys()):
+                event_feed.publish('document.deleted', {'filename': name})
+            known = current
+        except Exception as e:
+            print(f"Error watching KB folder: {e}")
+
+if FOLDER_WATCH_INTERVAL > 0:
+    threading.Thread(target=watch_kb_folder, name='kb-folder-watch', daemon=True).start()
+
+def project_card(card, fields=None, lang=None):
+    """Card cut down to the requested keys, with summary and insights in one language if lang is set"""
+    projected = {key: value for key, value in card.items()
+                 if key in CARD_FIELDS and (fields is None or key in fields or key == 'filename')}
+    if lang:
+        for key in ('summary', 'insights'):
+            if key in projected:
+                projected[key] = {lang: projected[key].get(lang)}
+    return projected
+
+def build_knowledge_cards_body(fields=None, lang=None):
+    cards = kb_server.get_all_knowledge_cards()
+    if fields is not None or lang is not None:
+        cards = [project_card(card, fields, lang) for card in cards]
+    return json.dumps({
+        'success': True,
+        'cards': cards,
+        'total': len(cards)
+    }, ensure_ascii=False)
+
 @app.route('/')
 def index():
     """Serve the main HTML file"""
-    return send_from_directory(KB_FOLDER, 'index.html')
+    return static_assets.send('index.html')
 
 @app.route('/<path:filename>')
 def serve_file(filename):
-    """Serve static files"""
-    return send_from_directory(KB_FOLDER, filename)
+    """Serve static files; front-end files precompressed, PDFs and audio with immutable content-versioned URLs"""
+    if filename.lower().endswith(('.html', '.js', '.css')):
+        return static_assets.send(filename)
+    return file_server.send(KB_FOLDER, filename,
+                            redirect_unversioned=filename.lower().endswith(VERSIONED_EXTENSIONS))
 
 @app.route('/api/knowledge-cards')
 def get_knowledge_cards():
-    """API endpoint to get all knowledge cards"""
+    """API endpoint to get all knowledge cards, limited to ?fields= and ?lang= if given"""
+    fields = request.args.get('fields')
+    fields = tuple(sorted({name.strip() for name in fields.split(',') if name.strip()})) if fields else None
+    lang = request.args.get('lang')
+    unknown = [name for name in fields or () if name not in CARD_FIELDS]
+    if unknown or lang not in (None,) + CARD_LANGUAGES:
+        return jsonify({
+            'success': False,
+            'error': f"Unknown field: {unknown[0]}" if unknown else f"Unsupported language: {lang}"
+        }), 400
+    
     try:
-        cards = kb_server.get_all_knowledge_cards()
+        key = f"knowledge-cards:{','.join(fields or ())}:{lang or ''}"
+        return catalog_cache.respond(key, kb_server.folder_signature(),
+                                     lambda: build_knowledge_cards_body(fields, lang))
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/knowledge-cards/<path:filename>')
+def get_knowledge_card(filename):
+    """API endpoint to get the card of one PDF, e.g. after a document event"""
+    try:
+        if filename not in kb_server.scan_kb_folder():
+            return jsonify({
+                'success': False,
+                'error': 'Document not found'
+            }), 404
+        card = kb_server.process_pdf_file(os.path.join(KB_FOLDER, filename), filename)
         return jsonify({
             'success': True,
-            'cards': cards,
-            'total': len(cards)
+            'card': card
         })
     except Exception as e:
         return jsonify({
@@ -474,12 +619,23 @@ def get_knowledge_cards():
             'error': str(e)
         }), 500
 
+@app.route('/api/events')
+def events():
+    """Server-Sent Events stream of document changes; resumes from Last-Event-ID"""
+    return event_feed.response()
+
 @app.route('/api/refresh')
 def refresh_cards():
     """API endpoint to refresh knowledge cards"""
+    if not refresh_gate.acquire():
+        return jsonify({
+            'success': False,
+            'error': 'A refresh is already running, try again shortly'
+        }), 503, {'Retry-After': str(REFRESH_RETRY_AFTER)}
     try:
         # Clear cache to force refresh
-        kb_server.cache = {}
+        kb_server.invalidate()
+        catalog_cache.clear()
         cards = kb_server.get_all_knowledge_cards()
         return jsonify({
             'success': True,
@@ -492,6 +648,8 @@ def refresh_cards():
             'success': False,
             'error': str(e)
         }), 500
+    finally:
+        refresh_gate.release()
 
 if __name__ == '__main__':
     print(f"Starting Knowledge Base server...")
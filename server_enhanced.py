@@ -4,26 +4,37 @@ Enhanced Flask server for Knowledge Base system with database integration
 Features: File upload, database operations, tagging, search functionality
 """
 
-from flask import Flask, request, jsonify, send_from_directory, redirect, url_for
+from flask import Flask, Response, request, jsonify, send_from_directory, redirect, url_for
 from flask_cors import CORS
 import os
 import sqlite3
 import json
 import hashlib
 from datetime import datetime
+from functools import partial
 from pathlib import Path
 import logging
 from werkzeug.utils import secure_filename
-import PyPDF2
-import mimetypes
-
-# Import existing AI processing functionality
-try:
-    from groq import Groq
-    GROQ_AVAILABLE = True
-except ImportError:
-    GROQ_AVAILABLE = False
-    print("Groq not available. AI processing will be disabled.")
+from answer_cache import AnswerCache, source_fingerprint
+from catalog_cache import CatalogCache
+from compression import ResponseCompressor, StaticAssets
+from event_feed import EventFeed
+from file_server import FileServer
+from database.connection import ConnectionManager
+from database import repository
+from database.profiler import QueryProfiler
+from database.archive import ChatArchive
+from database.writer import GroupCommitWriter, WriteTimeout, WriterBusy
+from quiz_batch import QuizBatchJob, save_quiz
+from quiz_stats import QuizAnalytics, save_attempt, quiz_stats
+from chat_memory import ConversationMemory
+from json_stream import StreamingJSONParser, optional, parse_llm_json
+from thai_content import ThaiContentGenerator, needs_thai_content
+from llm_client import LazyGroqClient
+from admission import RateLimiter, parse_limits
+from llm_jobs import LLMJobs, JobsBusy
+from single_flight import LockTable, SingleFlight
+from metrics import Metrics
 
 app = Flask(__name__)
 CORS(app, resources={
@@ -42,6 +53,80 @@ DATABASE_PATH = 'database/knowledge_base.db'
 ALLOWED_DOC_EXTENSIONS = {'pdf', 'txt', 'csv', 'docx'}
 ALLOWED_PODCAST_EXTENSIONS = {'mp3', 'wav', 'm4a', 'ogg'}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+ANSWER_CACHE_SIZE = 512
+ANSWER_CACHE_THRESHOLD = 0.8  # Jaccard similarity of question shingles
+QUIZ_BATCH_MAX_PARALLELISM = 8
+CHAT_MEMORY_RECENT_TURNS = 3  # question/answer pairs kept verbatim in the prompt
+# English-only ingestion; Thai content is generated the first time a Thai view asks for it
+LAZY_THAI_CONTENT = os.getenv('LAZY_THAI_CONTENT', 'false').lower() in ('1', 'true', 'yes')
+# SQL profiling: per-statement timings at /api/db/profile, slow statements logged; off by default
+# because it aggregates every statement under a lock, turn it on while investigating
+SQL_PROFILE = os.getenv('SQL_PROFILE', 'false').lower() in ('1', 'true', 'yes')
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '100'))
+# Prometheus metrics at /metrics: request latency, SQLite time per request, LLM calls, queues and caches
+METRICS = os.getenv('METRICS', 'true').lower() in ('1', 'true', 'yes')
+CHAT_PAGE_SIZE = 50
+CHAT_PAGE_MAX = 200
+# Idle chat sessions move to a separate archive database
+CHAT_ARCHIVE_PATH = os.getenv('CHAT_ARCHIVE_PATH', 'database/chat_archive.db')
+CHAT_ARCHIVE_IDLE_DAYS = int(os.getenv('CHAT_ARCHIVE_IDLE_DAYS', '30'))
+CHAT_ARCHIVE_INTERVAL = int(os.getenv('CHAT_ARCHIVE_INTERVAL', '3600'))  # seconds; 0 disables the background job
+# Chat and quiz submissions are committed in groups by a single writer thread
+WRITE_QUEUE_SIZE = int(os.getenv('WRITE_QUEUE_SIZE', '1024'))
+WRITE_BATCH_MAX = int(os.getenv('WRITE_BATCH_MAX', '128'))
+WRITE_ACK_TIMEOUT = 30  # seconds a request waits for its write to become durable
+WRITE_RETRY_AFTER = 5   # Retry-After seconds when the writer turns a write away or times out
+# Let the front web server stream files: '' (Flask sends them), 'sendfile' or 'accel' (nginx)
+FILE_OFFLOAD = os.getenv('FILE_OFFLOAD', '')
+FILE_ACCEL_PREFIX = os.getenv('FILE_ACCEL_PREFIX', '/protected-files')
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))  # bytes
+# Chat answers and quiz generation run on their own pool, off the request threads
+LLM_WORKERS = int(os.getenv('LLM_WORKERS', '8'))              # concurrent Groq calls
+LLM_MAX_PENDING = int(os.getenv('LLM_MAX_PENDING', '1000'))   # queued async jobs before 503
+LLM_SYNC_SLOTS = int(os.getenv('LLM_SYNC_SLOTS', '4'))        # request threads that may wait on the model
+LLM_SYNC_QUEUE = int(os.getenv('LLM_SYNC_QUEUE', '8'))        # more requests waiting for a slot before 503
+LLM_SYNC_WAIT = float(os.getenv('LLM_SYNC_WAIT', '10'))       # seconds one of them waits before 503
+LLM_JOB_TIMEOUT = float(os.getenv('LLM_JOB_TIMEOUT', '60'))   # seconds a request waits for its answer before 503
+LLM_RETRY_AFTER = 5  # seconds suggested to clients turned away by a full LLM queue
+# Open /api/events streams per process; each holds a request thread, serve.py defaults it to --threads / 4
+EVENT_STREAMS_MAX = int(os.getenv('EVENT_STREAMS_MAX', '8'))
+# Identical AI work in flight (a quiz or the Thai content of one document) runs once, across workers too
+FLIGHT_WAIT = float(os.getenv('FLIGHT_WAIT', '120'))              # seconds to wait for another worker's run
+FLIGHT_LOCK_LEASE = float(os.getenv('FLIGHT_LOCK_LEASE', '300'))  # seconds before a dead worker's lock is taken over
+# Per-client token buckets for expensive routes: group=count/seconds[:burst]; empty disables
+RATE_LIMITS = parse_limits(os.getenv('RATE_LIMITS', 'chat=30/60:10,quiz=10/60:3,translate=30/60:10,upload=30/60:10'))
+RATE_LIMITED_ENDPOINTS = {
+    'ask_thothkb': 'chat',
+    'get_document_content': 'translate',
+    'generate_quiz': 'quiz',
+    'generate_quiz_stream': 'quiz',
+    'start_quiz_batch': 'quiz',
+    'resume_quiz_batch': 'quiz',
+    'upload_document': 'upload',
+    'upload_podcast': 'upload'
+}
+
+# Expected shapes of structured LLM replies
+SUMMARY_SCHEMA = {
+    'title': optional(str),
+    'summary_en_short': optional(str),
+    'summary_en_detailed': optional(str),
+    'summary_th_short': optional(str),
+    'summary_th_detailed': optional(str),
+    'insights_en': optional([str]),
+    'insights_th': optional([str])
+}
+THAI_CONTENT_SCHEMA = {
+    'summary_th_short': str,
+    'summary_th_detailed': str,
+    'insights_th': [str]
+}
+QUIZ_QUESTION_SCHEMA = {
+    'question': str,
+    'options': {'A': str, 'B': str, 'C': str, 'D': str},
+    'correct_answer': ('A', 'B', 'C', 'D'),
+    'explanation': optional(str)
+}
 
 # Ensure directories exist
 for folder in [UPLOAD_FOLDER, f"{UPLOAD_FOLDER}/docs", f"{UPLOAD_FOLDER}/podcasts", 
@@ -51,27 +136,140 @@ for folder in [UPLOAD_FOLDER, f"{UPLOAD_FOLDER}/docs", f"{UPLOAD_FOLDER}/podcast
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 
-# Initialize Groq client if available
-groq_client = None
-if GROQ_AVAILABLE:
-    groq_api_key = os.getenv('GROQ_API_KEY')
-    if groq_api_key:
-        try:
-            groq_client = Groq(api_key=groq_api_key)
-            print("Groq AI client initialized successfully")
-        except Exception as e:
-            print(f"Failed to initialize Groq client: {e}")
-            groq_client = None
+# Groq client, imported and constructed on the first AI call to keep startup fast
+groq_client = LazyGroqClient(os.getenv('GROQ_API_KEY'))
+if not groq_client.installed:
+    print("Groq not available. AI processing will be disabled.")
+
+# Chat answers reused across sessions for near-duplicate questions
+answer_cache = AnswerCache(max_entries=ANSWER_CACHE_SIZE, threshold=ANSWER_CACHE_THRESHOLD)
+
+# List endpoint bodies, rebuilt only when the catalog version changes
+catalog_cache = CatalogCache()
+
+# Documents and podcasts with range requests and content-versioned caching
+file_server = FileServer(offload=FILE_OFFLOAD, accel_prefix=FILE_ACCEL_PREFIX)
+
+# Request, SQLite and LLM instrumentation; hooked in first so it times the other hooks too
+metrics = Metrics()
+if METRICS:
+    metrics.init_app(app)
+
+# 429 for clients over their budget on expensive routes, before any work is done
+rate_limiter = RateLimiter(RATE_LIMITS, RATE_LIMITED_ENDPOINTS)
+rate_limiter.init_app(app)
+
+# gzip/brotli for API responses; the page itself is compressed once at startup
+response_compressor = ResponseCompressor(min_size=COMPRESSION_MIN_SIZE)
+response_compressor.init_app(app)
+static_assets = StaticAssets('.', response_compressor)
+static_assets.preload(['index-enhanced.html'])
+
+# Document changes pushed to browsers over /api/events
+event_feed = EventFeed(max_clients=EVENT_STREAMS_MAX)
+
+# Pooled connections, returned to the pool when each request's app context ends; the
+# repository schema is brought up to date once, before the first connection
+query_profiler = QueryProfiler(slow_ms=SLOW_QUERY_MS, aggregate=SQL_PROFILE,
+                               on_time=metrics.add_sql_time if METRICS else None)
+timed_connection = query_profiler.connection_factory if SQL_PROFILE or METRICS else sqlite3.Connection
+db_pool = ConnectionManager(DATABASE_PATH, initializer=lambda: repository.ensure_database(DATABASE_PATH),
+                            factory=timed_connection)
+db_pool.init_app(app)
 
 def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect(DATABASE_PATH, timeout=30.0)
-    conn.row_factory = sqlite3.Row
-    conn.execute('PRAGMA journal_mode = WAL')
-    conn.execute('PRAGMA synchronous = NORMAL')
-    conn.execute('PRAGMA temp_store = memory')
-    conn.execute('PRAGMA mmap_size = 268435456')  # 256MB
-    return conn
+    """Get the calling thread's pooled database connection"""
+    return db_pool.connection()
+
+# Per-quiz and per-question aggregates, updated with each submission
+quiz_analytics = QuizAnalytics()
+
+# Append-only chat and quiz writes, acknowledged once their group is committed
+db_writer = GroupCommitWriter(DATABASE_PATH, max_queue=WRITE_QUEUE_SIZE, max_batch=WRITE_BATCH_MAX,
+                              factory=timed_connection)
+db_writer.start()
+
+chat_archive = ChatArchive(DATABASE_PATH, CHAT_ARCHIVE_PATH, idle_days=CHAT_ARCHIVE_IDLE_DAYS)
+chat_archive.start(CHAT_ARCHIVE_INTERVAL)
+
+# LLM-bound request bodies, run off the request threads; see respond_llm()
+llm_jobs = LLMJobs(max_workers=LLM_WORKERS, max_pending=LLM_MAX_PENDING, sync_slots=LLM_SYNC_SLOTS,
+                   sync_queue=LLM_SYNC_QUEUE, sync_wait=LLM_SYNC_WAIT, context=app.app_context,
+                   timeout=LLM_JOB_TIMEOUT)
+
+# Concurrent requests for the same quiz or Thai content share one generation; the lock
+# table in the database makes workers of other processes wait for it too
+llm_flights = SingleFlight(LockTable(DATABASE_PATH, lease=FLIGHT_LOCK_LEASE), wait=FLIGHT_WAIT)
+
+def llm_busy(message='Too many AI requests in progress, try again shortly'):
+    """503 for requests turned away by the LLM queue or its sync slots, or not answered in time"""
+    return jsonify({'error': message}), 503, {'Retry-After': str(LLM_RETRY_AFTER)}
+
+def writer_unavailable(e):
+    """503 for a write the writer turned away or did not commit in time; a timed-out write may still land"""
+    return {'error': str(e)}, 503, {'Retry-After': str(WRITE_RETRY_AFTER)}
+
+def shutdown():
+    """Finish queued AI jobs and commit queued writes; called by serve.py on graceful shutdown"""
+    chat_memory.shutdown(wait=True)
+    llm_jobs.shutdown(wait=True)
+    db_writer.stop()
+
+def llm_completion(site, **kwargs):
+    """Groq chat completion, timed and token-counted under an LLM call site in /metrics"""
+    return metrics.llm_call(site, groq_client.chat.completions.create, **kwargs)
+
+def summarize_conversation(previous_summary, transcript):
+    """Fold older chat turns into the running conversation summary using Groq"""
+    prompt = f"""
+    Update the running summary of a conversation between a user and ThothKB, a knowledge base assistant.
+    Keep the facts, documents and open questions a follow-up question might refer to.
+    Write at most 150 words in the language of the conversation. Reply with the summary only.
+    
+    Current summary:
+    {previous_summary or '(none)'}
+    
+    New messages:
+    {transcript}
+    """
+    
+    completion = llm_completion(
+        'chat_memory',
+        model="llama-3.1-8b-instant",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.2,
+        max_tokens=400
+    )
+    return completion.choices[0].message.content.strip()
+
+# Per-session conversation history for follow-up questions; folds ask the model through the
+# LLM pool and store their summaries through the group-commit writer
+chat_memory = ConversationMemory(get_db_connection, partial(llm_jobs.call, summarize_conversation),
+                                 write_fn=db_writer.write, recent_turns=CHAT_MEMORY_RECENT_TURNS)
+
+def requested_fields():
+    """Document fields selected by ?fields= and ?lang=, or None for whole documents"""
+    fields = request.args.get('fields')
+    names = [name.strip() for name in fields.split(',') if name.strip()] if fields else None
+    return repository.document_fields(names, request.args.get('lang'))
+
+def respond_llm(fn, *args):
+    """Response for an LLM-bound handler body fn(*args) -> (body, status[, headers])
+
+    With `Prefer: respond-async` the job is queued and 202 Accepted returned at once with its
+    status URL; otherwise the request thread waits for the result, within the sync slots.
+    """
+    try:
+        if 'respond-async' in request.headers.get('Prefer', ''):
+            job_id = llm_jobs.submit(fn, *args)
+            status_url = url_for('get_llm_job', job_id=job_id)
+            return jsonify({'job_id': job_id, 'status': 'pending', 'status_url': status_url}), 202, {
+                'Location': status_url, 'Retry-After': '1', 'Preference-Applied': 'respond-async'
+            }
+        body, status, *headers = llm_jobs.run(fn, *args)
+        return jsonify(body), status, *headers
+    except JobsBusy as e:
+        return llm_busy(str(e))
 
 def allowed_file(filename, allowed_extensions):
     """Check if file extension is allowed"""
@@ -80,6 +278,8 @@ def allowed_file(filename, allowed_extensions):
 
 def process_pdf_content(file_path):
     """Extract text from PDF for AI processing"""
+    import PyPDF2  # only uploads need it; keeps it out of startup
+    
     try:
         with open(file_path, 'rb') as file:
             pdf_reader = PyPDF2.PdfReader(file)
@@ -91,12 +291,18 @@ def process_pdf_content(file_path):
         logging.error(f"Error reading PDF {file_path}: {e}")
         return ""
 
-def generate_ai_summary_and_insights(text, filename):
+def generate_ai_summary_and_insights(text, filename, include_thai=True):
     """Generate AI summary and insights using Groq"""
     if not groq_client or not text.strip():
-        return None, None, None, None
+        return None, None, None, None, None, None, None
 
     try:
+        thai_fields = """
+            "summary_th_short": "Brief 1-2 sentence summary in Thai",
+            "summary_th_detailed": "Detailed 3-4 sentence summary in Thai with technical details",""" if include_thai else ""
+        thai_insights = """,
+            "insights_th": ["Insight 1 in Thai", "Insight 2 in Thai", "Insight 3 in Thai"]""" if include_thai else ""
+        
         prompt = f"""
         Analyze this technical document: {filename}
         
@@ -106,31 +312,27 @@ def generate_ai_summary_and_insights(text, filename):
         {{
             "title": "Clean document title",
             "summary_en_short": "Brief 1-2 sentence summary in English",
-            "summary_en_detailed": "Detailed 3-4 sentence summary in English with technical details",
-            "summary_th_short": "Brief 1-2 sentence summary in Thai",
-            "summary_th_detailed": "Detailed 3-4 sentence summary in Thai with technical details",
-            "insights_en": ["Insight 1 in English", "Insight 2 in English", "Insight 3 in English"],
-            "insights_th": ["Insight 1 in Thai", "Insight 2 in Thai", "Insight 3 in Thai"]
+            "summary_en_detailed": "Detailed 3-4 sentence summary in English with technical details",{thai_fields}
+            "insights_en": ["Insight 1 in English", "Insight 2 in English", "Insight 3 in English"]{thai_insights}
         }}
         """
 
-        completion = groq_client.chat.completions.create(
+        completion = llm_completion(
+            'summary',
             model="llama-3.1-8b-instant",
             messages=[{"role": "user", "content": prompt}],
             temperature=0.3,
-            max_tokens=2000
+            max_tokens=2000 if include_thai else 1000
         )
         
         response_text = completion.choices[0].message.content
-        # Try to extract JSON from response
-        if '```json' in response_text:
-            response_text = response_text.split('```json')[1].split('```')[0]
-        elif '{' in response_text:
-            start = response_text.find('{')
-            end = response_text.rfind('}') + 1
-            response_text = response_text[start:end]
-        
-        result = json.loads(response_text)
+        # Keep every valid field of a truncated or partly malformed reply
+        result, errors, repaired = parse_llm_json(response_text, SUMMARY_SCHEMA)
+        if result is None:
+            raise ValueError(f"No JSON object in AI response for {filename}")
+        if errors or repaired:
+            logging.warning(f"Salvaged AI summary for {filename} (repaired={repaired}): {errors}")
+        
         return (result.get('title'), result.get('summary_en_short'), result.get('summary_en_detailed'),
                 result.get('summary_th_short'), result.get('summary_th_detailed'),
                 result.get('insights_en'), result.get('insights_th'))
@@ -139,10 +341,123 @@ def generate_ai_summary_and_insights(text, filename):
         logging.error(f"Error generating AI summary: {e}")
         return None, None, None, None, None, None, None
 
+def translate_to_thai(document):
+    """Generate Thai summaries and insights from a document's English content using Groq"""
+    insights_en = json.loads(document['insights_en']) if document['insights_en'] else []
+    prompt = f"""
+    Translate this technical document summary into natural Thai, keeping technical terms accurate.
+    
+    Title: {document['title']}
+    Short summary: {document['summary_en'] or ''}
+    Detailed summary: {document['detailed_summary_en'] or ''}
+    Insights: {json.dumps(insights_en, ensure_ascii=False)}
+    
+    Provide a response in this exact JSON format:
+    {{
+        "summary_th_short": "Short summary in Thai",
+        "summary_th_detailed": "Detailed summary in Thai",
+        "insights_th": ["Insight 1 in Thai", "Insight 2 in Thai"]
+    }}
+    """
+    
+    completion = llm_completion(
+        'translation',
+        model="llama-3.1-8b-instant",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.3,
+        max_tokens=1200
+    )
+    
+    result, errors, repaired = parse_llm_json(completion.choices[0].message.content, THAI_CONTENT_SCHEMA)
+    if not result or not (result.get('summary_th_short') or result.get('summary_th_detailed')):
+        raise ValueError(f"No Thai content in AI response: {errors}")
+    return result.get('summary_th_short'), result.get('summary_th_detailed'), result.get('insights_th')
+
+# Thai content for documents ingested in English-only mode
+thai_content = ThaiContentGenerator(get_db_connection, translate_to_thai, flights=llm_flights)
+
+def cache_lookups():
+    """(hits, lookups) of each in-process cache, for /metrics"""
+    answer = answer_cache.stats()
+    catalog = catalog_cache.stats()
+    routes = response_compressor.stats()['routes'].values()
+    pool = db_pool.stats()
+    return {
+        'answer': (answer['hits'], answer['hits'] + answer['misses']),
+        'catalog': (catalog['hits'] + catalog['shared_builds'],
+                    catalog['hits'] + catalog['shared_builds'] + catalog['builds']),
+        'compression': (sum(route['from_cache'] for route in routes), sum(route['responses'] for route in routes)),
+        'connection_pool': (pool['reused'], pool['checkouts'])
+    }
+
+# Queue depths and cache effectiveness, read from the components' own stats when scraped
+metrics.collect('kb_write_queue_depth', 'Chat and quiz writes waiting for the group-commit writer',
+                lambda: db_writer.stats()['queue_depth'])
+metrics.collect('kb_llm_jobs_pending', 'AI requests queued or running on the LLM pool',
+                lambda: llm_jobs.stats()['pending'])
+metrics.collect('kb_quiz_batch_active_jobs', 'Quiz batch jobs running in this process',
+                lambda: len(QuizBatchJob.active_jobs))
+metrics.collect('kb_db_connections_in_use', 'Pooled SQLite connections checked out',
+                lambda: db_pool.stats()['in_use'])
+metrics.collect('kb_event_stream_clients', 'Open /api/events streams',
+                lambda: event_feed.stats()['clients'])
+metrics.collect('kb_llm_sync_waiting', 'Requests waiting for an LLM sync slot',
+                lambda: llm_jobs.stats()['sync_gate']['waiting'])
+metrics.collect('kb_rate_limited_total', 'Requests answered 429 by the per-client rate limits', kind='counter',
+                label='group', read=lambda: {group: counts['limited']
+                                             for group, counts in rate_limiter.stats()['groups'].items()})
+metrics.collect('kb_single_flight_shared_total', 'Calls that waited for an identical AI generation in flight',
+                lambda: llm_flights.stats()['shared'], kind='counter')
+metrics.collect('kb_cache_hits_total', 'Lookups answered from the cache', kind='counter', label='cache',
+                read=lambda: {cache: hits for cache, (hits, _) in cache_lookups().items()})
+metrics.collect('kb_cache_lookups_total', 'Cache lookups', kind='counter', label='cache',
+                read=lambda: {cache: lookups for cache, (_, lookups) in cache_lookups().items()})
+metrics.collect('kb_cache_hit_ratio', 'Share of lookups answered from the cache since start', label='cache',
+                read=lambda: {cache: hits / lookups if lookups else None
+                              for cache, (hits, lookups) in cache_lookups().items()})
+
 @app.route('/')
 def index():
     """Serve the main application page"""
-    return send_from_directory('.', 'index-enhanced.html')
+    return static_assets.send('index-enhanced.html')
+
+@app.route('/api/db/stats')
+def get_db_stats():
+    """Get connection pool statistics, plus hot query plans with ?plans=1"""
+    stats = {'pool': db_pool.stats(), 'catalog_cache': catalog_cache.stats(), 'writer': db_writer.stats(),
+             'compression': dict(response_compressor.stats(), static=static_assets.stats()),
+             'events': event_feed.stats(), 'llm_jobs': llm_jobs.stats(), 'rate_limit': rate_limiter.stats(),
+             'single_flight': llm_flights.stats()}
+    if request.args.get('plans'):
+        conn = get_db_connection()
+        stats['query_plans'] = repository.hot_query_plans(conn)
+        conn.close()
+    return jsonify(stats)
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus metrics for this process"""
+    if not METRICS:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return metrics.response()
+
+@app.route('/api/db/profile')
+def get_db_profile():
+    """Get the slowest SQL statements with their query plans"""
+    try:
+        conn = get_db_connection()
+        report = query_profiler.report(conn, top=request.args.get('top', 10, type=int))
+        conn.close()
+        return jsonify({'enabled': SQL_PROFILE, **report})
+    except Exception as e:
+        logging.error(f"Error building SQL profile: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/db/profile', methods=['DELETE'])
+def reset_db_profile():
+    """Start a fresh SQL profiling window"""
+    query_profiler.reset()
+    return jsonify({'success': True})
 
 @app.route('/api/knowledge-cards')
 def get_knowledge_cards():
@@ -151,66 +466,101 @@ def get_knowledge_cards():
 
 @app.route('/api/documents')
 def get_documents():
-    """Get all documents with their tags"""
+    """Get all documents with their tags, limited to ?fields= and ?lang= if given"""
+    try:
+        fields = requested_fields()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
+        key = 'documents' if fields is None else f"documents:{','.join(fields)}"
+        response = catalog_cache.respond(key, repository.catalog_version(conn),
+                                         lambda: repository.documents_json(conn, fields))
+        conn.close()
+        return response
         
-        # Get documents with tags and associated podcasts
-        cursor.execute("""
-            SELECT d.*, 
-                   GROUP_CONCAT(DISTINCT t.name) as tags, 
-                   GROUP_CONCAT(DISTINCT t.color) as tag_colors,
-                   p.filename as podcast_file
-            FROM documents d
-            LEFT JOIN document_tags dt ON d.id = dt.document_id
-            LEFT JOIN tags t ON dt.tag_id = t.id
-            LEFT JOIN podcasts p ON d.id = p.document_id
-            GROUP BY d.id
-            ORDER BY d.created_at DESC
-        """)
-        
-        documents = []
-        for row in cursor.fetchall():
-            doc = dict(row)
-            doc['tags'] = row['tags'].split(',') if row['tags'] else []
-            doc['tag_colors'] = row['tag_colors'].split(',') if row['tag_colors'] else []
-            doc['insights_en'] = json.loads(doc['insights_en']) if doc['insights_en'] else []
-            doc['insights_th'] = json.loads(doc['insights_th']) if doc['insights_th'] else []
-            documents.append(doc)
+    except Exception as e:
+        logging.error(f"Error fetching documents: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/documents/<int:document_id>')
+def get_document_card(document_id):
+    """Get one document as listed by /api/documents, e.g. after a document event"""
+    try:
+        conn = get_db_connection()
+        card = repository.get_document_card(conn, document_id)
+        conn.close()
+        
+        if card is None:
+            return jsonify({'error': 'Document not found'}), 404
+        return jsonify(card)
         
+    except Exception as e:
+        logging.error(f"Error fetching document: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/events')
+def events():
+    """Server-Sent Events stream of document changes; resumes from Last-Event-ID"""
+    return event_feed.response()
+
+@app.route('/api/documents/<int:document_id>/content')
+def get_document_content(document_id):
+    """Get a document's summaries and insights in one language, generating Thai on first request"""
+    lang = request.args.get('lang', 'en')
+    if lang not in ('en', 'th'):
+        return jsonify({'error': 'Unsupported language'}), 400
+    
+    try:
+        conn = get_db_connection()
+        document = repository.get_document(conn, document_id)
         conn.close()
-        return jsonify({'documents': documents})
+        
+        if not document:
+            return jsonify({'error': 'Document not found'}), 404
+        
+        # Translation is a model call: it runs on the LLM pool like chat and quizzes
+        if lang == 'th' and groq_client and needs_thai_content(document):
+            return respond_llm(generate_thai_content, document_id)
+        
+        return jsonify(document_content(document, lang))
         
     except Exception as e:
-        logging.error(f"Error fetching documents: {e}")
+        logging.error(f"Error fetching document content: {e}")
         return jsonify({'error': str(e)}), 500
 
+def generate_thai_content(document_id):
+    """Body of get_document_content for missing Thai content, run on the LLM pool; returns (body, status)"""
+    document = thai_content.ensure(document_id)
+    if document is None:
+        return {'error': 'Document not found'}, 404
+    if not needs_thai_content(document):
+        event_feed.publish('document.updated', {'document_id': document_id})
+    return document_content(document, 'th'), 200
+
+def document_content(document, lang):
+    """Summaries and insights of a document row in one language"""
+    insights = document[f'insights_{lang}']
+    return {
+        'document_id': document['id'],
+        'lang': lang,
+        'title': document['title'],
+        'summary': document[f'summary_{lang}'] or '',
+        'detailed_summary': document[f'detailed_summary_{lang}'] or '',
+        'insights': json.loads(insights) if insights else [],
+        'pending': lang == 'th' and needs_thai_content(document)
+    }
+
 @app.route('/api/podcasts')
 def get_podcasts():
     """Get all podcasts with their tags"""
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT p.*, d.title as document_title, GROUP_CONCAT(t.name) as tags
-            FROM podcasts p
-            LEFT JOIN documents d ON p.document_id = d.id
-            LEFT JOIN podcast_tags pt ON p.id = pt.podcast_id
-            LEFT JOIN tags t ON pt.tag_id = t.id
-            GROUP BY p.id
-            ORDER BY p.created_at DESC
-        """)
-        
-        podcasts = []
-        for row in cursor.fetchall():
-            podcast = dict(row)
-            podcast['tags'] = row['tags'].split(',') if row['tags'] else []
-            podcasts.append(podcast)
-        
+        response = catalog_cache.respond('podcasts', repository.catalog_version(conn),
+                                         lambda: json.dumps({'podcasts': repository.list_podcasts(conn)}, ensure_ascii=False))
         conn.close()
-        return jsonify({'podcasts': podcasts})
+        return response
         
     except Exception as e:
         logging.error(f"Error fetching podcasts: {e}")
@@ -221,15 +571,27 @@ def get_tags():
     """Get all available tags"""
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM tags ORDER BY name")
-        tags = [dict(row) for row in cursor.fetchall()]
+        response = catalog_cache.respond('tags', repository.catalog_version(conn),
+                                         lambda: json.dumps({'tags': repository.list_tags(conn)}, ensure_ascii=False))
         conn.close()
-        return jsonify({'tags': tags})
+        return response
     except Exception as e:
         logging.error(f"Error fetching tags: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/changes')
+def get_changes():
+    """Get documents, tags and podcasts changed or deleted after catalog version ?since="""
+    since = request.args.get('since', type=int)
+    try:
+        conn = get_db_connection()
+        changes = repository.catalog_changes(conn, since)
+        conn.close()
+        return jsonify(changes)
+    except Exception as e:
+        logging.error(f"Error fetching changes: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/search')
 def search():
     """Search documents and podcasts"""
@@ -239,47 +601,14 @@ def search():
     if not query and not tags:
         return jsonify({'documents': [], 'podcasts': []})
     
+    try:
+        fields = requested_fields()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Search documents
-        doc_conditions = []
-        doc_params = []
-        
-        if query:
-            doc_conditions.append("""
-                (d.title LIKE ? OR d.summary_en LIKE ? OR d.detailed_summary_en LIKE ? 
-                 OR d.summary_th LIKE ? OR d.detailed_summary_th LIKE ?)
-            """)
-            search_param = f'%{query}%'
-            doc_params.extend([search_param] * 5)
-        
-        if tags:
-            placeholders = ','.join(['?' for _ in tags])
-            doc_conditions.append(f"t.name IN ({placeholders})")
-            doc_params.extend(tags)
-        
-        doc_query = f"""
-            SELECT DISTINCT d.*, GROUP_CONCAT(t.name) as tags, GROUP_CONCAT(t.color) as tag_colors
-            FROM documents d
-            LEFT JOIN document_tags dt ON d.id = dt.document_id
-            LEFT JOIN tags t ON dt.tag_id = t.id
-            WHERE {' AND '.join(doc_conditions) if doc_conditions else '1=1'}
-            GROUP BY d.id
-            ORDER BY d.created_at DESC
-        """
-        
-        cursor.execute(doc_query, doc_params)
-        documents = []
-        for row in cursor.fetchall():
-            doc = dict(row)
-            doc['tags'] = row['tags'].split(',') if row['tags'] else []
-            doc['tag_colors'] = row['tag_colors'].split(',') if row['tag_colors'] else []
-            doc['insights_en'] = json.loads(doc['insights_en']) if doc['insights_en'] else []
-            doc['insights_th'] = json.loads(doc['insights_th']) if doc['insights_th'] else []
-            documents.append(doc)
-        
+        documents = repository.search_documents(conn, query, tags, fields)
         conn.close()
         return jsonify({'documents': documents, 'podcasts': []})  # Podcast search can be added later
         
@@ -300,6 +629,16 @@ def upload_document():
     if not allowed_file(file.filename, ALLOWED_DOC_EXTENSIONS):
         return jsonify({'error': 'File type not allowed'}), 400
     
+    # PDF parsing and the summary call hold this thread, so uploads share the LLM sync slots
+    if not llm_jobs.acquire_slot():
+        return llm_busy()
+    try:
+        return ingest_document(file)
+    finally:
+        llm_jobs.release_slot()
+
+def ingest_document(file):
+    """Body of upload_document: store, summarize, tag and announce an uploaded document"""
     try:
         # Secure filename and save to uploads folder first
         original_filename = file.filename
@@ -324,7 +663,8 @@ def upload_document():
         
         # Generate AI summary if available
         title, summary_en_short, summary_en_detailed, summary_th_short, summary_th_detailed, insights_en, insights_th = \
-            generate_ai_summary_and_insights(content, original_filename) if content else (None, None, None, None, None, None, None)
+            generate_ai_summary_and_insights(content, original_filename, include_thai=not LAZY_THAI_CONTENT) \
+            if content else (None, None, None, None, None, None, None)
         
         # Move file to permanent location
         final_path = os.path.join(DOCS_FOLDER, filename)
@@ -383,6 +723,8 @@ def upload_document():
         conn.commit()
         conn.close()
         
+        event_feed.publish('document.added', {'document_id': document_id})
+        
         return jsonify({
             'success': True,
             'document_id': document_id,
@@ -451,6 +793,9 @@ def upload_podcast():
         conn.commit()
         conn.close()
         
+        if document_id:
+            event_feed.publish('document.updated', {'document_id': int(document_id)})
+        
         return jsonify({
             'success': True,
             'podcast_id': podcast_id,
@@ -494,6 +839,9 @@ def delete_document(document_id):
         conn.commit()
         conn.close()
         
+        answer_cache.invalidate_document(document_id)
+        event_feed.publish('document.deleted', {'document_id': document_id})
+        
         return jsonify({'success': True, 'message': 'Document deleted successfully'})
         
     except Exception as e:
@@ -541,10 +889,14 @@ def add_document_tag(document_id):
         cursor.execute("""
             INSERT OR IGNORE INTO document_tags (document_id, tag_id) VALUES (?, ?)
         """, (document_id, data['tag_id']))
+        changed = cursor.rowcount > 0
         
         conn.commit()
         conn.close()
         
+        if changed:
+            event_feed.publish('document.updated', {'document_id': document_id})
+        
         return jsonify({'success': True})
         
     except Exception as e:
@@ -561,10 +913,14 @@ def remove_document_tag(document_id, tag_id):
         cursor.execute("""
             DELETE FROM document_tags WHERE document_id = ? AND tag_id = ?
         """, (document_id, tag_id))
+        changed = cursor.rowcount > 0
         
         conn.commit()
         conn.close()
         
+        if changed:
+            event_feed.publish('document.updated', {'document_id': document_id})
+        
         return jsonify({'success': True})
         
     except Exception as e:
@@ -573,14 +929,84 @@ def remove_document_tag(document_id, tag_id):
 
 @app.route('/files/<path:filename>')
 def serve_file(filename):
-    """Serve uploaded files"""
+    """Serve uploaded files, redirecting plain links to immutable content-versioned ones"""
     if filename.startswith('docs/'):
-        return send_from_directory(DOCS_FOLDER, filename[5:])
+        return file_server.send(DOCS_FOLDER, filename[5:], offload_path=filename)
     elif filename.startswith('podcasts/'):
-        return send_from_directory(PODCASTS_FOLDER, filename[9:])
+        return file_server.send(PODCASTS_FOLDER, filename[9:], offload_path=filename)
     else:
         return "File not found", 404
 
+def build_quiz_prompt(document):
+    """Prompt asking for a 10-question Thai quiz about a document row"""
+    # Prepare content for AI processing
+    content = f"""
+    Title: {document['title']}
+    Summary (English): {document['detailed_summary_en'] or document['summary_en'] or ''}
+    Insights: {document['insights_en'] or '[]'}
+    """
+    
+    return f"""
+    Based on the following document content, create a 10-question multiple choice quiz in Thai language.
+    
+    Document Content:
+    {content}
+    
+    Please provide the response in this exact JSON format:
+    {{
+        "title": "Quiz title in Thai",
+        "description": "Brief description of the quiz in Thai",
+        "questions": [
+            {{
+                "question": "Question text in Thai",
+                "options": {{
+                    "A": "Option A in Thai",
+                    "B": "Option B in Thai", 
+                    "C": "Option C in Thai",
+                    "D": "Option D in Thai"
+                }},
+                "correct_answer": "A",
+                "explanation": "Explanation of correct answer in Thai"
+            }}
+        ]
+    }}
+    
+    Make sure to create exactly 10 questions that test understanding of the key concepts, insights, and important details from the document.
+    """
+
+def assemble_quiz(parser, document):
+    """Build quiz data from the questions that validated, salvaging partial replies"""
+    data, repaired = parser.result()
+    data = data if isinstance(data, dict) else {}
+    
+    if parser.rejected or repaired:
+        logging.warning(f"Salvaged quiz for document {document['id']}: {len(parser.items)} valid, "
+                        f"{len(parser.rejected)} rejected questions (repaired={repaired})")
+    if not parser.items:
+        raise ValueError('AI response contained no valid quiz questions')
+    
+    title = data.get('title')
+    description = data.get('description')
+    return {
+        'title': title if isinstance(title, str) and title else f"แบบทดสอบ: {document['title']}",
+        'description': description if isinstance(description, str) else '',
+        'questions': parser.items
+    }
+
+def generate_quiz_data(document):
+    """Ask Groq for a 10-question Thai quiz about a document row"""
+    completion = llm_completion(
+        'quiz',
+        model="llama-3.1-8b-instant",
+        messages=[{"role": "user", "content": build_quiz_prompt(document)}],
+        temperature=0.3,
+        max_tokens=4000
+    )
+    
+    parser = StreamingJSONParser(item_path='questions', item_schema=QUIZ_QUESTION_SCHEMA)
+    parser.feed(completion.choices[0].message.content)
+    return assemble_quiz(parser, document)
+
 # Quiz API endpoints
 @app.route('/api/quiz/generate/<int:document_id>', methods=['POST'])
 def generate_quiz(document_id):
@@ -596,110 +1022,236 @@ def generate_quiz(document_id):
         cursor.execute("SELECT * FROM documents WHERE id = ?", (document_id,))
         document = cursor.fetchone()
         
-        if not document:
-            return jsonify({'error': 'Document not found'}), 404
-        
         # Check if quiz already exists
         cursor.execute("SELECT id FROM quizzes WHERE document_id = ?", (document_id,))
         existing_quiz = cursor.fetchone()
+        conn.close()
         
+        if not document:
+            return jsonify({'error': 'Document not found'}), 404
         if existing_quiz:
             return jsonify({'error': 'Quiz already exists for this document'}), 400
         
-        # Prepare content for AI processing
-        content = f"""
-        Title: {document['title']}
-        Summary (English): {document['detailed_summary_en'] or document['summary_en'] or ''}
-        Insights: {document['insights_en'] or '[]'}
-        """
+    except Exception as e:
+        logging.error(f"Error generating quiz: {e}")
+        return jsonify({'error': str(e)}), 500
+    
+    # Checked on arrival, so requests racing for a new document all receive its quiz
+    return respond_llm(create_quiz, document)
+
+def generate_batch_quiz(document):
+    """generate_and_save_quiz on the LLM pool, within LLM_WORKERS concurrent calls; returns the quiz id
+
+    Goes through the same flight as generate_quiz, so a batch item and a request for the same
+    document, in any worker, share one generation.
+    """
+    return llm_jobs.call(llm_flights.do, ('quiz', document['id']), generate_and_save_quiz, document)
+
+def create_quiz(document):
+    """Body of generate_quiz, run on the LLM pool; returns (body, status)"""
+    try:
+        # Requests racing for this document, in any worker, share one generation
+        quiz_id = llm_flights.do(('quiz', document['id']), generate_and_save_quiz, document)
         
-        # Generate quiz questions using Groq
-        prompt = f"""
-        Based on the following document content, create a 10-question multiple choice quiz in Thai language.
+        return {
+            'success': True,
+            'quiz_id': quiz_id,
+            'message': 'Quiz generated successfully'
+        }, 200
+        
+    except Exception as e:
+        logging.error(f"Error generating quiz: {e}")
+        return {'error': str(e)}, 500
+
+def generate_and_save_quiz(document):
+    """Generate and store a document's quiz unless one was stored meanwhile; returns the quiz id"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        # Stored by an earlier holder of the flight, e.g. in another worker
+        cursor.execute("SELECT id FROM quizzes WHERE document_id = ?", (document['id'],))
+        existing_quiz = cursor.fetchone()
+        if existing_quiz:
+            return existing_quiz[0]
         
-        Document Content:
-        {content}
+        quiz_data = generate_quiz_data(document)
         
-        Please provide the response in this exact JSON format:
-        {{
-            "title": "Quiz title in Thai",
-            "description": "Brief description of the quiz in Thai",
-            "questions": [
-                {{
-                    "question": "Question text in Thai",
-                    "options": {{
-                        "A": "Option A in Thai",
-                        "B": "Option B in Thai", 
-                        "C": "Option C in Thai",
-                        "D": "Option D in Thai"
-                    }},
-                    "correct_answer": "A",
-                    "explanation": "Explanation of correct answer in Thai"
-                }}
-            ]
-        }}
+        # Save quiz and questions to database
+        quiz_id = save_quiz(cursor, document['id'], quiz_data)
+        conn.commit()
+        return quiz_id
+    finally:
+        conn.close()
+
+@app.route('/api/quiz/generate/<int:document_id>/stream', methods=['POST'])
+def generate_quiz_stream(document_id):
+    """Generate a quiz, streaming each question as newline-delimited JSON as soon as it is complete"""
+    if not groq_client:
+        return jsonify({'error': 'AI service not available'}), 503
+    
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM documents WHERE id = ?", (document_id,))
+        document = cursor.fetchone()
+        cursor.execute("SELECT id FROM quizzes WHERE document_id = ?", (document_id,))
+        existing_quiz = cursor.fetchone()
+        conn.close()
         
-        Make sure to create exactly 10 questions that test understanding of the key concepts, insights, and important details from the document.
-        """
+        if not document:
+            return jsonify({'error': 'Document not found'}), 404
+        if existing_quiz:
+            return jsonify({'error': 'Quiz already exists for this document'}), 400
         
-        completion = groq_client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=4000
-        )
+    except Exception as e:
+        logging.error(f"Error generating quiz: {e}")
+        return jsonify({'error': str(e)}), 500
+    
+    # The stream holds its request thread until the model finishes, so it takes a sync slot
+    if not llm_jobs.acquire_slot():
+        return llm_busy()
+    
+    def events():
+        def event(payload):
+            return json.dumps(payload, ensure_ascii=False) + "\n"
         
-        response_text = completion.choices[0].message.content
+        try:
+            stream = llm_completion(
+                'quiz',
+                model="llama-3.1-8b-instant",
+                messages=[{"role": "user", "content": build_quiz_prompt(document)}],
+                temperature=0.3,
+                max_tokens=4000,
+                stream=True
+            )
+            
+            parser = StreamingJSONParser(item_path='questions', item_schema=QUIZ_QUESTION_SCHEMA)
+            for chunk in stream:
+                for question in parser.feed(chunk.choices[0].delta.content or ''):
+                    # Answers and explanations stay on the server until submission
+                    yield event({
+                        'type': 'question',
+                        'order': len(parser.items),
+                        'question': question['question'],
+                        'options': question['options']
+                    })
+            
+            quiz_data = assemble_quiz(parser, document)
+            
+            # The app context is gone by now, so the connection must go back to the pool here
+            conn = get_db_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT * FROM quizzes WHERE document_id = ?", (document_id,))
+                quiz = cursor.fetchone()
+                if not quiz:
+                    save_quiz(cursor, document_id, quiz_data)
+                    conn.commit()
+                    cursor.execute("SELECT * FROM quizzes WHERE document_id = ?", (document_id,))
+                    quiz = cursor.fetchone()
+                payload = quiz_payload(cursor, quiz)
+            finally:
+                conn.close()
+            
+            yield event({'type': 'quiz', 'quiz': payload, 'rejected': len(parser.rejected)})
+            
+        except Exception as e:
+            logging.error(f"Error streaming quiz: {e}")
+            yield event({'type': 'error', 'error': str(e)})
+        finally:
+            llm_jobs.release_slot()
+    
+    return Response(events(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
+@app.route('/api/quiz/batch', methods=['POST'])
+def start_quiz_batch():
+    """Start a background job generating quizzes for many documents"""
+    if not groq_client:
+        return jsonify({'error': 'AI service not available'}), 503
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        parallelism = min(int(data.get('parallelism', 4)), QUIZ_BATCH_MAX_PARALLELISM)
+        job = QuizBatchJob(get_db_connection, generate_batch_quiz, parallelism=parallelism)
+        job_id = job.create(
+            tags=data.get('tags') or None,
+            missing_only=bool(data.get('missing_only', True)),
+            limit=data.get('limit')
+        )
+        job.start(job_id)
         
-        # Extract JSON from response
-        if '```json' in response_text:
-            response_text = response_text.split('```json')[1].split('```')[0]
-        elif '{' in response_text:
-            start = response_text.find('{')
-            end = response_text.rfind('}') + 1
-            response_text = response_text[start:end]
+        return jsonify({'success': True, 'job_id': job_id, 'report': job.report(job_id)}), 202
         
-        quiz_data = json.loads(response_text)
+    except Exception as e:
+        logging.error(f"Error starting quiz batch: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/quiz/batch/<job_id>')
+def get_quiz_batch(job_id):
+    """Get progress and throughput of a batch quiz job"""
+    try:
+        report = QuizBatchJob(get_db_connection, generate_batch_quiz).report(job_id)
+        if not report:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify({'job': report})
         
-        # Save quiz to database
-        cursor.execute("""
-            INSERT INTO quizzes (document_id, title, description, total_questions)
-            VALUES (?, ?, ?, ?)
-        """, (document_id, quiz_data['title'], quiz_data.get('description', ''), len(quiz_data['questions'])))
-        
-        quiz_id = cursor.lastrowid
-        
-        # Save questions
-        for i, question in enumerate(quiz_data['questions']):
-            cursor.execute("""
-                INSERT INTO quiz_questions 
-                (quiz_id, question_text, option_a, option_b, option_c, option_d, correct_answer, explanation, question_order)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                quiz_id,
-                question['question'],
-                question['options']['A'],
-                question['options']['B'],
-                question['options']['C'],
-                question['options']['D'],
-                question['correct_answer'],
-                question.get('explanation', ''),
-                i + 1
-            ))
+    except Exception as e:
+        logging.error(f"Error fetching quiz batch: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/quiz/batch/<job_id>/resume', methods=['POST'])
+def resume_quiz_batch(job_id):
+    """Resume an interrupted batch quiz job, retrying its failed items"""
+    if not groq_client:
+        return jsonify({'error': 'AI service not available'}), 503
+    
+    try:
+        job = QuizBatchJob(get_db_connection, generate_batch_quiz)
+        report = job.report(job_id)
+        if not report:
+            return jsonify({'error': 'Job not found'}), 404
         
-        conn.commit()
-        conn.close()
+        job.parallelism = report['parallelism']
+        # Claimed in the database, so only one of several racing resumes, in any worker, runs it
+        if not job.start(job_id):
+            return jsonify({'error': 'Job is already running'}), 409
         
-        return jsonify({
-            'success': True,
-            'quiz_id': quiz_id,
-            'message': 'Quiz generated successfully'
-        })
+        return jsonify({'success': True, 'job_id': job_id}), 202
         
     except Exception as e:
-        logging.error(f"Error generating quiz: {e}")
+        logging.error(f"Error resuming quiz batch: {e}")
         return jsonify({'error': str(e)}), 500
 
+def quiz_payload(cursor, quiz):
+    """Quiz with its questions as served to clients (without answers)"""
+    cursor.execute("""
+        SELECT * FROM quiz_questions 
+        WHERE quiz_id = ? 
+        ORDER BY question_order
+    """, (quiz['id'],))
+    
+    questions = []
+    for row in cursor.fetchall():
+        questions.append({
+            'id': row['id'],
+            'question': row['question_text'],
+            'options': {
+                'A': row['option_a'],
+                'B': row['option_b'],
+                'C': row['option_c'],
+                'D': row['option_d']
+            },
+            'order': row['question_order']
+        })
+    
+    return {
+        'id': quiz['id'],
+        'title': quiz['title'],
+        'description': quiz['description'],
+        'total_questions': quiz['total_questions'],
+        'questions': questions
+    }
+
 @app.route('/api/quiz/<int:document_id>')
 def get_quiz(document_id):
     """Get quiz for a specific document"""
@@ -714,38 +1266,10 @@ def get_quiz(document_id):
         if not quiz:
             return jsonify({'error': 'Quiz not found'}), 404
         
-        # Get questions
-        cursor.execute("""
-            SELECT * FROM quiz_questions 
-            WHERE quiz_id = ? 
-            ORDER BY question_order
-        """, (quiz['id'],))
-        
-        questions = []
-        for row in cursor.fetchall():
-            questions.append({
-                'id': row['id'],
-                'question': row['question_text'],
-                'options': {
-                    'A': row['option_a'],
-                    'B': row['option_b'],
-                    'C': row['option_c'],
-                    'D': row['option_d']
-                },
-                'order': row['question_order']
-            })
-        
+        payload = quiz_payload(cursor, quiz)
         conn.close()
         
-        return jsonify({
-            'quiz': {
-                'id': quiz['id'],
-                'title': quiz['title'],
-                'description': quiz['description'],
-                'total_questions': quiz['total_questions'],
-                'questions': questions
-            }
-        })
+        return jsonify({'quiz': payload})
         
     except Exception as e:
         logging.error(f"Error fetching quiz: {e}")
@@ -771,6 +1295,8 @@ def submit_quiz(quiz_id):
         if not quiz:
             return jsonify({'error': 'Quiz not found'}), 404
         
+        quiz_analytics.ready(conn)
+        
         cursor.execute("""
             SELECT id, correct_answer, explanation 
             FROM quiz_questions 
@@ -802,15 +1328,12 @@ def submit_quiz(quiz_id):
         
         score = (correct_count / len(questions)) * 100 if questions else 0
         
-        # Save attempt
-        cursor.execute("""
-            INSERT INTO quiz_attempts (quiz_id, user_identifier, score, total_questions, answers)
-            VALUES (?, ?, ?, ?, ?)
-        """, (quiz_id, 'anonymous', int(score), len(questions), json.dumps(user_answers)))
-        
-        conn.commit()
         conn.close()
         
+        # Save the attempt and its aggregate updates through the group-commit writer
+        db_writer.write(save_attempt, quiz_id, int(score), len(questions), user_answers, results,
+                        timeout=WRITE_ACK_TIMEOUT)
+        
         return jsonify({
             'success': True,
             'score': int(score),
@@ -819,11 +1342,48 @@ def submit_quiz(quiz_id):
             'results': results
         })
         
+    except (WriterBusy, WriteTimeout) as e:
+        return writer_unavailable(e)
     except Exception as e:
         logging.error(f"Error submitting quiz: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/quiz/<int:quiz_id>/stats')
+def get_quiz_stats(quiz_id):
+    """Get attempt and per-question statistics for a quiz"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT id FROM quizzes WHERE id = ?", (quiz_id,))
+        if not cursor.fetchone():
+            conn.close()
+            return jsonify({'error': 'Quiz not found'}), 404
+        
+        quiz_analytics.ready(conn)
+        stats = quiz_stats(cursor, quiz_id)
+        conn.close()
+        return jsonify(stats)
+        
+    except Exception as e:
+        logging.error(f"Error fetching quiz stats: {e}")
+        return jsonify({'error': str(e)}), 500
+
 # ThothKB Chat API endpoints
+@app.route('/api/chat/archive', methods=['POST'])
+def archive_chat_sessions():
+    """Archive idle chat sessions now instead of waiting for the background job"""
+    data = request.get_json(silent=True) or {}
+    idle_days = data.get('idle_days')
+    if idle_days is not None and (not isinstance(idle_days, int) or idle_days < 0):
+        return jsonify({'error': 'idle_days must be a non-negative integer'}), 400
+    
+    try:
+        return jsonify(chat_archive.archive_idle(idle_days))
+    except Exception as e:
+        logging.error(f"Error archiving chat sessions: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/chat/session', methods=['POST'])
 def create_chat_session():
     """Create a new chat session"""
@@ -831,47 +1391,36 @@ def create_chat_session():
         import uuid
         session_id = str(uuid.uuid4())
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO chat_sessions (session_id) VALUES (?)
-        """, (session_id,))
-        
-        conn.commit()
-        conn.close()
+        db_writer.write(repository.create_chat_session, session_id, timeout=WRITE_ACK_TIMEOUT)
         
         return jsonify({'session_id': session_id})
         
+    except (WriterBusy, WriteTimeout) as e:
+        return writer_unavailable(e)
     except Exception as e:
         logging.error(f"Error creating chat session: {e}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/chat/<session_id>/messages')
 def get_chat_messages(session_id):
-    """Get chat messages for a session"""
+    """Get a page of chat messages for a session, newest first; pass next_cursor as ?before= for older ones"""
+    limit = max(1, min(request.args.get('limit', CHAT_PAGE_SIZE, type=int), CHAT_PAGE_MAX))
+    before = request.args.get('before', type=int)
+    
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT * FROM chat_messages 
-            WHERE session_id = ? 
-            ORDER BY created_at ASC
-        """, (session_id,))
-        
-        messages = []
-        for row in cursor.fetchall():
-            messages.append({
-                'id': row['id'],
-                'type': row['message_type'],
-                'content': row['content'],
-                'sources': json.loads(row['sources']) if row['sources'] else [],
-                'timestamp': row['created_at']
-            })
-        
+        messages = repository.page_chat_messages(conn, session_id, before, limit + 1)
+        if not messages and not repository.chat_session_exists(conn, session_id):
+            messages = chat_archive.page_messages(session_id, before, limit + 1)
         conn.close()
-        return jsonify({'messages': messages})
+        
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        return jsonify({
+            'messages': messages,
+            'has_more': has_more,
+            'next_cursor': messages[-1]['id'] if has_more else None
+        })
         
     except Exception as e:
         logging.error(f"Error fetching chat messages: {e}")
@@ -883,69 +1432,50 @@ def ask_thothkb(session_id):
     if not groq_client:
         return jsonify({'error': 'AI service not available'}), 503
     
+    data = request.get_json(silent=True)
+    if not data or 'question' not in data:
+        return jsonify({'error': 'Question required'}), 400
+    return respond_llm(answer_question, session_id, data['question'])
+
+def answer_question(session_id, user_question):
+    """Body of ask_thothkb, run on the LLM pool; returns (body, status[, headers])"""
     try:
-        data = request.get_json()
-        if not data or 'question' not in data:
-            return jsonify({'error': 'Question required'}), 400
-        
-        user_question = data['question']
-        
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Update session activity
-        cursor.execute("""
-            UPDATE chat_sessions 
-            SET last_activity = CURRENT_TIMESTAMP 
-            WHERE session_id = ?
-        """, (session_id,))
+        # A session picked up again after being archived moves back first
+        if not repository.chat_session_exists(conn, session_id):
+            chat_archive.restore(session_id)
         
-        # Save user message
-        cursor.execute("""
-            INSERT INTO chat_messages (session_id, message_type, content)
-            VALUES (?, 'user', ?)
-        """, (session_id, user_question))
-        
-        # Search relevant documents using improved keyword matching
-        search_terms = user_question.lower().split()
-        search_conditions = []
-        search_params = []
-        
-        # Create individual search conditions for each term
-        for term in search_terms:
-            if len(term) >= 2:  # Skip very short terms
-                search_conditions.append("""
-                    LOWER(d.title || ' ' || COALESCE(d.summary_en, '') || ' ' || 
-                          COALESCE(d.detailed_summary_en, '') || ' ' || 
-                          COALESCE(d.summary_th, '') || ' ' || 
-                          COALESCE(d.detailed_summary_th, '')) LIKE ?
-                """)
-                search_params.append(f'%{term}%')
-        
-        # If no good search terms, search more broadly
-        if not search_conditions:
-            search_conditions.append("""
-                LOWER(d.title || ' ' || COALESCE(d.summary_en, '') || ' ' || 
-                      COALESCE(d.detailed_summary_en, '')) LIKE ?
-            """)
-            search_params.append(f'%{user_question.lower()}%')
-        
-        # Combine conditions with OR
-        where_clause = ' OR '.join(search_conditions)
-        
-        cursor.execute(f"""
-            SELECT d.id, d.title, d.summary_en, d.detailed_summary_en, d.insights_en,
-                   d.summary_th, d.detailed_summary_th, d.insights_th
-            FROM documents d
-            WHERE {where_clause}
-            ORDER BY d.created_at DESC
-            LIMIT 5
-        """, search_params)
-        
-        relevant_docs = cursor.fetchall()
-        logging.info(f"Search terms: {search_terms}")
+        # Earlier turns of this session: rolling summary plus the latest exchanges
+        history = chat_memory.history_messages(cursor, session_id)
+        
+        # Search relevant documents using keyword matching
+        relevant_docs = repository.find_relevant_documents(conn, user_question, limit=5)
         logging.info(f"Found {len(relevant_docs)} relevant documents")
         
+        # Fall back to the most recent documents when nothing matches
+        fallback_docs = []
+        if not relevant_docs:
+            fallback_docs = repository.recent_documents(conn, limit=3)
+        
+        # Reuse the answer to a similar question asked over the same, unchanged sources;
+        # follow-up questions depend on the conversation so they always go to the model
+        fingerprint = source_fingerprint(relevant_docs or fallback_docs)
+        cached = answer_cache.lookup(user_question, fingerprint) if not history else None
+        if cached:
+            conn.close()
+            
+            db_writer.write(repository.add_chat_exchange, session_id, user_question,
+                            cached['answer'], cached['sources'], timeout=WRITE_ACK_TIMEOUT)
+            
+            return {
+                'success': True,
+                'response': cached['answer'],
+                'sources': cached['sources'],
+                'cached': True
+            }, 200
+        
         # Prepare context from relevant documents
         context = ""
         source_ids = []
@@ -985,42 +1515,31 @@ def ask_thothkb(session_id):
 คำถาม: {user_question}
 
 กรุณาตอบอย่างละเอียดและอ้างอิงเอกสารต้นทางที่เกี่ยวข้อง"""
-        else:
-            # Try to get all documents as fallback
-            cursor.execute("""
-                SELECT d.id, d.title, d.summary_en, d.detailed_summary_en, d.insights_en
-                FROM documents d
-                ORDER BY d.created_at DESC
-                LIMIT 3
-            """)
-            all_docs = cursor.fetchall()
+        elif fallback_docs:
+            context = "ข้อมูลจากเอกสารในฐานข้อมูล:\n\n"
+            for doc in fallback_docs:
+                context += f"เอกสาร: {doc['title']}\n"
+                context += f"สรุป: {doc['summary_en'] or ''}\n"
+                context += "\n---\n\n"
+                source_ids.append(doc['id'])
             
-            if all_docs:
-                context = "ข้อมูลจากเอกสารในฐานข้อมูล:\n\n"
-                source_ids = []
-                for doc in all_docs:
-                    context += f"เอกสาร: {doc['title']}\n"
-                    context += f"สรุป: {doc['summary_en'] or ''}\n"
-                    context += "\n---\n\n"
-                    source_ids.append(doc['id'])
-                
-                user_prompt = f"""ตอบคำถามต่อไปนี้โดยใช้ข้อมูลจากเอกสารที่มี (ถ้าเกี่ยวข้อง):
+            user_prompt = f"""ตอบคำถามต่อไปนี้โดยใช้ข้อมูลจากเอกสารที่มี (ถ้าเกี่ยวข้อง):
 
 {context}
 
 คำถาม: {user_question}
 
 หากข้อมูลในเอกสารไม่เกี่ยวข้องโดยตรง กรุณาแจ้งและแนะนำว่าควรถามคำถามประเภทใด"""
-            else:
-                user_prompt = f"""คำถาม: {user_question}
+        else:
+            user_prompt = f"""คำถาม: {user_question}
 
 ขออภัย ไม่พบเอกสารในฐานข้อมูล กรุณาลองถามคำถามอื่นที่เกี่ยวข้องกับเทคโนโลยีการผลิต การควบคุมคุณภาพ หรือการประยุกต์ใช้ AI ในอุตสาหกรรม"""
         
         # Get AI response
-        completion = groq_client.chat.completions.create(
+        completion = llm_completion(
+            'chat',
             model="llama-3.1-8b-instant",
-            messages=[
-                {"role": "system", "content": system_prompt},
+            messages=[{"role": "system", "content": system_prompt}] + history + [
                 {"role": "user", "content": user_prompt}
             ],
             temperature=0.3,
@@ -1028,25 +1547,38 @@ def ask_thothkb(session_id):
         )
         
         ai_response = completion.choices[0].message.content
+        if not history:
+            answer_cache.store(user_question, fingerprint, ai_response, source_ids)
         
-        # Save AI response
-        cursor.execute("""
-            INSERT INTO chat_messages (session_id, message_type, content, sources)
-            VALUES (?, 'assistant', ?, ?)
-        """, (session_id, ai_response, json.dumps(source_ids)))
-        
-        conn.commit()
+        # Save the question and answer; no write lock is held while the model is thinking
         conn.close()
+        db_writer.write(repository.add_chat_exchange, session_id, user_question, ai_response, source_ids,
+                        timeout=WRITE_ACK_TIMEOUT)
         
-        return jsonify({
+        chat_memory.schedule_fold(session_id)
+        
+        return {
             'success': True,
             'response': ai_response,
             'sources': source_ids
-        })
+        }, 200
         
+    except (WriterBusy, WriteTimeout) as e:
+        return writer_unavailable(e)
     except Exception as e:
         logging.error(f"Error processing chat question: {e}")
-        return jsonify({'error': str(e)}), 500
+        return {'error': str(e)}, 500
+
+@app.route('/api/jobs/<job_id>')
+def get_llm_job(job_id):
+    """Status of an AI request accepted with `Prefer: respond-async`; its result once finished"""
+    job = llm_jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    if job['result'] is None:
+        return jsonify({'job_id': job_id, 'status': job['status']}), 202, {'Retry-After': '1'}
+    body, status, *headers = job['result']
+    return jsonify(body), status, *headers
 
 if __name__ == '__main__':
     app.run(debug=True, host='localhost', port=8080)
\ No newline at end of file
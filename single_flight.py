@@ -0,0 +1,158 @@
+"""
+Single-flight execution of expensive idempotent work
+Concurrent calls with the same key, e.g. ('quiz', document_id), share one computation:
+the first caller runs it and the others wait for its result. With a LockTable the key is
+also held across processes on the same database, so workers take turns instead of paying
+twice; the work then starts by checking whether an earlier holder already stored a result.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+LOCK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS flight_locks (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL -- unix time after which a crashed holder's lock is taken over
+);
+"""
+
+
+class LockTable:
+    """Leased keys in a SQLite table, one row per key held by some process"""
+
+    def __init__(self, database_path, lease=300.0, poll=0.05, max_poll=1.0):
+        self.database_path = database_path
+        self.lease = lease        # seconds a holder may keep a key before others take it over
+        self.poll = poll          # first wait between attempts, doubled up to max_poll
+        self.max_poll = max_poll
+        self._token = uuid.uuid4().hex[:8]
+        self._schema_ready = False
+        self._lock = threading.Lock()
+        self._stats = {'acquired': 0, 'waited': 0, 'timed_out': 0, 'taken_over': 0}
+
+    def owner(self):
+        # Forked workers inherit the token, the pid tells them apart
+        return f"{os.getpid()}-{self._token}"
+
+    def acquire(self, key, timeout):
+        """True once key is held by this process; False if another holder kept it past timeout"""
+        deadline = time.monotonic() + timeout
+        delay = self.poll
+        waited = False
+        while True:
+            if self._try_acquire(key):
+                with self._lock:
+                    self._stats['acquired'] += 1
+                    self._stats['waited'] += waited
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                with self._lock:
+                    self._stats['timed_out'] += 1
+                return False
+            waited = True
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, self.max_poll)
+
+    def release(self, key):
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM flight_locks WHERE key = ? AND owner = ?", (key, self.owner()))
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            # The work is done either way; the row expires after the lease
+            logging.warning(f"Could not release flight lock {key}: {e}")
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, lease=self.lease)
+
+    def _try_acquire(self, key):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            expired = conn.execute("DELETE FROM flight_locks WHERE key = ? AND expires_at < ?", (key, now)).rowcount
+            inserted = conn.execute("INSERT OR IGNORE INTO flight_locks (key, owner, expires_at) VALUES (?, ?, ?)",
+                                    (key, self.owner(), now + self.lease)).rowcount
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        if expired:
+            logging.warning(f"Took over the expired flight lock {key}")
+            with self._lock:
+                self._stats['taken_over'] += 1
+        return inserted == 1
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database_path, timeout=30, isolation_level=None)
+        if not self._schema_ready:
+            conn.executescript(LOCK_SCHEMA)
+            self._schema_ready = True
+        return conn
+
+
+class SingleFlight:
+    """At most one call per key runs at a time; concurrent callers with that key share its outcome"""
+
+    def __init__(self, locks=None, wait=120.0):
+        self.locks = locks  # LockTable to also hold keys across processes, or None
+        self.wait = wait    # seconds to wait for another process's holder before running anyway
+        self._inflight = {}  # key -> Future shared by concurrent callers in this process
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'runs': 0, 'shared': 0, 'failed': 0}
+
+    def do(self, key, fn, *args):
+        """fn(*args), or the result of the identical call already in flight; exceptions are shared too"""
+        with self._lock:
+            self._stats['calls'] += 1
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+                self._stats['runs'] += 1
+            else:
+                self._stats['shared'] += 1
+
+        if owner:
+            try:
+                future.set_result(self._run(key, fn, args))
+            except Exception as e:
+                with self._lock:
+                    self._stats['failed'] += 1
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+        return future.result()
+
+    def _run(self, key, fn, args):
+        if self.locks is None:
+            return fn(*args)
+        name = ':'.join(str(part) for part in key) if isinstance(key, tuple) else str(key)
+        held = self.locks.acquire(name, self.wait)
+        if not held:
+            # Duplicate work beats failing the request; the holder may be stuck or very slow
+            logging.warning(f"Flight lock {name} still held after {self.wait:.0f} s, running anyway")
+        try:
+            return fn(*args)
+        finally:
+            if held:
+                self.locks.release(name)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, in_flight=len(self._inflight))
+        if self.locks is not None:
+            stats['locks'] = self.locks.stats()
+        return stats
@@ -0,0 +1,79 @@
+import os
+import sqlite3
+
+import pytest
+
+from chat_memory import ensure_memory_schema, save_summary
+from database.archive import ChatArchive
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'schema.sql')
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = str(tmp_path / 'kb.db')
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    with open(SCHEMA_PATH, encoding='utf-8') as f:
+        conn.executescript(f.read())
+    ensure_memory_schema(conn)
+    for session_id, idle_days in (('idle-1', 60), ('idle-2', 45), ('active', 0)):
+        conn.execute("INSERT INTO chat_sessions (session_id, last_activity) VALUES (?, datetime('now', ?))",
+                     (session_id, f'-{idle_days} days'))
+        for turn in range(2):
+            conn.execute("INSERT INTO chat_messages (session_id, message_type, content, sources) VALUES (?, 'user', ?, '[1]')",
+                         (session_id, f'{session_id} question {turn}'))
+    save_summary(conn, 'idle-1', 'asked about steel', 1)
+    conn.commit()
+    conn.close()
+    return ChatArchive(path, str(tmp_path / 'archive.db'), idle_days=30, batch_size=1)
+
+
+def rows(path, sql, params=()):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def snapshot(path, session_id):
+    return (
+        rows(path, "SELECT id, session_id, created_at, last_activity FROM chat_sessions WHERE session_id = ?", (session_id,)),
+        rows(path, "SELECT * FROM chat_messages WHERE session_id = ? ORDER BY id", (session_id,)),
+        rows(path, "SELECT session_id, summary, summarized_through FROM chat_summaries WHERE session_id = ?", (session_id,)),
+    )
+
+
+def test_idle_sessions_move_to_the_archive_in_batches(archive):
+    totals = archive.archive_idle()
+    assert (totals['sessions'], totals['messages'], totals['batches']) == (2, 4, 2)
+
+    main = [row[0] for row in rows(archive.database_path, "SELECT session_id FROM chat_sessions")]
+    assert main == ['active']
+    assert rows(archive.database_path, "SELECT COUNT(*) FROM chat_messages") == [(2,)]
+    assert rows(archive.database_path, "SELECT COUNT(*) FROM chat_summaries") == [(0,)]
+
+    messages = archive.page_messages('idle-1')
+    assert [m['content'] for m in messages] == ['idle-1 question 1', 'idle-1 question 0']
+    assert messages[0]['sources'] == [1]
+    assert archive.archive_idle()['sessions'] == 0
+
+
+def test_restore_brings_a_session_back_unchanged(archive):
+    before = snapshot(archive.database_path, 'idle-1')
+    archive.archive_idle()
+    assert snapshot(archive.database_path, 'idle-1') == ([], [], [])
+
+    assert archive.restore('idle-1') is True
+    assert snapshot(archive.database_path, 'idle-1') == before
+    assert archive.page_messages('idle-1') == []
+    assert [m['content'] for m in archive.page_messages('idle-2')] == ['idle-2 question 1', 'idle-2 question 0']
+
+    assert archive.restore('idle-1') is False  # already back
+    assert archive.restore('active') is False  # never archived
+
+
+def test_nothing_to_restore_or_page_before_the_first_archive_run(archive):
+    assert archive.restore('idle-1') is False
+    assert archive.page_messages('idle-1') == []
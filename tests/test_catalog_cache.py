@@ -0,0 +1,49 @@
+from flask import Flask
+
+from catalog_cache import CatalogCache
+
+
+def make_app(cache, state):
+    app = Flask(__name__)
+
+    @app.route('/api/tags')
+    def tags():
+        def build():
+            state['builds'] += 1
+            return f'{{"version": {state["version"]}}}'
+        return cache.respond('tags', state['version'], build)
+
+    return app.test_client()
+
+
+def test_unchanged_catalog_is_answered_with_304_without_rebuilding():
+    cache, state = CatalogCache(), {'version': 1, 'builds': 0}
+    client = make_app(cache, state)
+
+    first = client.get('/api/tags')
+    etag = first.headers['ETag']
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    again = client.get('/api/tags', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == etag
+    # Compressed responses carry the weak form of the tag
+    assert client.get('/api/tags', headers={'If-None-Match': f'W/{etag}'}).status_code == 304
+    assert client.get('/api/tags').data == first.data
+    assert state['builds'] == 1
+    assert cache.stats()['not_modified'] == 2
+
+
+def test_new_catalog_version_rebuilds_and_changes_the_etag():
+    cache, state = CatalogCache(), {'version': 1, 'builds': 0}
+    client = make_app(cache, state)
+    etag = client.get('/api/tags').headers['ETag']
+
+    state['version'] = 2
+    changed = client.get('/api/tags', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.get_json() == {'version': 2}
+    assert changed.headers['ETag'] != etag
+    assert state['builds'] == 2
@@ -0,0 +1,111 @@
+import sqlite3
+
+import pytest
+
+from chat_memory import ConversationMemory, save_summary
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / 'chat.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE chat_sessions (session_id TEXT PRIMARY KEY);
+        CREATE TABLE chat_messages (id INTEGER PRIMARY KEY, session_id TEXT, message_type TEXT, content TEXT);
+        INSERT INTO chat_sessions VALUES ('s1');
+    """)
+    for turn in range(6):
+        conn.execute("INSERT INTO chat_messages (session_id, message_type, content) VALUES ('s1', 'user', ?)",
+                     (f'question {turn}',))
+        conn.execute("INSERT INTO chat_messages (session_id, message_type, content) VALUES ('s1', 'assistant', ?)",
+                     (f'answer {turn}',))
+    conn.commit()
+    conn.close()
+    return path
+
+
+class Connections:
+    """connect() for ConversationMemory that tracks how many connections are open"""
+
+    def __init__(self, path):
+        self.path = path
+        self.open = 0
+
+    def __call__(self):
+        connections = self
+
+        class Tracked(sqlite3.Connection):
+            def close(self):
+                connections.open -= 1
+                super().close()
+
+        self.open += 1
+        return sqlite3.connect(self.path, factory=Tracked)
+
+
+def summary_row(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT summary, summarized_through FROM chat_summaries WHERE session_id = 's1'").fetchone()
+    finally:
+        conn.close()
+
+
+def test_fold_releases_the_connection_before_summarizing_and_writes_through_write_fn(path):
+    connect = Connections(path)
+    writes = []
+    open_while_summarizing = []
+
+    def summarize(previous, transcript):
+        open_while_summarizing.append(connect.open)
+        assert 'question 2' in transcript and 'question 3' not in transcript
+        return 'folded'
+
+    def write(fn, *args):
+        writes.append(args)
+        conn = sqlite3.connect(path)
+        fn(conn, *args)
+        conn.commit()
+        conn.close()
+
+    memory = ConversationMemory(connect, summarize, write_fn=write, recent_turns=3, fold_turns=2)
+    try:
+        assert memory.schedule_fold('s1').result(5) is True
+    finally:
+        memory.shutdown()
+
+    assert open_while_summarizing == [0]
+    assert writes == [('s1', 'folded', 6)]  # the three oldest turns
+    assert summary_row(path) == ('folded', 6)
+
+
+def test_short_sessions_are_not_folded(path):
+    memory = ConversationMemory(Connections(path), lambda *args: pytest.fail('no fold expected'), recent_turns=6)
+    try:
+        assert memory.fold('s1') is False
+    finally:
+        memory.shutdown()
+
+
+def test_save_summary_never_moves_back(path):
+    conn = sqlite3.connect(path)
+    ConversationMemory(Connections(path), None)._ensure_schema(conn)
+    save_summary(conn, 's1', 'newer', 8)
+    save_summary(conn, 's1', 'older', 6)  # a slower fold from another worker
+    conn.commit()
+    conn.close()
+    assert summary_row(path) == ('newer', 8)
+
+
+def test_pending_folds_are_bounded(path):
+    memory = ConversationMemory(Connections(path), lambda *args: 'folded', max_pending=0)
+    try:
+        assert memory.schedule_fold('s1') is None
+    finally:
+        memory.shutdown()
+
+
+def test_folds_scheduled_after_shutdown_are_refused(path):
+    memory = ConversationMemory(Connections(path), lambda *args: 'folded', recent_turns=3, fold_turns=2)
+    memory.shutdown()
+    assert memory.schedule_fold('s1') is None
@@ -0,0 +1,78 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask
+
+from catalog_cache import CatalogCache
+from compression import ResponseCompressor, StaticAssets
+
+DOCUMENTS = {'documents': [{'id': i, 'title': f'Document {i}', 'summary': 'Steel making ' * 20} for i in range(20)]}
+
+
+@pytest.fixture
+def compressor():
+    return ResponseCompressor(min_size=1024)
+
+
+@pytest.fixture
+def client(compressor):
+    app = Flask(__name__)
+    compressor.init_app(app)
+    cache = CatalogCache()
+
+    @app.route('/api/documents')
+    def documents():
+        return cache.respond('documents', 1, lambda: json.dumps(DOCUMENTS))
+
+    @app.route('/api/small')
+    def small():
+        return {'ok': True}
+
+    return app.test_client()
+
+
+def test_large_bodies_are_gzipped_for_clients_that_accept_it(client):
+    response = client.get('/api/documents', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert json.loads(gzip.decompress(response.data)) == DOCUMENTS
+
+    identity = client.get('/api/documents')
+    assert 'Content-Encoding' not in identity.headers
+    assert identity.get_json() == DOCUMENTS
+
+    assert 'Content-Encoding' not in client.get('/api/small', headers={'Accept-Encoding': 'gzip'}).headers
+
+
+def test_compressed_body_revalidates_with_304_and_is_encoded_once(client, compressor):
+    first = client.get('/api/documents', headers={'Accept-Encoding': 'gzip'})
+    etag = first.headers['ETag']
+    assert etag.startswith('W/')  # same content as the identity body, different bytes
+
+    again = client.get('/api/documents', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+
+    client.get('/api/documents', headers={'Accept-Encoding': 'gzip'})
+    route = compressor.stats()['routes']['documents']
+    assert (route['responses'], route['from_cache']) == (2, 1)
+    assert route['ratio'] < 0.5
+
+
+def test_static_pages_are_served_precompressed_with_a_304_per_variant(tmp_path):
+    (tmp_path / 'index.html').write_text('<p>ThothKB</p>\n' * 200, encoding='utf-8')
+    app = Flask(__name__)
+    assets = StaticAssets(str(tmp_path))
+    app.add_url_rule('/', 'index', lambda: assets.send('index.html'))
+    client = app.test_client()
+
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == (tmp_path / 'index.html').read_bytes()
+    etag = response.headers['ETag']
+
+    assert client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}).status_code == 304
+    # The identity variant has its own tag, so a cached gzip body never satisfies it
+    assert client.get('/', headers={'If-None-Match': etag}).status_code == 200
+    assert assets.stats()['index.html']['bytes']['gzip'] < len((tmp_path / 'index.html').read_bytes())
@@ -0,0 +1,65 @@
+import sqlite3
+import threading
+
+from flask import Flask, Response
+
+from database.connection import ConnectionManager
+
+
+def make_app(path):
+    app = Flask(__name__)
+    pool = ConnectionManager(str(path), timeout=0.1)
+    pool.init_app(app)
+
+    @app.route('/stream')
+    def stream():
+        def body():
+            conn = pool.connection()
+            conn.execute("INSERT INTO items (name) VALUES ('half written')")  # opens a write transaction
+            yield 'started\n'
+            raise RuntimeError('failed before commit or close')
+        return Response(body())
+
+    return app, pool
+
+
+def test_streamed_body_connection_is_rolled_back_when_response_closes(tmp_path):
+    path = tmp_path / 'test.db'
+    setup = sqlite3.connect(path)
+    setup.execute("CREATE TABLE items (name TEXT)")
+    setup.close()
+    app, pool = make_app(path)
+
+    response = app.test_client().get('/stream', buffered=False)
+    try:
+        next(response.response)
+        try:
+            next(response.response)
+        except RuntimeError:
+            pass
+        assert pool.stats()['in_use'] == 1
+    finally:
+        response.close()
+
+    stats = pool.stats()
+    assert stats['in_use'] == 0
+    assert stats['rolled_back'] == 1
+
+    # The write lock is free again and the half-written row is gone
+    other = sqlite3.connect(path, timeout=0.1)
+    other.execute("BEGIN IMMEDIATE")
+    assert other.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+    other.rollback()
+    other.close()
+
+
+def test_initializer_runs_once_for_all_connections(tmp_path):
+    calls = []
+    pool = ConnectionManager(str(tmp_path / 'test.db'), initializer=lambda: calls.append(1))
+    mine = pool.connection()
+    other = threading.Thread(target=lambda: pool.connection().close())  # needs a second physical connection
+    other.start()
+    other.join(5)
+    mine.close()
+    assert pool.stats()['created'] == 2
+    assert calls == [1]
@@ -0,0 +1,95 @@
+import pytest
+from flask import Flask
+
+from event_feed import EventFeed
+
+
+@pytest.fixture
+def feed():
+    feed = EventFeed(max_events=3)
+    for document_id in range(1, 6):
+        feed.publish('document.updated', {'document_id': document_id})
+    return feed  # events 3, 4 and 5 are still buffered
+
+
+def seqs(events):
+    return [seq for seq, _, _ in events]
+
+
+def test_resumes_after_a_buffered_event(feed):
+    assert seqs(feed.since(f'{feed.boot}-3')) == [4, 5]
+    assert feed.since(f'{feed.boot}-4') == [(5, 'document.updated', {'document_id': 5})]
+
+
+def test_up_to_date_client_gets_nothing(feed):
+    assert feed.since(feed.last_event_id) == []
+
+
+def test_resumes_from_just_before_the_oldest_buffered_event(feed):
+    # Event 2 was dropped, but a client that saw it missed nothing still buffered
+    assert seqs(feed.since(f'{feed.boot}-2')) == [3, 4, 5]
+
+
+def test_resync_when_missed_events_were_dropped(feed):
+    assert feed.since(f'{feed.boot}-1') is None
+    assert feed.since(f'{feed.boot}-0') is None
+
+
+@pytest.mark.parametrize('last_event_id', [
+    None, '', 'nonsense', '-3', 'deadbeef-3',
+])
+def test_resync_for_ids_from_another_process_or_malformed(feed, last_event_id):
+    assert feed.since(last_event_id) is None
+
+
+@pytest.mark.parametrize('suffix', ['', 'x', '-1', '3.5', '99'])
+def test_resync_for_bad_or_future_sequence(feed, suffix):
+    assert feed.since(f'{feed.boot}-{suffix}') is None
+
+
+def test_new_feed_resumes_from_zero():
+    feed = EventFeed()
+    assert feed.since(f'{feed.boot}-0') == []
+    feed.publish('document.added', {'document_id': 1})
+    assert seqs(feed.since(f'{feed.boot}-0')) == [1]
+
+
+def test_stream_tells_stale_clients_to_resync(feed):
+    stream = feed.stream('deadbeef-3')
+    assert next(stream).startswith('retry: ')
+    assert next(stream) == f'id: {feed.boot}-5\nevent: resync\ndata: {{}}\n\n'
+    assert next(stream) == f'id: {feed.boot}-5\nevent: ready\ndata: {{}}\n\n'
+    stream.close()
+
+
+def test_stream_replays_missed_events_before_ready(feed):
+    stream = feed.stream(f'{feed.boot}-4')
+    next(stream)
+    assert next(stream) == f'id: {feed.boot}-5\nevent: document.updated\ndata: {{"document_id": 5}}\n\n'
+    assert 'event: ready' in next(stream)
+    stream.close()
+
+
+def test_streams_over_max_clients_get_503_until_one_closes():
+    feed = EventFeed(max_clients=1)
+    app = Flask(__name__)
+    app.add_url_rule('/api/events', 'events', feed.response)
+    client = app.test_client()
+
+    first = client.get('/api/events', buffered=False)
+    try:
+        assert first.status_code == 200
+        refused = client.get('/api/events')
+        assert refused.status_code == 503
+        assert refused.headers['Retry-After'] == '30'
+        assert feed.stats()['clients'] == 1
+        assert feed.stats()['refused'] == 1
+    finally:
+        first.close()  # never read: the slot is freed anyway
+
+    assert feed.stats()['clients'] == 0
+    second = client.get('/api/events', buffered=False)
+    assert second.status_code == 200
+    assert next(second.response).startswith(b'retry: ')
+    second.close()
+    assert feed.stats()['clients'] == 0
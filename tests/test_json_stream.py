@@ -0,0 +1,138 @@
+import json
+
+from json_stream import StreamingJSONParser, optional, parse_llm_json, validate
+
+QUESTION_SCHEMA = {
+    'question': str,
+    'options': {'A': str, 'B': str, 'C': str, 'D': str},
+    'correct_answer': ('A', 'B', 'C', 'D'),
+    'explanation': optional(str)
+}
+
+
+def question(text, answer='A'):
+    return {'question': text, 'options': {'A': '1', 'B': '2', 'C': '3', 'D': '4'}, 'correct_answer': answer}
+
+
+def feed_in_chunks(parser, text, size):
+    items = []
+    for start in range(0, len(text), size):
+        items.extend(parser.feed(text[start:start + size]))
+    return items
+
+
+def test_items_surface_as_soon_as_they_close():
+    reply = json.dumps({'title': 'Quiz', 'questions': [question('one'), question('two')]})
+    parser = StreamingJSONParser(item_path='questions', item_schema=QUESTION_SCHEMA)
+
+    first_end = reply.index('"A"}') + 4  # just past the first question's closing brace
+    assert parser.feed(reply[:first_end - 1]) == []
+    assert parser.feed(reply[first_end - 1:first_end]) == [question('one')]
+    assert parser.feed(reply[first_end:]) == [question('two')]
+    assert parser.complete
+    assert parser.result() == (json.loads(reply), False)
+
+
+def test_chunk_size_does_not_change_the_items():
+    reply = json.dumps({'questions': [question(f'q{i}') for i in range(5)]})
+    for size in (1, 3, 7, len(reply)):
+        parser = StreamingJSONParser(item_path='questions', item_schema=QUESTION_SCHEMA)
+        assert feed_in_chunks(parser, reply, size) == [question(f'q{i}') for i in range(5)]
+
+
+def test_escaped_quotes_and_brackets_inside_strings():
+    tricky = question('He said "stop" {now} [really] \\ ok?')
+    reply = json.dumps({'questions': [tricky, question('next')]})
+    parser = StreamingJSONParser(item_path='questions', item_schema=QUESTION_SCHEMA)
+
+    assert feed_in_chunks(parser, reply, 1) == [tricky, question('next')]
+    assert parser.result() == (json.loads(reply), False)
+
+
+def test_escaped_backslash_before_closing_quote():
+    reply = '{"path": "C:\\\\", "next": "x"}'
+    parser = StreamingJSONParser()
+    parser.feed(reply)
+    assert parser.result() == ({'path': 'C:\\', 'next': 'x'}, False)
+
+
+def test_truncated_array_keeps_complete_items():
+    full = json.dumps({'title': 'Quiz', 'questions': [question('one'), question('two')]})
+    truncated = full[:full.index('"two"') + 3]
+    parser = StreamingJSONParser(item_path='questions', item_schema=QUESTION_SCHEMA)
+
+    assert parser.feed(truncated) == [question('one')]
+    data, repaired = parser.result()
+    assert repaired
+    assert data['title'] == 'Quiz'
+    assert data['questions'][0] == question('one')
+
+
+def test_truncated_object_closes_open_string():
+    parser = StreamingJSONParser()
+    parser.feed('{"summary": "Complete", "details": {"note": "cut off mid')
+    data, repaired = parser.result()
+    assert repaired
+    assert data == {'summary': 'Complete', 'details': {'note': 'cut off mid'}}
+
+
+def test_truncated_after_key_backs_off_to_last_value():
+    parser = StreamingJSONParser()
+    parser.feed('{"summary": "Complete", "insights": ["a", "b"], "title":')
+    data, repaired = parser.result()
+    assert repaired
+    assert data == {'summary': 'Complete', 'insights': ['a', 'b']}
+
+
+def test_prose_and_trailing_garbage_are_ignored():
+    reply = 'Here is your quiz:\n```json\n{"title": "Quiz", "n": 1}\n```\nLet me know if you want more {'
+    parser = StreamingJSONParser()
+    parser.feed(reply)
+    assert parser.complete
+    assert parser.result() == ({'title': 'Quiz', 'n': 1}, False)
+
+
+def test_no_object_at_all():
+    parser = StreamingJSONParser()
+    parser.feed('Sorry, I cannot help with that.')
+    assert parser.result() == (None, False)
+    assert parse_llm_json('Sorry.') == (None, ['$: no JSON object found'], False)
+
+
+def test_items_failing_the_schema_are_rejected():
+    bad_answer = question('bad', answer='E')
+    missing_options = {'question': 'no options', 'correct_answer': 'A'}
+    reply = json.dumps({'questions': [question('good'), bad_answer, missing_options, question('also good')]})
+    parser = StreamingJSONParser(item_path='questions', item_schema=QUESTION_SCHEMA)
+
+    assert parser.feed(reply) == [question('good'), question('also good')]
+    assert [item for item, _ in parser.rejected] == [bad_answer, missing_options]
+    assert parser.rejected[0][1] == ['$.correct_answer: expected one of A, B, C, D']
+    assert parser.rejected[1][1] == ['$.options: missing']
+
+
+def test_nested_objects_are_not_items():
+    reply = json.dumps({'meta': {'questions': [question('nested')]}, 'questions': [question('top')]})
+    parser = StreamingJSONParser(item_path='questions', item_schema=QUESTION_SCHEMA)
+    assert parser.feed(reply) == [question('top')]
+
+
+def test_parse_llm_json_drops_invalid_fields_only():
+    schema = {'title': str, 'insights': [str], 'summary': optional(str)}
+    data, errors, repaired = parse_llm_json('{"title": "T", "insights": ["a", 2], "summary": null}', schema)
+    assert data == {'title': 'T', 'summary': None}
+    assert errors == ['$.insights[1]: expected str']
+    assert not repaired
+
+
+def test_parse_llm_json_repairs_truncated_reply():
+    data, errors, repaired = parse_llm_json('{"title": "T", "insights": ["a", "b', {'title': str, 'insights': [str]})
+    assert repaired
+    assert data == {'title': 'T', 'insights': ['a', 'b']}
+    assert errors == []
+
+
+def test_validate_reports_paths():
+    assert validate({'a': [1, 'x']}, {'a': [int]}) == ['$.a[1]: expected int']
+    assert validate([], {'a': int}) == ['$: expected object']
+    assert validate({'a': None}, {'a': optional(int)}) == []
@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from llm_jobs import JobsBusy, JobTimeout, LLMJobs
+
+
+@pytest.fixture
+def release():
+    release = threading.Event()
+    yield release
+    release.set()
+
+
+def test_run_times_out_and_cancels_a_job_that_never_started(release):
+    jobs = LLMJobs(max_workers=1, sync_slots=2, timeout=0.05)
+    try:
+        jobs.submit(release.wait, 5)  # holds the only worker
+        with pytest.raises(JobsBusy):  # a JobTimeout, which handlers answer with 503
+            jobs.run(lambda: pytest.fail('a cancelled job ran'))
+        stats = jobs.stats()
+        assert (stats['timed_out'], stats['cancelled'], stats['pending']) == (1, 1, 1)
+    finally:
+        release.set()
+        jobs.shutdown()
+    assert jobs.stats()['pending'] == 0
+
+
+def test_call_abandons_a_running_job_and_frees_the_waiter(release):
+    jobs = LLMJobs(max_workers=1, timeout=0.05)
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return 'late'
+
+    try:
+        with pytest.raises(JobTimeout, match='not finished within 0.05 s'):
+            jobs.call(slow)
+        assert started.is_set()
+        assert jobs.stats()['cancelled'] == 0
+    finally:
+        release.set()
+        jobs.shutdown()
+    stats = jobs.stats()
+    assert (stats['completed'], stats['pending'], stats['stored_results']) == (1, 0, 0)
+
+
+def test_results_within_the_timeout_are_returned():
+    jobs = LLMJobs(max_workers=1, timeout=5)
+    try:
+        assert jobs.run(lambda: ({'answer': 42}, 200)) == ({'answer': 42}, 200)
+        assert jobs.call(lambda x: x * 2, 21) == 42
+        assert jobs.stats()['timed_out'] == 0
+    finally:
+        jobs.shutdown()
@@ -0,0 +1,76 @@
+import os
+import sqlite3
+
+import pytest
+
+from quiz_batch import QuizBatchJob, save_quiz
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'schema.sql')
+
+QUIZ = {
+    'title': 'Steel', 'description': 'About steel',
+    'questions': [{'question': 'What is steel?', 'options': {'A': 'An alloy', 'B': 'A gas', 'C': 'A wood', 'D': 'A stone'},
+                   'correct_answer': 'A', 'explanation': 'Iron and carbon'}],
+}
+
+
+@pytest.fixture
+def connect(tmp_path):
+    path = str(tmp_path / 'kb.db')
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")  # as the servers run it
+    with open(SCHEMA_PATH, encoding='utf-8') as f:
+        conn.executescript(f.read())
+    for title in ('one', 'two'):
+        conn.execute("""
+            INSERT INTO documents (filename, original_filename, title, file_type, file_path)
+            VALUES (?, ?, ?, 'PDF', ?)
+        """, (f'{title}.pdf', f'{title}.pdf', title, f'docs/{title}.pdf'))
+    conn.commit()
+    conn.close()
+
+    def connect():
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        return conn
+    return connect
+
+
+def items(connect, job_id):
+    conn = connect()
+    try:
+        return [tuple(row) for row in conn.execute(
+            "SELECT document_id, status, quiz_id FROM quiz_batch_items WHERE job_id = ? ORDER BY document_id", (job_id,))]
+    finally:
+        conn.close()
+
+
+def test_generated_quizzes_are_saved_by_the_batch(connect):
+    job = QuizBatchJob(connect, lambda document: QUIZ, parallelism=2)
+    job_id = job.create()
+    job.run(job_id)
+
+    conn = connect()
+    quizzes = dict(conn.execute("SELECT document_id, id FROM quizzes").fetchall())
+    conn.close()
+    assert items(connect, job_id) == [(1, 'done', quizzes[1]), (2, 'done', quizzes[2])]
+
+
+def test_quizzes_stored_by_the_generator_are_recorded_not_saved_again(connect):
+    def generate_and_save(document):
+        # As server_enhanced.generate_batch_quiz does, through the flight shared with requests
+        conn = connect()
+        quiz_id = save_quiz(conn.cursor(), document['id'], QUIZ)
+        conn.commit()
+        conn.close()
+        return quiz_id
+
+    job = QuizBatchJob(connect, generate_and_save)
+    job_id = job.create()
+    job.run(job_id)
+
+    conn = connect()
+    quizzes = conn.execute("SELECT document_id, id FROM quizzes ORDER BY document_id").fetchall()
+    conn.close()
+    assert [tuple(row) for row in quizzes] == [(1, 1), (2, 2)]
+    assert items(connect, job_id) == [(1, 'done', 1), (2, 'done', 2)]
@@ -0,0 +1,168 @@
+import json
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+from database import repository
+
+DATABASE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database')
+SCHEMA_PATH = os.path.join(DATABASE_DIR, 'schema.sql')
+
+
+@pytest.fixture(params=['schema.sql', 'existing database'])
+def conn(request, tmp_path):
+    """A new database from schema.sql, or the bundled one brought up to date the way the servers do it"""
+    path = tmp_path / 'kb.db'
+    if request.param == 'schema.sql':
+        conn = sqlite3.connect(path)
+        with open(SCHEMA_PATH, encoding='utf-8') as f:
+            conn.executescript(f.read())
+        repository.ensure_schema(conn)
+    else:
+        shutil.copy(os.path.join(DATABASE_DIR, 'knowledge_base.db'), path)
+        conn = sqlite3.connect(path)
+        repository.ensure_schema(conn)
+    yield conn
+    conn.close()
+
+
+def card(conn, document_id):
+    row = conn.execute("SELECT card FROM document_cards WHERE document_id = ?", (document_id,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def add_document(conn, title):
+    return conn.execute("""
+        INSERT INTO documents (filename, original_filename, title, file_type, file_path)
+        VALUES (?, ?, ?, 'PDF', ?)
+    """, (f"test_{title}.pdf", f"{title}.pdf", title, f"docs/test_{title}.pdf")).lastrowid
+
+
+def add_tag(conn, name, color):
+    return conn.execute("INSERT INTO tags (name, color) VALUES (?, ?)", (name, color)).lastrowid
+
+
+def link(conn, document_id, tag_id):
+    # As upload_document and add_document_tag do it
+    conn.execute("INSERT OR IGNORE INTO document_tags (document_id, tag_id) VALUES (?, ?)", (document_id, tag_id))
+
+
+def test_tag_linked_with_insert_or_ignore_reaches_the_card(conn):
+    document_id = add_document(conn, 'Furnace')
+    assert card(conn, document_id)['tags'] == []
+
+    link(conn, document_id, add_tag(conn, 'Zeta', '#000001'))
+    link(conn, document_id, add_tag(conn, 'Alpha', '#000002'))
+    conn.commit()
+
+    assert card(conn, document_id)['tags'] == ['Alpha', 'Zeta']
+    assert card(conn, document_id)['tag_colors'] == ['#000002', '#000001']
+
+
+def test_relinking_an_existing_tag_keeps_the_card(conn):
+    document_id = add_document(conn, 'Ladle')
+    tag_id = add_tag(conn, 'Steel', '#123456')
+    link(conn, document_id, tag_id)
+    link(conn, document_id, tag_id)
+    conn.commit()
+
+    assert card(conn, document_id)['tags'] == ['Steel']
+    assert conn.execute("SELECT COUNT(*) FROM document_cards WHERE document_id = ?", (document_id,)).fetchone()[0] == 1
+
+
+def test_unlinking_and_renaming_tags_update_the_card(conn):
+    document_id = add_document(conn, 'Sensor')
+    tag_id = add_tag(conn, 'Quality', '#abcdef')
+    other_id = add_tag(conn, 'Energy', '#fedcba')
+    link(conn, document_id, tag_id)
+    link(conn, document_id, other_id)
+
+    conn.execute("UPDATE tags SET name = 'Inspection' WHERE id = ?", (tag_id,))
+    assert card(conn, document_id)['tags'] == ['Energy', 'Inspection']
+
+    conn.execute("DELETE FROM document_tags WHERE document_id = ? AND tag_id = ?", (document_id, other_id))
+    assert card(conn, document_id)['tags'] == ['Inspection']
+
+
+def test_list_documents_serves_tagged_cards(conn):
+    document_id = add_document(conn, 'Casting')
+    link(conn, document_id, add_tag(conn, 'Process', '#00ff00'))
+    conn.commit()
+
+    [document] = [d for d in repository.list_documents(conn) if d['id'] == document_id]
+    assert document['tags'] == ['Process']
+
+
+def test_schema_is_set_up_once_per_database(conn, monkeypatch):
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == repository.SCHEMA_VERSION
+    monkeypatch.setattr(repository, 'ensure_indexes', lambda conn: pytest.fail('DDL ran again'))
+    assert repository.ensure_schema(conn) is False
+
+
+def test_every_catalog_row_written_bumps_the_version_once(conn):
+    version = repository.catalog_version(conn)
+    document_id = add_document(conn, 'Kiln')
+    tag_id = add_tag(conn, 'Ceramics', '#aa0000')
+    link(conn, document_id, tag_id)
+    conn.execute("UPDATE tags SET color = '#bb0000' WHERE id = ?", (tag_id,))
+    conn.execute("DELETE FROM document_tags WHERE document_id = ? AND tag_id = ?", (document_id, tag_id))
+    assert repository.catalog_version(conn) == version + 5
+
+
+def test_writes_outside_the_catalog_and_ignored_inserts_keep_the_version(conn):
+    document_id = add_document(conn, 'Mould')
+    tag_id = add_tag(conn, 'Foundry', '#00aa00')
+    link(conn, document_id, tag_id)
+    version = repository.catalog_version(conn)
+
+    link(conn, document_id, tag_id)  # already linked: INSERT OR IGNORE writes nothing
+    conn.execute("INSERT INTO quizzes (document_id, title, total_questions) VALUES (?, 'Mould', 0)", (document_id,))
+    assert repository.catalog_version(conn) == version
+
+
+def test_changes_since_a_version_carry_only_what_changed_after_it(conn):
+    conn.row_factory = sqlite3.Row
+    kept = add_document(conn, 'Anvil')
+    since = repository.catalog_version(conn)
+    changed = add_document(conn, 'Hammer')
+    tag_id = add_tag(conn, 'Forging', '#0000aa')
+
+    changes = repository.catalog_changes(conn, since)
+    assert changes['full'] is False
+    assert changes['version'] == repository.catalog_version(conn)
+    assert [d['id'] for d in changes['documents']] == [changed]
+    assert [t['id'] for t in changes['tags']] == [tag_id]
+    assert kept not in [d['id'] for d in changes['documents']]
+
+    assert repository.catalog_changes(conn, changes['version'])['documents'] == []
+
+
+def test_deleted_entities_come_back_as_tombstones(conn):
+    conn.row_factory = sqlite3.Row
+    document_id = add_document(conn, 'Crucible')
+    tag_id = add_tag(conn, 'Melting', '#aa00aa')
+    link(conn, document_id, tag_id)
+    since = repository.catalog_version(conn)
+
+    conn.execute("DELETE FROM tags WHERE id = ?", (tag_id,))
+    conn.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+
+    changes = repository.catalog_changes(conn, since)
+    assert changes['deleted'] == {'documents': [document_id], 'tags': [tag_id], 'podcasts': []}
+    assert changes['documents'] == [] and changes['tags'] == []
+
+    # A link removed after the document was deleted does not revive it
+    conn.execute("DELETE FROM document_tags WHERE document_id = ?", (document_id,))
+    assert repository.catalog_changes(conn, since)['deleted']['documents'] == [document_id]
+
+
+@pytest.mark.parametrize('since', [None, -1, 10 ** 9])
+def test_unknown_versions_get_the_whole_catalog(conn, since):
+    conn.row_factory = sqlite3.Row
+    document_id = add_document(conn, 'Bellows')
+
+    changes = repository.catalog_changes(conn, since)
+    assert changes['full'] is True
+    assert document_id in [d['id'] for d in changes['documents']]
@@ -0,0 +1,141 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from single_flight import LockTable, SingleFlight
+
+
+def share(flight, key, outcome, count):
+    """count concurrent flight.do(key, fn) calls, released once all have arrived; (results, runs of fn)"""
+    release, runs = threading.Event(), []
+
+    def fn():
+        runs.append(1)
+        release.wait(5)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    results = [None] * count
+
+    def call(index):
+        try:
+            results[index] = ('ok', flight.do(key, fn))
+        except Exception as e:
+            results[index] = ('error', e)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while flight.stats()['calls'] < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return results, len(runs)
+
+
+def test_concurrent_callers_share_one_result():
+    flight = SingleFlight()
+    results, runs = share(flight, ('quiz', 1), {'quiz': 1}, 5)
+
+    assert results == [('ok', {'quiz': 1})] * 5
+    assert runs == 1
+    stats = flight.stats()
+    assert (stats['runs'], stats['shared'], stats['in_flight']) == (1, 4, 0)
+
+
+def test_concurrent_callers_share_the_exception_and_a_later_call_runs_again():
+    flight = SingleFlight()
+    error = RuntimeError('model unavailable')
+    results, runs = share(flight, ('quiz', 2), error, 4)
+
+    assert results == [('error', error)] * 4
+    assert runs == 1
+    assert flight.stats()['failed'] == 1
+
+    # Failures are not kept: the next call runs again
+    assert flight.do(('quiz', 2), lambda: 'retried') == 'retried'
+    assert flight.stats()['runs'] == 2
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do(('quiz', 1), lambda: 'one') == 'one'
+    assert flight.do(('quiz', 2), lambda: 'two') == 'two'
+    assert flight.stats()['shared'] == 0
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'locks.db')
+
+
+def test_lock_is_exclusive_across_owners_until_released(path):
+    mine, theirs = LockTable(path, poll=0.01), LockTable(path, poll=0.01)
+
+    assert mine.acquire('quiz:1', timeout=1)
+    assert not theirs.acquire('quiz:1', timeout=0.05)
+    assert theirs.acquire('quiz:2', timeout=0.05)
+    assert theirs.stats()['timed_out'] == 1
+
+    mine.release('quiz:1')
+    assert theirs.acquire('quiz:1', timeout=0.05)
+    assert theirs.stats()['acquired'] == 2
+
+
+def test_release_by_another_owner_keeps_the_lock(path):
+    mine, theirs = LockTable(path, poll=0.01), LockTable(path, poll=0.01)
+    assert mine.acquire('quiz:1', timeout=1)
+    theirs.release('quiz:1')
+    assert not theirs.acquire('quiz:1', timeout=0.05)
+
+
+def test_expired_lease_is_taken_over(path):
+    crashed = LockTable(path, lease=0.1, poll=0.01)
+    survivor = LockTable(path, lease=0.1, poll=0.01)
+    assert crashed.acquire('quiz:1', timeout=1)  # never released
+
+    assert survivor.acquire('quiz:1', timeout=2)
+    stats = survivor.stats()
+    assert stats['taken_over'] == 1
+    assert stats['waited'] == 1
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT owner FROM flight_locks WHERE key = 'quiz:1'").fetchone()[0] == survivor.owner()
+    conn.close()
+
+
+def test_other_workers_wait_for_the_holder_then_run(path):
+    holder = SingleFlight(LockTable(path, poll=0.01))
+    waiter = SingleFlight(LockTable(path, poll=0.01), wait=5)
+    release, order = threading.Event(), []
+
+    def hold():
+        order.append('holder')
+        release.wait(5)
+
+    thread = threading.Thread(target=holder.do, args=(('quiz', 1), hold))
+    thread.start()
+    while not order:
+        time.sleep(0.01)
+    threading.Timer(0.1, release.set).start()
+
+    waiter.do(('quiz', 1), lambda: order.append('waiter'))
+    thread.join(5)
+    assert order == ['holder', 'waiter']
+    assert waiter.stats()['locks']['waited'] == 1
+
+
+def test_runs_anyway_when_the_lock_is_held_past_the_wait(path):
+    LockTable(path).acquire('quiz:1', timeout=1)  # a stuck holder
+    flight = SingleFlight(LockTable(path, poll=0.01), wait=0.05)
+
+    assert flight.do(('quiz', 1), lambda: 'ran') == 'ran'
+    assert flight.stats()['locks']['timed_out'] == 1
+
+    # The stuck holder's lock was not released by the run
+    assert not LockTable(path).acquire('quiz:1', timeout=0.01)
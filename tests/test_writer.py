@@ -0,0 +1,73 @@
+import sqlite3
+import threading
+
+import pytest
+
+from database.writer import GroupCommitWriter, WriteTimeout, WriterBusy
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / 'test.db'
+    setup = sqlite3.connect(path)
+    setup.execute("CREATE TABLE items (name TEXT)")
+    setup.close()
+    return path
+
+
+def insert(conn, name):
+    conn.execute("INSERT INTO items (name) VALUES (?)", (name,))
+
+
+def count(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_timed_out_write_is_still_committed(path):
+    writer = GroupCommitWriter(str(path))
+    proceed = threading.Event()
+
+    def slow_insert(conn, name):
+        proceed.wait(5)
+        insert(conn, name)
+
+    try:
+        with pytest.raises(WriteTimeout, match='may still be saved'):
+            writer.write(slow_insert, 'late', timeout=0.05)
+        assert writer.stats()['timed_out'] == 1
+
+        proceed.set()
+        writer.write(insert, 'after')
+        assert count(path) == 2
+    finally:
+        writer.stop()
+
+
+def test_full_queue_raises_writer_busy(path):
+    writer = GroupCommitWriter(str(path), max_queue=1, enqueue_timeout=0.05)
+    proceed = threading.Event()
+    started = threading.Event()
+
+    def blocking_insert(conn, name):
+        started.set()
+        proceed.wait(5)
+        insert(conn, name)
+
+    try:
+        first = writer.submit(blocking_insert, 'first')
+        started.wait(5)
+        second = writer.submit(insert, 'second')  # fills the queue while the writer is busy
+        with pytest.raises(WriterBusy):
+            writer.submit(insert, 'third')
+        assert writer.stats()['rejected'] == 1
+
+        proceed.set()
+        first.result(5)
+        second.result(5)
+        assert count(path) == 2
+    finally:
+        writer.stop()
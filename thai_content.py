@@ -0,0 +1,63 @@
+"""
+On-demand Thai summaries and insights
+Documents ingested in English-only mode get their Thai content the first time a Thai view
+asks for it; concurrent requests for the same document share one generation
+"""
+
+import json
+
+from single_flight import SingleFlight
+
+
+def needs_thai_content(document):
+    """True when a document has English content but no Thai summary yet"""
+    has_english = bool(document['summary_en'] or document['detailed_summary_en'])
+    has_thai = bool(document['summary_th'] or document['detailed_summary_th'])
+    return has_english and not has_thai
+
+
+class ThaiContentGenerator:
+    """Generates, persists and coalesces Thai content per document"""
+
+    def __init__(self, connect, translate_fn, flights=None):
+        self.connect = connect            # returns a configured sqlite3 connection
+        self.translate_fn = translate_fn  # document row -> (summary_th, detailed_summary_th, insights_th)
+        self.flights = flights or SingleFlight()  # coalesces concurrent generations per document
+
+    def ensure(self, document_id):
+        """Return the document row, generating its Thai content first if it is missing"""
+        document = self._load(document_id)
+        if document is None or not needs_thai_content(document):
+            return document
+        return self.flights.do(('thai', document_id), self._generate, document_id)
+
+    def _generate(self, document_id):
+        # An earlier holder of the key, possibly in another worker, may have stored it already
+        document = self._load(document_id)
+        if document is None or not needs_thai_content(document):
+            return document
+
+        summary_th, detailed_summary_th, insights_th = self.translate_fn(document)
+
+        conn = self.connect()
+        try:
+            # Never overwrite Thai content written by another worker in the meantime
+            conn.execute("""
+                UPDATE documents
+                SET summary_th = ?, detailed_summary_th = ?, insights_th = ?
+                WHERE id = ? AND COALESCE(summary_th, '') = '' AND COALESCE(detailed_summary_th, '') = ''
+            """, (summary_th or '', detailed_summary_th or '', json.dumps(insights_th or []), document_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+        return self._load(document_id)
+
+    def _load(self, document_id):
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM documents WHERE id = ?", (document_id,))
+            return cursor.fetchone()
+        finally:
+            conn.close()